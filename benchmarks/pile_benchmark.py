@@ -0,0 +1,69 @@
+# benchmarks/pile_benchmark.py
+# Compares the Pile type with the plain lists of cards the piles used to be.
+# Run from the repository root: python -m benchmarks.pile_benchmark
+
+import random
+import timeit
+from typing import Callable, Dict, List
+from pile import Pile
+
+def make_cards(count: int) -> List[Dict[str, str]]:
+    return [{'name': f"Card {number}", 'image': f"Cards/card_{number}.png"} for number in range(count)]
+
+def list_benchmarks(cards: List[Dict[str, str]]) -> Dict[str, Callable[[], None]]:
+    draw_pile = list(cards)
+    discard_pile = []
+
+    def draw_and_discard():
+        discard_pile.append(draw_pile.pop())
+        draw_pile.append(discard_pile.pop())
+
+    def move_top_to_bottom():
+        draw_pile.insert(0, draw_pile.pop())
+
+    def peek():
+        draw_pile[-1]
+
+    def reshuffle():
+        discard_pile.extend(draw_pile)
+        draw_pile.clear()
+        draw_pile.extend(discard_pile)
+        discard_pile.clear()
+        random.shuffle(draw_pile)
+
+    return {'draw + discard': draw_and_discard, 'move top to bottom': move_top_to_bottom, 'peek': peek, 'reshuffle': reshuffle}
+
+def pile_benchmarks(cards: List[Dict[str, str]]) -> Dict[str, Callable[[], None]]:
+    draw_pile = Pile.full(cards)
+    discard_pile = Pile(cards, (), draw_pile.index)
+
+    def draw_and_discard():
+        discard_pile.put_top(draw_pile.draw())
+        draw_pile.put_top(discard_pile.draw())
+
+    def move_top_to_bottom():
+        draw_pile.move_top_to_bottom()
+
+    def peek():
+        draw_pile.peek()
+
+    def reshuffle():
+        discard_pile.take_all(draw_pile)
+        draw_pile.take_all(discard_pile)
+        draw_pile.shuffle()
+
+    return {'draw + discard': draw_and_discard, 'move top to bottom': move_top_to_bottom, 'peek': peek, 'reshuffle': reshuffle}
+
+def run(deck_sizes=(50, 500, 5000), number: int = 2000) -> None:
+    print(f"{'operation':<20}{'cards':>7}{'list (us)':>12}{'Pile (us)':>12}")
+    for deck_size in deck_sizes:
+        cards = make_cards(deck_size)
+        list_ops = list_benchmarks(cards)
+        pile_ops = pile_benchmarks(cards)
+        for name in list_ops:
+            list_time = min(timeit.repeat(list_ops[name], number=number, repeat=3)) / number * 1e6
+            pile_time = min(timeit.repeat(pile_ops[name], number=number, repeat=3)) / number * 1e6
+            print(f"{name:<20}{deck_size:>7}{list_time:>12.3f}{pile_time:>12.3f}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,215 @@
+# benchmarks/suite.py
+# Benchmarks of the hot paths of the game engine, the persistence and the autocompletes, compared against a JSON baseline.
+# Run from the repository root: python -m benchmarks.suite [--save-baseline] [--threshold 0.25] [--only NAME ...]
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import argparse
+import platform
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+from deck_manager import DeckManager, make_deck_version
+from game_state import GameState
+from game_rules import GameRules
+from game_persistence import load_game_states_file, save_game_states_file
+from card_mechanics import CardMechanics
+from deck_management_commands import DeckManagementCommands
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DECK_KEYS = ['event_deck', 'dragon_deck', 'sea_deck', 'end_deck']
+
+# A benchmark returns the function to time and how often to call it per measurement
+Benchmark = Tuple[Callable[[], None], int]
+
+def make_library(deck_count: int, cards_per_deck: int) -> SimpleNamespace:
+    """
+    Returns a stand-in for the deck manager with a large generated deck library.
+    """
+    decks = {}
+    for deck_number in range(deck_count):
+        cards = [{'name': f"Card {deck_number}-{number}", 'image': f"Cards/card_{number}.png"} for number in range(cards_per_deck)]
+        decks[f"deck_{deck_number}"] = make_deck_version('event_deck', f"Generated Deck {deck_number}", cards)
+    return SimpleNamespace(decks=decks)
+
+def make_game_states(deck_manager: DeckManager, count: int, turns: int = 5) -> Dict[int, GameState]:
+    """
+    Returns games that have been played for a few turns, so their piles and action logs are not empty.
+    """
+    rules = GameRules()
+    game_states = {}
+    for channel_id in range(1, count + 1):
+        game_state = GameState(channel_id, DECK_KEYS, deck_manager, guild_id=1, seed=channel_id)
+        for _ in range(turns):
+            rules.run_reveal_phase(game_state)
+            game_state.advance_turn()
+        game_states[channel_id] = game_state
+    return game_states
+
+def game_state_construction(deck_manager: DeckManager) -> Benchmark:
+    def construct():
+        GameState(1, DECK_KEYS, deck_manager, seed=0)
+    return construct, 200
+
+def play_turns(deck_manager: DeckManager, turns: int = 100) -> Benchmark:
+    rules = GameRules()
+
+    def play():
+        game_state = GameState(1, DECK_KEYS, deck_manager, seed=0)
+        for _ in range(turns):
+            rules.run_reveal_phase(game_state)
+            game_state.advance_turn()
+    return play, 10
+
+def save_game_states(deck_manager: DeckManager, directory: str, channel_count: int) -> Benchmark:
+    game_states = make_game_states(deck_manager, channel_count)
+    file_path = os.path.join(directory, f"save_{channel_count}.json")
+
+    def save():
+        save_game_states_file(file_path, game_states)
+    return save, max(1, 100 // channel_count)
+
+def load_game_states(deck_manager: DeckManager, directory: str, channel_count: int) -> Benchmark:
+    file_path = os.path.join(directory, f"load_{channel_count}.json")
+    save_game_states_file(file_path, make_game_states(deck_manager, channel_count))
+
+    def load():
+        load_game_states_file(file_path, deck_manager)
+    return load, max(1, 100 // channel_count)
+
+def deck_name_autocomplete(loop: asyncio.AbstractEventLoop, deck_count: int) -> Benchmark:
+    cog = DeckManagementCommands(SimpleNamespace(deck_manager=make_library(deck_count, 10)))
+    interaction = SimpleNamespace(namespace=SimpleNamespace())
+
+    def autocomplete():
+        loop.run_until_complete(cog.deck_name_autocomplete(interaction, "deck 1"))
+    return autocomplete, 20
+
+def card_name_autocomplete(loop: asyncio.AbstractEventLoop, card_count: int) -> Benchmark:
+    cog = DeckManagementCommands(SimpleNamespace(deck_manager=make_library(1, card_count)))
+    interaction = SimpleNamespace(namespace=SimpleNamespace(deck_key='deck_0'))
+
+    def autocomplete():
+        loop.run_until_complete(cog.remove_card_from_deck_card_name_autocomplete(interaction, "card 0-1"))
+    return autocomplete, 20
+
+def handle_drawn_cards(loop: asyncio.AbstractEventLoop, deck_manager: DeckManager) -> Benchmark:
+    async def send(**kwargs):
+        pass
+    card_mechanics = CardMechanics(bot=None)
+    interaction = SimpleNamespace(followup=SimpleNamespace(send=send))
+
+    def handle():
+        game_state = GameState(1, DECK_KEYS, deck_manager, seed=0)
+        drawn_cards, black_swan_drawn = game_state.draw_cards_for_reveal_phase()
+        loop.run_until_complete(card_mechanics.handle_drawn_cards(interaction, game_state, drawn_cards, black_swan_drawn))
+    return handle, 50
+
+def build_benchmarks(loop: asyncio.AbstractEventLoop, directory: str, only: List[str]) -> Dict[str, Callable[[], Benchmark]]:
+    """
+    Returns the benchmarks by name. They are set up lazily, so --only skips the setup of the others.
+    """
+    deck_manager = DeckManager()
+    benchmarks = {
+        'game_state_construction': lambda: game_state_construction(deck_manager),
+        'play_100_turns': lambda: play_turns(deck_manager),
+        'handle_drawn_cards': lambda: handle_drawn_cards(loop, deck_manager),
+    }
+    for channel_count in (1, 100, 10000):
+        benchmarks[f"save_{channel_count}_channels"] = lambda count=channel_count: save_game_states(deck_manager, directory, count)
+        benchmarks[f"load_{channel_count}_channels"] = lambda count=channel_count: load_game_states(deck_manager, directory, count)
+    for deck_count in (100, 5000):
+        benchmarks[f"deck_name_autocomplete_{deck_count}_decks"] = lambda count=deck_count: deck_name_autocomplete(loop, count)
+    for card_count in (1000, 50000):
+        benchmarks[f"card_name_autocomplete_{card_count}_cards"] = lambda count=card_count: card_name_autocomplete(loop, count)
+    if only:
+        benchmarks = {name: benchmark for name, benchmark in benchmarks.items() if any(pattern in name for pattern in only)}
+    return benchmarks
+
+def measure(function: Callable[[], None], number: int, repeat: int) -> float:
+    """
+    Returns the best time of one call in seconds, over repeat measurements of number calls.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """
+    Prints the results next to the baseline and returns the benchmarks that are slower than the baseline by more than threshold.
+    """
+    regressions = []
+    print(f"{'benchmark':<42}{'time (ms)':>12}{'baseline (ms)':>15}{'change':>9}")
+    for name, seconds in results.items():
+        if name in baseline:
+            change = seconds / baseline[name] - 1
+            flag = '  REGRESSION' if change > threshold else ''
+            print(f"{name:<42}{seconds * 1000:>12.3f}{baseline[name] * 1000:>15.3f}{change:>+9.0%}{flag}")
+            if change > threshold:
+                regressions.append(name)
+        else:
+            print(f"{name:<42}{seconds * 1000:>12.3f}{'-':>15}{'-':>9}")
+    return regressions
+
+def machine_description() -> str:
+    """
+    Describes the machine and Python the benchmarks run on, saved with the baseline.
+    """
+    return f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU(s), {platform.python_implementation()} {platform.python_version()}"
+
+def run(baseline_file: str = BASELINE_FILE, save_baseline: bool = False, threshold: float = 0.25, repeat: int = 3, only: List[str] = ()) -> int:
+    """
+    Runs the benchmarks and compares them against the baseline, or saves them as the new baseline.
+    Returns the exit code: 1 if a benchmark regressed, 2 if there is no baseline to compare against.
+    """
+    baseline_data = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file, 'r') as file:
+            baseline_data = json.load(file)
+    elif not save_baseline:
+        print(f"No baseline in '{baseline_file}', so regressions cannot be detected. "
+              f"Run with --save-baseline first (on the machine that runs the comparison).")
+        return 2
+    baseline = baseline_data.get('results', {})
+    if baseline_data and baseline_data.get('machine') != machine_description():
+        print(f"Warning: the baseline was measured on {baseline_data.get('machine', 'an unknown machine')}, "
+              f"this is {machine_description()}. Timings are only comparable on the same machine.")
+
+    logging.disable(logging.WARNING)  # The games log every card, which is not what is measured here
+    loop = asyncio.new_event_loop()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, setup in build_benchmarks(loop, directory, list(only)).items():
+            function, number = setup()
+            results[name] = measure(function, number, repeat)
+    loop.close()
+
+    regressions = compare(results, baseline, threshold)
+
+    if save_baseline:
+        with open(baseline_file, 'w') as file:
+            json.dump({'machine': machine_description(), 'python': sys.version.split()[0], 'results': {**baseline, **results}}, file, indent=4)
+        print(f"Saved the results as the baseline in '{baseline_file}'.")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) are more than {threshold:.0%} slower than the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks of the game engine, persistence and autocompletes.')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='JSON file with the baseline results.')
+    parser.add_argument('--save-baseline', action='store_true', help='Save the results as the new baseline.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Slowdown against the baseline that counts as a regression (0.25 = 25%%).')
+    parser.add_argument('--repeat', type=int, default=3, help='Measurements per benchmark, the best one counts.')
+    parser.add_argument('--only', nargs='+', default=(), help='Only run the benchmarks whose name contains one of these.')
+    args = parser.parse_args()
+    sys.exit(run(args.baseline, args.save_baseline, args.threshold, args.repeat, args.only))
@@ -2,96 +2,90 @@
 
 import os
 import json
+import time
+import logging
 import asyncio
+import hashlib
+import argparse
 import discord
 from discord.ext import commands
-from game_state import GameState
+from typing import Dict, Iterable, Optional
 from deck_manager import DeckManager
 from deck_management_commands import DeckManagementCommands
 from game_commands import GameCommands
 from turn_manager import TurnManager
 from peek_commands import PeekCommands
-from utils import intents
+from diagnostics_commands import DiagnosticsCommands
+from utils import build_client_options, gamemaster_roles, get_resident_memory_mb, GATEWAY_PROFILES
+from card_images import card_images
 from config import BOT_TOKEN
 from logging_config import configure_logging
+from worker_pool import WorkerPool, RemoteGameState
+from turn_scheduler import TurnScheduler
+from metrics import metrics, COMMAND_LATENCY, SAVE_BYTES, SAVE_DURATION
+from tracing import tracer, TRACE_FORMATS
+from loop_monitor import loop_monitor
+from memory_report import MemoryReports
+from game_persistence import (
+    ShardedGameStates, get_shard_file, load_game_states_file, prepare_shard_partitions,
+    save_game_states_file, shard_id_for_guild
+)
 
 configure_logging()
 
 class MyBot(commands.Bot):
     """Main bot class that initializes DeckManager and manages game states."""
 
-    def __init__(self):
-        super().__init__(command_prefix=commands.when_mentioned, intents=intents)
+    def __init__(self, force_sync: bool = False, gateway_profile: str = 'default', metrics_port: int = 0, **options):
+        super().__init__(command_prefix=commands.when_mentioned, **build_client_options(gateway_profile), **options)
+        self.gateway_profile = gateway_profile  # Which intents and caches are used, see utils.build_client_options
+        if gateway_profile == 'low_memory':
+            card_images.max_bytes = 4 * 1024 * 1024  # Keep fewer card images in memory
+        self.startup_time = time.monotonic()  # Used to log the startup-to-ready time
+        self.ready_logged = False
+        self.force_sync = force_sync  # Sync the command tree even if the command schema is unchanged
+        self.command_tree_hash_file = 'command_tree.hash'
         self.deck_manager = DeckManager()
         self.game_states = {}  # Channel ID to GameState mapping
+        self.worker_pool = None  # Set when the games run in worker processes
+        self.turn_scheduler = TurnScheduler(self.fire_automatic_turn)  # Deadlines of automatic turns
         self.lock = asyncio.Lock()  # Ensure thread-safe operations
         self.game_states_file = 'game_states.json'
+        self.metrics_port = metrics_port  # Port of the local metrics endpoint, 0 if it is off
+        self.memory_reports = MemoryReports(self)  # Approximate memory of the games, decks and caches
+        self.register_metrics()
         self.load_game_states()
 
+    def register_metrics(self):
+        """
+        Registers the gauges of the running games, read when the metrics are scraped.
+        """
+        metrics.gauge('potr_active_games', 'Games running.', lambda: len(self.game_states))
+        metrics.gauge('potr_active_views', 'Views awaiting user input.',
+                      lambda: sum(len(game_state.active_views) for game_state in list(self.game_states.values())))
+        metrics.gauge('potr_pending_card_actions', 'Peek actions awaiting confirmation.',
+                      lambda: sum(len(game_state.pending_card_actions) for game_state in list(self.game_states.values())))
+        self.memory_reports.register_metrics()
+
     def load_game_states(self):
         """
         Loads game states from the game_states.json file.
         """
         if os.path.exists(self.game_states_file):
-            try:
-                with open(self.game_states_file, 'r') as file:
-                    game_states_data = json.load(file)
-                    for channel_id, state_data in game_states_data.items():
-                        channel_id_int = int(channel_id)
-                        deck_keys = state_data.get('deck_keys', [])
-                        missing_decks = [deck for deck in deck_keys if deck not in self.deck_manager.decks]
-                        if missing_decks:
-                            missing_original = [self.deck_manager.get_original_deck_name(deck) for deck in missing_decks]
-                            logging.warning(
-                                f"Missing decks for channel {channel_id}: {', '.join(missing_original)}. Skipping this game state."
-                            )
-                            continue
-                        try:
-                            # Create a new GameState instance with the saved data
-                            game_state = GameState(
-                                channel_id=channel_id_int,
-                                deck_keys=deck_keys,
-                                deck_manager=self.deck_manager
-                            )
-                            # Restore game state attributes
-                            game_state.draw_piles = state_data.get('draw_piles', {})
-                            game_state.discard_piles = state_data.get('discard_piles', {})
-                            game_state.current_turn = state_data.get('current_turn', 1)
-                            game_state.keep_cards = state_data.get('keep_cards', []) #cards that are kept this turn due to end is nigh
-                            game_state.end_game_flag = state_data.get('end_game_flag', False)
-                            game_state.keep_current_turn_cards = state_data.get('keep_current_turn_cards', False) #whether keep cards flag is in on
-                            game_state.current_turn_drawn_cards = state_data.get('current_turn_drawn_cards', []) #list of cards currently in play
-                            self.game_states[channel_id_int] = game_state
-                            logging.info(f"Restored game state for channel {channel_id}.")
-
-                        except ValueError as e:
-                            logging.error(f"Error restoring game state for channel {channel_id}: {e}")
-                logging.info("Game states loaded.")
-            except (json.JSONDecodeError, IOError) as e:
-                logging.error(f"Failed to load game states: {e}")
-
-    async def save_game_states(self):
+            self.game_states.update(load_game_states_file(self.game_states_file, self.deck_manager))
+            logging.info("Game states loaded.")
+
+    async def save_game_states(self, guild_id: Optional[int] = None):
         """
         Saves all game states to the game_states.json file atomically.
+        The guild ID is only used by the sharded bot, which saves just the shard of that guild.
         """
         async with self.lock:
-            game_states_data = {}
-            for channel_id, game_state in self.game_states.items():
-                game_states_data[str(channel_id)] = {
-                    'deck_keys': game_state.all_deck_keys,
-                    'draw_piles': game_state.draw_piles,
-                    'discard_piles': game_state.discard_piles,
-                    'current_turn': game_state.current_turn,
-                    'keep_cards': game_state.keep_cards,
-                    'end_game_flag': game_state.end_game_flag,
-                    'keep_current_turn_cards': game_state.keep_current_turn_cards,
-                    'current_turn_drawn_cards': game_state.current_turn_drawn_cards,
-                }
-            temp_file = self.game_states_file + ".tmp"
             try:
-                with open(temp_file, 'w') as file:
-                    json.dump(game_states_data, file, indent=4)
-                os.replace(temp_file, self.game_states_file)
+                started = time.perf_counter()
+                written = save_game_states_file(self.game_states_file, self.game_states)
+                SAVE_DURATION.observe(time.perf_counter() - started)
+                SAVE_BYTES.observe(written)
                 logging.info("Game states saved atomically.")
             except IOError as e:
                 logging.error(f"Failed to save game states: {e}")
@@ -102,35 +96,279 @@ class MyBot(commands.Bot):
         await self.add_cog(GameCommands(self))
         await self.add_cog(TurnManager(self))
         await self.add_cog(PeekCommands(self))
+        await self.add_cog(DiagnosticsCommands(self))
+        await self.sync_command_tree()
+        if self.metrics_port:
+            await metrics.start_server(self.metrics_port)
+        loop_monitor.start()
+
+    def compute_command_tree_hash(self) -> str:
+        """
+        Computes a stable hash of all registered application commands.
+        """
+        commands_data = [command.to_dict(self.tree) for command in self.tree.get_commands()]
+        commands_data.sort(key=lambda command: (command.get('type', 1), command['name']))
+        payload = json.dumps({'application_id': self.application_id, 'commands': commands_data}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def sync_command_tree(self):
+        """
+        Syncs the command tree with Discord, unless the command schema is unchanged since the last sync.
+        """
+        command_tree_hash = self.compute_command_tree_hash()
+        previous_hash = None
+        if os.path.exists(self.command_tree_hash_file):
+            try:
+                with open(self.command_tree_hash_file, 'r') as file:
+                    previous_hash = file.read().strip()
+            except IOError as e:
+                logging.warning(f"Failed to read command tree hash: {e}")
+
+        if not self.force_sync and command_tree_hash == previous_hash:
+            logging.info("Command tree unchanged since the last sync. Skipping sync.")
+            return
+
+        started = time.monotonic()
         await self.tree.sync()
-        logging.info("Command tree synced.")
+        logging.info(f"Command tree synced in {time.monotonic() - started:.2f}s.")
+        try:
+            with open(self.command_tree_hash_file, 'w') as file:
+                file.write(command_tree_hash)
+        except IOError as e:
+            logging.warning(f"Failed to save command tree hash: {e}")
 
     async def on_app_command_completion(self, interaction: discord.Interaction, command: discord.app_commands.Command):
         """Event handler called when an application command is successfully completed."""
         logging.info(f"Command '{command.name}' executed by {interaction.user} in {interaction.channel}.")
-        await self.save_game_states()
+        self.record_command_latency(interaction, 'ok')
+        with tracer.span('save_game_states', interaction.id):
+            await self.save_game_states(interaction.guild_id)
+        tracer.end_trace(interaction.id)
+
+    def record_command_latency(self, interaction: discord.Interaction, outcome: str):
+        """Records the time since a command was invoked, measured from the creation time of its interaction."""
+        command = interaction.command.qualified_name if interaction.command else 'unknown'
+        latency = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        COMMAND_LATENCY.observe(max(latency, 0.0), command=command, outcome=outcome)
+
+    async def on_guild_role_create(self, role: discord.Role):
+        """Invalidates the cached game master role of the guild when a role is created."""
+        gamemaster_roles.invalidate(role.guild.id)
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        """Invalidates the cached game master role of the guild when a role is renamed or changed."""
+        gamemaster_roles.invalidate(after.guild.id)
+
+    async def on_guild_role_delete(self, role: discord.Role):
+        """Invalidates the cached game master role of the guild when a role is deleted."""
+        gamemaster_roles.invalidate(role.guild.id)
 
     async def on_ready(self):
         """Event handler called when the bot is ready."""
         print(f'Logged in as {self.user.name}')
         logging.info(f'Logged in as {self.user.name}')
+        if not self.ready_logged:
+            # on_ready can fire again after reconnects, only the first one counts as startup
+            self.ready_logged = True
+            logging.info(f"Startup to ready took {time.monotonic() - self.startup_time:.2f}s.")
+            # Start the automatic turns once the games of all shards are loaded
+            self.turn_scheduler.start()
+        self.log_resident_memory()
+
+    def log_resident_memory(self):
+        """Logs the resident memory of the bot together with the gateway profile."""
+        resident_memory = get_resident_memory_mb()
+        if resident_memory is None:
+            logging.info(f"Resident memory is not available on this platform (gateway profile '{self.gateway_profile}').")
+        else:
+            logging.info(f"Resident memory: {resident_memory:.1f} MB (gateway profile '{self.gateway_profile}', {len(self.guilds)} guild(s)).")
+
+    async def fire_automatic_turn(self, channel_id: int):
+        """Advances the turn of a channel whose turn deadline has passed."""
+        turn_manager = self.get_cog('TurnManager')
+        if turn_manager:
+            await turn_manager.fire_automatic_turn(channel_id)
+        else:
+            logging.error("TurnManager cog not found.")
 
     async def close(self):
         """Ensures that game states are saved before the bot shuts down."""
+        await self.turn_scheduler.stop()
+        await metrics.stop_server()
+        await loop_monitor.stop()
         await self.save_game_states()
+        tracer.stop()
         logging.info("Bot is shutting down. Game states saved.")
         await super().close()
 
+class MyShardedBot(MyBot, commands.AutoShardedBot):
+    """
+    Bot that runs multiple gateway shards, with game states and their persistence partitioned per shard.
+    Each shard loads and saves only the games of its own guilds, in game_states/shard_<id>.json.
+    """
+
+    def __init__(self, force_sync: bool = False, shard_count: Optional[int] = None, gateway_profile: str = 'default', metrics_port: int = 0):
+        super().__init__(force_sync=force_sync, gateway_profile=gateway_profile, metrics_port=metrics_port, shard_count=shard_count)
+        self.game_states = ShardedGameStates(shard_count)
+        self.game_states_directory = 'game_states'
+        self.loaded_shards = set()  # Shards whose game states have been loaded
+
+    def load_game_states(self):
+        """
+        Game states are loaded per shard once the shard connects, see on_shard_connect.
+        """
+
+    def get_shard_file(self, shard_id: int) -> str:
+        """
+        Returns the path of the file that stores the game states of a shard.
+        """
+        return get_shard_file(self.game_states_directory, shard_id)
+
+    def load_shard_game_states(self, shard_id: int):
+        """
+        Loads the game states of a single shard, without reading the other shards' files.
+        """
+        game_states = load_game_states_file(self.get_shard_file(shard_id), self.deck_manager)
+        for channel_id, game_state in game_states.items():
+            self.game_states[channel_id] = game_state
+        self.loaded_shards.add(shard_id)
+        logging.info(f"Game states loaded for shard {shard_id} ({len(game_states)} game(s)).")
+
+    async def on_shard_connect(self, shard_id: int):
+        """Loads the game states of a shard the first time it connects."""
+        if self.game_states.shard_count is None:
+            self.game_states.shard_count = self.shard_count
+        if shard_id in self.loaded_shards:
+            return
+        async with self.lock:
+            if not self.loaded_shards:
+                prepare_shard_partitions(self.game_states_directory, self.game_states.shard_count, self.game_states_file)
+                # Games saved without a guild are in shard 0, and can be played from any shard until their guild is known
+                if shard_id != 0:
+                    self.load_shard_game_states(0)
+            if shard_id not in self.loaded_shards:
+                self.load_shard_game_states(shard_id)
+
+    async def on_ready(self):
+        """Moves the games saved without a guild to their guild's shard once all shards are connected."""
+        await super().on_ready()
+        channel_guilds = {}
+        for channel_id, game_state in list(self.game_states.items()):
+            channel = self.get_channel(channel_id) if game_state.guild_id is None else None
+            if getattr(channel, 'guild', None):
+                channel_guilds[channel_id] = channel.guild.id
+        await self.assign_guilds(channel_guilds)
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command: discord.app_commands.Command):
+        """Learns the guild of a game saved without one from its commands, before the game is saved."""
+        if interaction.guild_id:
+            await self.assign_guilds({interaction.channel_id: interaction.guild_id})
+        await super().on_app_command_completion(interaction, command)
+
+    async def assign_guilds(self, channel_guilds: Dict[int, int]):
+        """
+        Moves the games saved without a guild to the shards of the given guilds, and saves the shards they left and joined.
+        Otherwise their changes would only be saved to shard 0 on shutdown.
+        """
+        changed_shards = self.game_states.assign_guilds(channel_guilds, self.loaded_shards)
+        if changed_shards:
+            logging.info(f"Moved games saved without a guild to their guild's shard, saving shard(s) {sorted(changed_shards)}.")
+            await self.save_shards(changed_shards)
+
+    async def save_game_states(self, guild_id: Optional[int] = None):
+        """
+        Saves the game states of the guild's shard atomically, or of all loaded shards if no guild is given.
+        """
+        if guild_id is not None:
+            await self.save_shards([shard_id_for_guild(guild_id, self.game_states.shard_count)])
+        else:
+            await self.save_shards(list(self.loaded_shards))
+
+    async def save_shards(self, shard_ids: Iterable[int]):
+        """
+        Saves the game states of the given shards atomically, skipping the shards that have not been loaded.
+        """
+        async with self.lock:
+            for shard_id in shard_ids:
+                if shard_id not in self.loaded_shards:
+                    # Never overwrite a partition that has not been loaded yet
+                    continue
+                try:
+                    started = time.perf_counter()
+                    written = save_game_states_file(self.get_shard_file(shard_id), self.game_states.partition(shard_id), {'shard_id': shard_id})
+                    SAVE_DURATION.observe(time.perf_counter() - started)
+                    SAVE_BYTES.observe(written)
+                    logging.info(f"Game states saved atomically for shard {shard_id}.")
+                except IOError as e:
+                    logging.error(f"Failed to save game states for shard {shard_id}: {e}")
+
+class MyWorkerBot(MyBot):
+    """
+    Bot that runs the game logic in a pool of worker processes.
+    Each channel is owned by the worker its ID hashes to; the worker keeps and saves the channel's game,
+    while this process only handles the gateway and the Discord side of the commands.
+    """
+
+    def __init__(self, force_sync: bool = False, worker_count: int = 2, gateway_profile: str = 'default', metrics_port: int = 0):
+        super().__init__(force_sync=force_sync, gateway_profile=gateway_profile, metrics_port=metrics_port)
+        self.worker_pool = WorkerPool(worker_count, legacy_file=self.game_states_file)  # Running games are taken over by the workers
+
+    def load_game_states(self):
+        """
+        Game states are loaded by the workers, see setup_hook.
+        """
+
+    async def setup_hook(self):
+        """Starts the workers and registers their running games before setting up the cogs."""
+        await self.worker_pool.start()
+        for channel_id in await self.worker_pool.list_games():
+            self.game_states[channel_id] = RemoteGameState(channel_id, self.worker_pool)
+        logging.info(f"{len(self.game_states)} game(s) running in workers.")
+        await super().setup_hook()
+
+    async def save_game_states(self, guild_id: Optional[int] = None):
+        """
+        Nothing to save here: each worker saves its own games after every change.
+        """
+
+    async def close(self):
+        """Stops the workers, which save their games, after shutting down the bot."""
+        await super().close()
+        await self.worker_pool.stop()
+
 # Initialize and run the bot
 if __name__ == '__main__':
-    import logging
+    parser = argparse.ArgumentParser(description='Protectors of the Realm card game bot.')
+    parser.add_argument('--force-sync', action='store_true', help='Sync the command tree even if the command schema is unchanged.')
+    parser.add_argument('--sharded', action='store_true', help='Run with multiple gateway shards, partitioning game states per shard.')
+    parser.add_argument('--shard-count', type=int, default=None, help='Number of shards in sharded mode (default: recommended by Discord).')
+    parser.add_argument('--workers', type=int, default=0, help='Run the game logic in this many worker processes.')
+    parser.add_argument('--gateway-profile', choices=GATEWAY_PROFILES, default='default', help="Use 'low_memory' to trim intents and member/message caches in large servers.")
+    parser.add_argument('--metrics-port', type=int, default=0, help='Serve metrics in the Prometheus text format at http://127.0.0.1:<port>/metrics.')
+    parser.add_argument('--trace-file', default=None, help='Write the spans of /nextturn and the first turn of /startgame to this file.')
+    parser.add_argument('--trace-format', choices=TRACE_FORMATS, default='jsonl', help="'jsonl' writes one span per line, 'otlp' one OTLP JSON request per trace.")
+    parser.add_argument('--trace-min-ms', type=float, default=0, help='Only write the traces of commands that took at least this many milliseconds.')
+    parser.add_argument('--loop-lag-threshold', type=float, default=250, help='Log the blocking code when the event loop lags this many milliseconds (0 turns the monitor off).')
+    args = parser.parse_args()
 
-    client = MyBot()
+    if args.sharded and args.workers:
+        parser.error("--sharded and --workers cannot be combined.")
+    if args.sharded:
+        client = MyShardedBot(force_sync=args.force_sync, shard_count=args.shard_count, gateway_profile=args.gateway_profile, metrics_port=args.metrics_port)
+    elif args.workers:
+        client = MyWorkerBot(force_sync=args.force_sync, worker_count=args.workers, gateway_profile=args.gateway_profile, metrics_port=args.metrics_port)
+    else:
+        client = MyBot(force_sync=args.force_sync, gateway_profile=args.gateway_profile, metrics_port=args.metrics_port)
+    loop_monitor.threshold = args.loop_lag_threshold / 1000
+    if args.trace_file:
+        tracer.configure(args.trace_file, args.trace_format, args.trace_min_ms)
 
     # Global error handler
     @client.tree.error
     async def on_app_command_error(interaction: discord.Interaction, error):
         """Handles errors globally for all application commands."""
+        client.record_command_latency(interaction, 'error')
+        tracer.end_trace(interaction.id)
         if interaction.response.is_done():
             await interaction.followup.send("An error occurred while processing the command.", ephemeral=True)
         else:
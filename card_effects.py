@@ -0,0 +1,44 @@
+# card_effects.py
+
+from typing import Callable, Dict, FrozenSet, Tuple
+
+# Effect tags of the special cards
+END_IS_NIGH = 'end_is_nigh'  # Keeps the other cards of the turn in play
+TIMES_UP = 'times_up'  # Ends the game after the turn
+BLACK_SWAN = 'black_swan'  # Reshuffles the discard pile of its deck and draws again
+STARTING_CARD = 'starting_card'  # Drawn from its deck on turn 1 instead of a random card
+DRAGON = 'dragon'  # Put on top of the dragon deck by an advanced dragon peek
+UNMOVABLE = 'unmovable'  # Cannot be moved to the bottom of the deck by an advanced peek
+
+NO_TAGS: FrozenSet[str] = frozenset()
+
+# Card name (lowercase) to the effect tags of the card
+CARD_TAGS: Dict[str, FrozenSet[str]] = {
+    "the end is nigh!": frozenset({END_IS_NIGH}),
+    "time's up!": frozenset({TIMES_UP}),
+    "black swan": frozenset({BLACK_SWAN, UNMOVABLE}),
+    "power overwhelming": frozenset({UNMOVABLE}),
+    "calms of summer": frozenset({STARTING_CARD}),
+    "the misty mountains cold": frozenset({STARTING_CARD}),
+    "there be dragons!": frozenset({DRAGON}),
+}
+
+def card_tags(card: Dict[str, str]) -> FrozenSet[str]:
+    """
+    Returns the effect tags of a card. Deck versions resolve the tags of their cards once when they are created,
+    so game code looks them up by card ID instead (see GameState.card_tags).
+    """
+    return CARD_TAGS.get(card['name'].strip().lower(), NO_TAGS)
+
+# Effect tag to (priority, handler) of the effects resolved in the reveal phase
+REVEAL_EFFECTS: Dict[str, Tuple[int, Callable]] = {}
+
+def reveal_effect(tag: str, priority: int = 0) -> Callable:
+    """
+    Registers the handler of an effect resolved in the reveal phase.
+    Effects with a lower priority are resolved first; effects of the same priority in the order the cards were drawn.
+    """
+    def register(handler: Callable) -> Callable:
+        REVEAL_EFFECTS[tag] = (priority, handler)
+        return handler
+    return register
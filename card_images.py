@@ -0,0 +1,100 @@
+# card_images.py
+
+import io
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Set
+import discord
+
+class CardImageCache:
+    """
+    Keeps recently used card images in memory, least recently used first out, up to max_bytes in total.
+    Card images are named after their content hash and never rewritten, so they are cached by path.
+    Images of the cards that will be revealed next are loaded in the background (see prefetch_next_cards),
+    which moves the disk reads out of /nextturn. The cache only lives in this process and is never shown to anyone,
+    so prefetching does not reveal hidden cards.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.images: 'OrderedDict[str, bytes]' = OrderedDict()  # Image path to image bytes
+        self.total_bytes = 0
+        self.lock = threading.Lock()  # Prefetches read images on worker threads
+        self.prefetch_tasks: Set[asyncio.Task] = set()  # Keeps running prefetches referenced until they finish
+
+    def get(self, path: str) -> Optional[bytes]:
+        """
+        Returns the bytes of an image, reading it from disk if it is not cached. Returns None if it does not exist.
+        """
+        with self.lock:
+            data = self.images.get(path)
+            if data is not None:
+                self.images.move_to_end(path)
+                return data
+        return self.load(path)
+
+    def load(self, path: str) -> Optional[bytes]:
+        """
+        Reads an image from disk and caches it. Returns None if it does not exist.
+        """
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        with self.lock:
+            if path not in self.images and len(data) <= self.max_bytes:
+                self.images[path] = data
+                self.total_bytes += len(data)
+                while self.total_bytes > self.max_bytes:
+                    _, evicted = self.images.popitem(last=False)
+                    self.total_bytes -= len(evicted)
+        return data
+
+    def file(self, path: str, filename: str) -> Optional[discord.File]:
+        """
+        Returns a Discord file of a card image under the given file name, or None if the image does not exist.
+        """
+        data = self.get(path)
+        if data is None:
+            return None
+        return discord.File(io.BytesIO(data), filename=filename)
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        """
+        Loads the images that are not cached yet. Blocking, run it on a worker thread.
+        """
+        with self.lock:
+            missing = [path for path in dict.fromkeys(paths) if path not in self.images]
+        for path in missing:
+            self.load(path)
+        if missing:
+            logging.debug(f"Prefetched {len(missing)} card image(s).")
+
+    def prefetch_next_cards(self, game_state) -> None:
+        """
+        Loads the images of the cards that the next turn will reveal in the background.
+        Only reads the game state (see GameState.upcoming_card_images), so the piles are never changed.
+        """
+        task = asyncio.get_running_loop().create_task(self.prefetch_game_state(game_state))
+        self.prefetch_tasks.add(task)
+        task.add_done_callback(self.prefetch_tasks.discard)
+
+    async def prefetch_game_state(self, game_state) -> None:
+        """
+        Prefetches the images of the cards that the next turn of a game will reveal.
+        """
+        from worker_pool import RemoteGameState  # Imported here, worker_pool indirectly imports this module
+        try:
+            if isinstance(game_state, RemoteGameState):
+                paths = await game_state.call('upcoming_card_images')
+            else:
+                paths = game_state.upcoming_card_images()
+            await asyncio.to_thread(self.prefetch, paths)
+        except Exception as e:
+            logging.warning(f"Failed to prefetch card images for channel {game_state.channel_id}: {e}")
+
+# Shared cache used to send card images
+card_images = CardImageCache()
@@ -3,148 +3,72 @@
 import discord
 import os
 import uuid
-import random
 import logging
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict
 from game_state import GameState
+from game_rules import GameRules
+from card_images import card_images
+from metrics import REVEAL_IMAGE_BYTES
+from tracing import tracer
 
-class CardMechanics:
+class CardMechanics(GameRules):
     """
-    Handles card drawing and special card mechanics.
+    Handles card drawing and special card mechanics, and sends the resulting events to Discord.
+    The rules themselves are in GameRules.
     """
 
     def __init__(self, bot):
         self.bot = bot
 
-    #Retrieves the cards that need to be sent to the discord bot for displaying
     async def handle_drawn_cards(self, interaction: discord.Interaction, game_state: GameState, drawn_cards: List[Tuple[dict, str]], black_swan_triggered: bool):
         """
         Handles the drawn cards during the reveal phase, including special card mechanics.
         """
-        content = f"**Turn {game_state.current_turn} - Phase 2: Reveal Cards**"
-        files = []
-        embeds = []
-        for idx, (card, deck_name) in enumerate(drawn_cards, start=1):
-            embed = discord.Embed(title=card['name'])
-            image_exists = os.path.exists(card['image'])
-            if image_exists:
-                file_extension = os.path.splitext(card['image'])[1]
-                file_name = f"card_{uuid.uuid4().hex}{file_extension}"
-                file = discord.File(card['image'], filename=file_name)
-                embed.set_image(url=f"attachment://{file_name}")
-                files.append(file)
-            else:
-                logging.warning(f"Image not found for card '{card['name']}'")
-            embeds.append(embed)
-
-        # Send the embeds and files in batches of 10 (discord cannot handle more)
-        MAX_EMBEDS_PER_MESSAGE = 10
-        total_embeds = len(embeds)
-        for i in range(0, total_embeds, MAX_EMBEDS_PER_MESSAGE):
-            batch_embeds = embeds[i:i + MAX_EMBEDS_PER_MESSAGE]
-            batch_files = files[i:i + MAX_EMBEDS_PER_MESSAGE]
-            if i == 0:
-                await interaction.followup.send(content=content, files=batch_files, ephemeral=False)
-            else:
-                await interaction.followup.send(content=content, files=batch_files, ephemeral=False)
-
-        # First, handle 'The End is Nigh!' and 'Time's Up!'
-        for card, deck_name in drawn_cards:
-            if card['name'].lower() in ["the end is nigh!", "time's up!"]:
-                await self.handle_special_card(card, interaction, game_state) #if yes, execute special cards method
-                logging.info(f"Processed special card '{card['name']}'. keep_current_turn_cards is now {game_state.keep_current_turn_cards}")
-
-        # Then handle 'Black Swan'
-        for card, deck_name in drawn_cards:
-            if card['name'].lower() == "black swan":
-                if not black_swan_triggered:
-                    black_swan_triggered = True  # Trigger the effect
-                if not game_state.keep_current_turn_cards:
-                    # Move Black Swan to discard pile only if 'The End is Nigh!' is not active
-                    game_state.current_turn_drawn_cards.remove((card, deck_name))
-                    game_state.discard_piles[deck_name].append(card)
-                    logging.info("Black Swan drawn: Moved to discard pile.")
-                else:
-                    logging.info("Black Swan drawn during 'The End is Nigh!': Kept in play.")
-                black_swan_deck_name = deck_name
-
-        # After handling all cards, process Black Swan effect if triggered
-        if black_swan_triggered:
-            await self.process_black_swan_effect(interaction, game_state, black_swan_deck_name)
+        events = self.resolve_drawn_cards(game_state, drawn_cards, black_swan_triggered)
+        await self.send_events(interaction.followup.send, events)
 
-    async def handle_special_card(self, card: dict, interaction: discord.Interaction, game_state: GameState):
+    async def send_events(self, send, events: List[Dict]):
         """
-        Handles special card effects based on the card name.
-        Updates the game state accordingly.
+        Sends the events of a reveal phase to a channel.
+        `send` is a coroutine function accepting the keyword arguments of `interaction.followup.send`.
         """
-        card_name = card['name'].lower()
-        if card_name == "the end is nigh!":
-            await interaction.followup.send(
-                "**The End is Nigh! All other cards played this turn will remain in play until the game ends.**",
-                ephemeral=False
-            )
-            game_state.set_keep_current_turn_cards(True)
-        elif card_name == "time's up!":
-            await interaction.followup.send(
-                "**The game will end after this turn.**",
-                ephemeral=False
-            )
-            game_state.set_end_game_flag(True)
-        # Add more special card effects here as needed
-        
-    async def process_black_swan_effect(self, interaction: discord.Interaction, game_state: GameState, deck_name: str):
-        """
-        Processes the effect of 'Black Swan', reshuffling the Event Deck and drawing a new card.
-        """
-        while True:
-            # Inform players about the Black Swan effect
-            await interaction.followup.send(
-                f"**Black Swan** effect triggered! The discard pile of '{game_state.deck_manager.get_original_deck_name(deck_name)}' has been reshuffled, and a new card is drawn.",
-                ephemeral=False
-            )
+        image_bytes = 0  # Uploaded card images, recorded per reveal phase
+        for event in events:
+            if event['type'] == 'reveal':
+                files = []
+                with tracer.span('load_card_images', cards=len(event['cards'])):
+                    for card in event['cards']:
+                        file_extension = os.path.splitext(card['image'])[1]
+                        file = card_images.file(card['image'], f"card_{uuid.uuid4().hex}{file_extension}")
+                        if file:
+                            files.append(file)
+                            image_bytes += file.fp.getbuffer().nbytes
+                        else:
+                            logging.warning(f"Image not found for card '{card['name']}'")
 
-            # Reshuffle the Event Deck's discard pile back into the draw pile
-            if game_state.discard_piles[deck_name]:
-                game_state.draw_piles[deck_name].extend(game_state.discard_piles[deck_name])
-                game_state.discard_piles[deck_name].clear()
-                random.shuffle(game_state.draw_piles[deck_name])
-                logging.info(f"Deck '{deck_name}' reshuffled due to Black Swan effect.")
-            else:
-                logging.warning(f"Discard pile of deck '{deck_name}' is empty during Black Swan effect.")
-
-            # Draw a new card from the specified deck
-            ## Check if draw piles are not empty
-            if not game_state.draw_piles.get(deck_name):
-                logging.warning(f"Deck '{deck_name}' is empty after reshuffling.")
-                break  # Exit the loop if no cards are left
-            ## Otherwise draw the new card from the draw pile and put it on the in play pile
-            card = game_state.draw_piles[deck_name].pop()
-            game_state.current_turn_drawn_cards.append((card, deck_name))
-            
-            # Send the new drawn card in a separate message
-            embed = discord.Embed(title=f"A new card was drawn from '{game_state.deck_manager.get_original_deck_name(deck_name)}': {card['name']}")
-            image_exists = os.path.exists(card['image'])
-            if image_exists:
+                # Send the files in batches of 10 (discord cannot handle more), one message per 10 drawn cards
+                MAX_FILES_PER_MESSAGE = 10
+                for i in range(0, len(event['cards']), MAX_FILES_PER_MESSAGE):
+                    batch_files = files[i:i + MAX_FILES_PER_MESSAGE]
+                    with tracer.span('discord_send', event='reveal', files=len(batch_files)):
+                        await send(content=event['content'], files=batch_files, ephemeral=False)
+            elif event['type'] == 'message':
+                with tracer.span('discord_send', event='message'):
+                    await send(content=event['content'], ephemeral=False)
+            elif event['type'] == 'card':
+                # Send the new drawn card in a separate message
+                card = event['card']
+                embed = discord.Embed(title=event['title'])
                 file_extension = os.path.splitext(card['image'])[1]
-                file_name = f"card_{uuid.uuid4().hex}{file_extension}"
-                file = discord.File(card['image'], filename=file_name)
-                embed.set_image(url=f"attachment://{file_name}")
-                await interaction.followup.send(embed=embed, file=file, ephemeral=False)
-            else:
-                await interaction.followup.send(embed=embed, ephemeral=False)
-                logging.warning(f"Image not found for card '{card['name']}'")
-
-            # Then check if the new card is another Black Swan
-            if card['name'].lower() == "black swan":
-                if not game_state.keep_current_turn_cards:
-                    # Move Black Swan to discard pile if 'The End is Nigh!' is not active
-                    game_state.current_turn_drawn_cards.remove((card, deck_name))
-                    game_state.discard_piles[deck_name].append(card)
-                    logging.info(f"Another Black Swan drawn from '{deck_name}': Moved to discard pile.")
-                else:
-                    logging.info(f"Another Black Swan drawn from '{deck_name}' during 'The End is Nigh!': Kept in play.")
-                # Continue the loop to process the effect again
-                continue
-            else:
-                # Break out of the loop after processing non-Black Swan card
-                break
\ No newline at end of file
+                with tracer.span('load_card_images', cards=1):
+                    file = card_images.file(card['image'], f"card_{uuid.uuid4().hex}{file_extension}")
+                with tracer.span('discord_send', event='card', files=int(file is not None)):
+                    if file:
+                        image_bytes += file.fp.getbuffer().nbytes
+                        embed.set_image(url=f"attachment://{file.filename}")
+                        await send(embed=embed, file=file, ephemeral=False)
+                    else:
+                        await send(embed=embed, ephemeral=False)
+                        logging.warning(f"Image not found for card '{card['name']}'")
+        if any(event['type'] == 'reveal' for event in events):
+            REVEAL_IMAGE_BYTES.observe(image_bytes)
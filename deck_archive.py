@@ -0,0 +1,205 @@
+# deck_archive.py
+
+import os
+import sys
+import json
+import uuid
+import logging
+import zipfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from deck_manager import DeckManager, CARDS_DIRECTORY, MAX_CARD_IMAGE_BYTES, IMAGE_CHUNK_SIZE, store_card_image
+
+# Name of the manifest inside a deck archive
+MANIFEST_NAME = 'manifest.json'
+# Version of the archive format written by export_deck
+ARCHIVE_FORMAT_VERSION = 1
+# Most cards a single archive may contain
+MAX_ARCHIVE_CARDS = 1000
+# File signatures of the accepted image formats
+IMAGE_SIGNATURES = [b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff', b'GIF87a', b'GIF89a']
+
+def export_deck(deck_manager: DeckManager, deck_key: str, archive_path: str) -> Tuple[bool, str]:
+    """
+    Writes a deck to a zip archive containing a manifest and the card images.
+    Images shared by several cards are stored once.
+    Returns a tuple of (success: bool, message: str).
+    """
+    deck = deck_manager.decks.get(deck_key)
+    if deck is None:
+        return False, "Deck does not exist."
+
+    manifest_cards = []
+    archived_images = {}  # Image path on disk to path inside the archive
+    missing_images = 0
+    with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for card in deck['cards']:
+            image_path = card['image'].replace('\\', os.sep)
+            if image_path not in archived_images:
+                if os.path.exists(image_path):
+                    archived_images[image_path] = f"images/{os.path.basename(image_path)}"
+                    # Images are already compressed, so store them as they are
+                    archive.write(image_path, archived_images[image_path], compress_type=zipfile.ZIP_STORED)
+                else:
+                    archived_images[image_path] = None
+            if archived_images[image_path] is None:
+                missing_images += 1
+                logging.warning(f"Image not found for card '{card['name']}' in deck '{deck['original_name']}'")
+            manifest_cards.append({'name': card['name'], 'image': archived_images[image_path]})
+        manifest = {
+            'format': ARCHIVE_FORMAT_VERSION,
+            'type': deck['type'],
+            'original_name': deck['original_name'],
+            'cards': manifest_cards
+        }
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=4))
+
+    message = f"Exported {len(manifest_cards)} card(s) of deck '{deck['original_name']}'."
+    if missing_images:
+        message += f" {missing_images} card(s) have no image."
+    logging.info(message)
+    return True, message
+
+def extract_card_image(archive_path: str, member_name: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Validates one image of an archive and stores it in the Cards folder.
+    Runs in a worker thread, so it opens its own handle on the archive.
+    Returns a tuple of (image_path, error message).
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        try:
+            info = archive.getinfo(member_name)
+        except KeyError:
+            return None, f"Image '{member_name}' is missing from the archive."
+        if info.file_size > MAX_CARD_IMAGE_BYTES:
+            return None, f"Image '{member_name}' is larger than {MAX_CARD_IMAGE_BYTES // (1024 * 1024)} MB."
+        temp_path = os.path.join(CARDS_DIRECTORY, f"{uuid.uuid4()}.part")
+        try:
+            with archive.open(info) as source, open(temp_path, 'wb') as target:
+                header = source.read(max(len(signature) for signature in IMAGE_SIGNATURES))
+                if not any(header.startswith(signature) for signature in IMAGE_SIGNATURES):
+                    return None, f"'{member_name}' is not a PNG, JPEG or GIF image."
+                target.write(header)
+                for chunk in iter(lambda: source.read(IMAGE_CHUNK_SIZE), b''):
+                    target.write(chunk)
+            return store_card_image(temp_path, member_name), None
+        except (zipfile.BadZipFile, OSError) as e:
+            return None, f"Image '{member_name}' could not be extracted: {e}"
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+def read_deck_archive(archive_path: str, max_workers: Optional[int] = None) -> Tuple[bool, str, Optional[Dict], List[Dict[str, str]], List[str]]:
+    """
+    Reads a deck archive: validates the manifest and extracts the images in a pool of worker threads.
+    Cards whose image cannot be used are skipped and reported as errors.
+    Returns a tuple of (success: bool, message: str, manifest, cards, errors).
+    """
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            manifest = json.loads(archive.read(MANIFEST_NAME))
+    except KeyError:
+        return False, f"The archive has no {MANIFEST_NAME}.", None, [], []
+    except (zipfile.BadZipFile, json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
+        return False, f"The archive could not be read: {e}", None, [], []
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('cards'), list):
+        return False, "The manifest does not contain a list of cards.", None, [], []
+    archive_format = manifest.get('format', ARCHIVE_FORMAT_VERSION)
+    if not isinstance(archive_format, int) or isinstance(archive_format, bool):
+        return False, "The manifest has an invalid format version.", None, [], []
+    if archive_format > ARCHIVE_FORMAT_VERSION:
+        return False, "The archive was created by a newer version of the bot.", None, [], []
+    if not all(isinstance(manifest.get(field, ''), str) for field in ('type', 'original_name')):
+        return False, "The manifest has an invalid deck type or name.", None, [], []
+    if len(manifest['cards']) > MAX_ARCHIVE_CARDS:
+        return False, f"The archive contains more than {MAX_ARCHIVE_CARDS} cards.", None, [], []
+
+    errors = []
+    entries = []  # Tuples of (card name, image member) for the valid entries
+    for index, entry in enumerate(manifest['cards'], start=1):
+        if not isinstance(entry, dict) or not str(entry.get('name', '')).strip():
+            errors.append(f"Card #{index}: missing name.")
+        elif not entry.get('image') or not isinstance(entry['image'], str):
+            errors.append(f"'{entry['name']}': no image in the archive.")
+        else:
+            entries.append((str(entry['name']).strip(), entry['image']))
+
+    # Extract each distinct image once, in parallel
+    os.makedirs(CARDS_DIRECTORY, exist_ok=True)
+    members = list(dict.fromkeys(member for _, member in entries))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(zip(members, executor.map(lambda member: extract_card_image(archive_path, member), members)))
+
+    cards = []
+    for name, member in entries:
+        image_path, error = results[member]
+        if error:
+            errors.append(f"'{name}': {error}")
+        else:
+            cards.append({'name': name, 'image': image_path})
+    return True, f"Read {len(cards)} card(s) from the archive.", manifest, cards, errors
+
+def commit_deck_import(deck_manager: DeckManager, manifest: Dict, cards: List[Dict[str, str]], deck_name: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Writes the imported cards to a deck in a single save.
+    Creates the deck if it does not exist yet, otherwise appends the cards to it (the types must match).
+    Returns a tuple of (success: bool, message: str).
+    """
+    deck_name = (deck_name or manifest.get('original_name') or '').strip()
+    if not deck_name:
+        return False, "The archive does not name the deck. Please provide a deck name."
+    deck_type = manifest.get('type', '')
+    deck_key = deck_manager.get_deck_key(deck_name)
+    if deck_key is None:
+        success, message = deck_manager.create_deck(deck_name, deck_type, cards)
+        if not success:
+            return False, message
+        return True, f"Deck '{deck_name}' created with {len(cards)} card(s)."
+    if deck_manager.decks[deck_key]['type'] != deck_type:
+        return False, f"Deck '{deck_name}' already exists with a different type ('{deck_manager.decks[deck_key]['type']}')."
+    if not cards:
+        return False, "No cards could be imported."
+    success, message = deck_manager.add_cards_to_deck(deck_key, cards)
+    if not success:
+        return False, message
+    return True, f"Added {len(cards)} card(s) to existing deck '{deck_manager.get_original_deck_name(deck_key)}'."
+
+def import_deck(deck_manager: DeckManager, archive_path: str, deck_name: Optional[str] = None) -> Tuple[bool, str, List[str]]:
+    """
+    Imports a deck archive into the deck library.
+    Returns a tuple of (success: bool, message: str, errors: per-card error messages).
+    """
+    success, message, manifest, cards, errors = read_deck_archive(archive_path)
+    if not success:
+        return False, message, errors
+    success, message = commit_deck_import(deck_manager, manifest, cards, deck_name)
+    return success, message, errors
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import or export decks as zip archives (manifest.json plus images).')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='Export a deck to a zip archive.')
+    export_parser.add_argument('deck', help='Name of the deck to export.')
+    export_parser.add_argument('archive', help='Path of the zip archive to write.')
+    import_parser = subparsers.add_parser('import', help='Import a deck from a zip archive.')
+    import_parser.add_argument('archive', help='Path of the zip archive to read.')
+    import_parser.add_argument('--name', default=None, help='Name of the deck (default: the name in the manifest).')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    cli_deck_manager = DeckManager()
+    if args.command == 'export':
+        deck_key = cli_deck_manager.get_deck_key(args.deck)
+        if deck_key is None:
+            print(f"Deck '{args.deck}' does not exist.")
+            sys.exit(1)
+        success, message = export_deck(cli_deck_manager, deck_key, args.archive)
+        print(message)
+    else:
+        success, message, errors = import_deck(cli_deck_manager, args.archive, args.name)
+        print(message)
+        for error in errors:
+            print(f"  - {error}")
+    sys.exit(0 if success else 1)
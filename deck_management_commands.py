@@ -4,11 +4,27 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import asyncio
+import aiohttp
 import os
 import uuid
+import tempfile
 import logging
-from deck_manager import DeckManager
-from utils import sanitize_input, admin_only, admin_or_gamemaster_only
+from typing import Iterable, Optional, Tuple
+from deck_manager import DeckManager, MAX_CARD_IMAGE_BYTES, IMAGE_CHUNK_SIZE, CARDS_DIRECTORY, store_card_image
+import deck_archive
+from utils import admin_only, admin_or_gamemaster_only
+
+# Largest deck archive that can be uploaded to /importdeck
+MAX_ARCHIVE_UPLOAD_BYTES = 25 * 1024 * 1024
+
+def remove_file(path: str) -> bool:
+    """
+    Removes a file if it exists. Returns whether it existed.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+        return True
+    return False
 
 class DeckManagementCommands(commands.Cog):
     """
@@ -17,6 +33,13 @@ class DeckManagementCommands(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.http_session: Optional[aiohttp.ClientSession] = None  # Used to stream uploaded images to disk
+
+    async def cog_load(self):
+        self.http_session = aiohttp.ClientSession()
+
+    async def cog_unload(self):
+        await self.http_session.close()
 
     # General autocomplete method for deck names
     async def deck_name_autocomplete(self, interaction: discord.Interaction, current: str):
@@ -81,10 +104,10 @@ class DeckManagementCommands(commands.Cog):
 
     @app_commands.command(name='addcardtodeck', description='Add a card to a specific deck.')
     @admin_only
-    @app_commands.describe(deck_key='Select the deck', card_name='Name of the card')
-    async def add_card_to_deck(self, interaction: discord.Interaction, deck_key: str, card_name: str):
+    @app_commands.describe(deck_key='Select the deck', card_name='Name of the card', image='Image file of the card')
+    async def add_card_to_deck(self, interaction: discord.Interaction, deck_key: str, card_name: str, image: discord.Attachment):
         """
-        Command to add a new card to a deck. Admins must upload an image for the card.
+        Command to add a new card to a deck. Admins attach the image of the card to the command.
         """
         if deck_key not in self.bot.deck_manager.decks:
             await interaction.response.send_message(f"Deck does not exist.", ephemeral=True)
@@ -92,45 +115,231 @@ class DeckManagementCommands(commands.Cog):
 
         deck_name = self.bot.deck_manager.get_original_deck_name(deck_key)
         card_name_original = card_name.strip()  # Preserve original casing and spaces
-        await interaction.response.send_message(
-            "Please upload the image file for the card as an attachment in your next message.",
-            ephemeral=True
-        )
+        await interaction.response.defer(ephemeral=True)
+
+        image_path, error = await self.save_card_image(image)
+        if error:
+            await interaction.followup.send(f"{error} Please try the command again.", ephemeral=True)
+            return
+        new_card = {'name': card_name_original, 'image': image_path}
+        success, message = self.bot.deck_manager.add_card_to_deck(deck_key, new_card)
+        if success:
+            await interaction.followup.send(f"Card '{card_name_original}' added to deck '{deck_name}'.", ephemeral=True)
+            logging.info(f"{interaction.user} added card '{card_name_original}' to deck '{deck_name}'.")
+        else:
+            await self.delete_unused_images([image_path])
+            await interaction.followup.send(f"Failed to add card to deck '{deck_name}': {message}", ephemeral=True)
+
+    @app_commands.command(name='addcardstodeck', description='Add several cards to a specific deck at once.')
+    @admin_only
+    @app_commands.describe(
+        deck_key='Select the deck',
+        card_names='Names of the cards, comma separated in the order of the images (default: the file names)',
+        image_1='Image file of the first card'
+    )
+    async def add_cards_to_deck(
+        self, interaction: discord.Interaction, deck_key: str, image_1: discord.Attachment,
+        image_2: Optional[discord.Attachment] = None, image_3: Optional[discord.Attachment] = None,
+        image_4: Optional[discord.Attachment] = None, image_5: Optional[discord.Attachment] = None,
+        image_6: Optional[discord.Attachment] = None, image_7: Optional[discord.Attachment] = None,
+        image_8: Optional[discord.Attachment] = None, image_9: Optional[discord.Attachment] = None,
+        image_10: Optional[discord.Attachment] = None, card_names: Optional[str] = None
+    ):
+        """
+        Command to add up to 10 cards to a deck in one go. The deck is saved once for all cards.
+        """
+        if deck_key not in self.bot.deck_manager.decks:
+            await interaction.response.send_message(f"Deck does not exist.", ephemeral=True)
+            return
+
+        deck_name = self.bot.deck_manager.get_original_deck_name(deck_key)
+        images = [image for image in (image_1, image_2, image_3, image_4, image_5, image_6, image_7, image_8, image_9, image_10) if image]
+        if card_names:
+            names = [name.strip() for name in card_names.split(',')]
+            if len(names) != len(images) or not all(names):
+                await interaction.response.send_message(
+                    f"Got {len(names)} card name(s) for {len(images)} image(s). Please provide one name per image.",
+                    ephemeral=True
+                )
+                return
+        else:
+            names = [os.path.splitext(image.filename)[0].replace('_', ' ').strip() for image in images]
+        await interaction.response.defer(ephemeral=True)
+
+        new_cards = []
+        errors = []
+        for name, image in zip(names, images):
+            image_path, error = await self.save_card_image(image)
+            if error:
+                errors.append(f"'{name}': {error}")
+            else:
+                new_cards.append({'name': name, 'image': image_path})
+
+        report = []
+        if new_cards:
+            success, message = self.bot.deck_manager.add_cards_to_deck(deck_key, new_cards)
+            if success:
+                report.append(f"Added {len(new_cards)} card(s) to deck '{deck_name}': {', '.join(card['name'] for card in new_cards)}.")
+                logging.info(f"{interaction.user} added {len(new_cards)} card(s) to deck '{deck_name}'.")
+            else:
+                await self.delete_unused_images(card['image'] for card in new_cards)
+                report.append(f"Failed to add cards to deck '{deck_name}': {message}")
+        if errors:
+            report.append("Not added:\n" + '\n'.join(f"- {error}" for error in errors))
+        await interaction.followup.send('\n'.join(report), ephemeral=True)
+
+    async def save_card_image(self, attachment: discord.Attachment) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Streams an uploaded card image to the Cards folder.
+        Images are named after their content hash, so uploading the same image twice stores it once.
+        Returns a tuple of (image_path, error message).
+        """
+        if not attachment.content_type or not attachment.content_type.startswith('image/'):
+            return None, "The attachment is not an image."
 
-        def check(m):
-            return m.author == interaction.user and m.channel == interaction.channel and m.attachments
+        loop = asyncio.get_running_loop()
+        temp_path = os.path.join(CARDS_DIRECTORY, f"{uuid.uuid4()}.part")
+        try:
+            await loop.run_in_executor(None, lambda: os.makedirs(CARDS_DIRECTORY, exist_ok=True))
+            error = await self.download_attachment(attachment, temp_path, MAX_CARD_IMAGE_BYTES)
+            if error:
+                return None, error
+            return await loop.run_in_executor(None, store_card_image, temp_path, attachment.filename), None
+        except OSError as e:
+            logging.error(f"Failed to save image '{attachment.filename}': {e}")
+            return None, "The image could not be saved."
+        finally:
+            await loop.run_in_executor(None, remove_file, temp_path)
+
+    def is_image_in_use(self, image_path: str) -> bool:
+        """
+        Returns whether a card of a deck or of a running game uses an image. Running games keep the deck versions
+        they started with, so they can still reveal cards that have been removed from the decks since.
+        If some games are not held by this process (worker processes, or shards that are not loaded yet),
+        every image is considered in use.
+        """
+        if self.bot.worker_pool or not self.bot.is_ready():
+            return True
+        game_deck_versions = [deck_info for game_state in list(self.bot.game_states.values()) for deck_info in game_state.deck_versions.values()]
+        return self.bot.deck_manager.is_image_in_use(image_path, game_deck_versions)
 
+    async def delete_unused_images(self, image_paths: Iterable[str]) -> None:
+        """
+        Deletes the card images that no card of a deck or of a running game uses, in the executor.
+        Images are shared by cards with identical uploads, so an image is only deleted once its last card is gone.
+        """
+        loop = asyncio.get_running_loop()
+        for image_path in dict.fromkeys(image_paths):
+            if self.is_image_in_use(image_path):
+                continue
+            try:
+                if await loop.run_in_executor(None, remove_file, image_path):
+                    logging.info(f"Image file '{image_path}' deleted.")
+            except OSError as e:
+                logging.error(f"Failed to delete image '{image_path}': {e}")
+
+    async def download_attachment(self, attachment: discord.Attachment, target_path: str, max_bytes: int) -> Optional[str]:
+        """
+        Streams an attachment to a file in chunks, without holding it in memory.
+        Returns an error message, or None if the download succeeded.
+        """
+        too_large = f"The file is larger than {max_bytes // (1024 * 1024)} MB."
+        if attachment.size > max_bytes:
+            return too_large
+        loop = asyncio.get_running_loop()
         try:
-            message = await self.bot.wait_for('message', timeout=60.0, check=check)
-            if not message.attachments:
-                await interaction.followup.send("No attachment detected. Please try the command again.", ephemeral=True)
+            size = 0
+            async with self.http_session.get(attachment.url) as response:
+                if response.status != 200:
+                    return "The file could not be downloaded."
+                with open(target_path, 'wb') as file:
+                    async for chunk in response.content.iter_chunked(IMAGE_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > max_bytes:
+                            return too_large
+                        await loop.run_in_executor(None, file.write, chunk)
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            logging.error(f"Failed to download attachment '{attachment.filename}': {e}")
+            return "The file could not be downloaded."
+
+    @app_commands.command(name='exportdeck', description='Export a deck and its card images as a zip archive.')
+    @admin_only
+    @app_commands.describe(deck_key='Select the deck')
+    async def export_deck(self, interaction: discord.Interaction, deck_key: str):
+        """
+        Command to export a deck as a zip archive with a manifest and the card images.
+        """
+        if deck_key not in self.bot.deck_manager.decks:
+            await interaction.response.send_message(f"Deck does not exist.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        with tempfile.TemporaryDirectory() as temp_directory:
+            archive_path = os.path.join(temp_directory, f"{deck_key}.zip")
+            success, message = await asyncio.get_running_loop().run_in_executor(
+                None, deck_archive.export_deck, self.bot.deck_manager, deck_key, archive_path
+            )
+            if not success:
+                await interaction.followup.send(f"Failed to export deck: {message}", ephemeral=True)
                 return
-            if len(message.attachments) > 1:
-                await interaction.followup.send("Multiple attachments detected. Please upload only one image file.", ephemeral=True)
+            size_limit = interaction.guild.filesize_limit if interaction.guild else MAX_ARCHIVE_UPLOAD_BYTES
+            if os.path.getsize(archive_path) > size_limit:
+                await interaction.followup.send(
+                    f"The archive is too large to upload to Discord. Use `python deck_archive.py export` on the server instead.",
+                    ephemeral=True
+                )
                 return
-            attachment = message.attachments[0]
-            if not attachment.content_type.startswith('image/'):
-                await interaction.followup.send("The attachment is not an image. Please try the command again.", ephemeral=True)
+            await interaction.followup.send(message, file=discord.File(archive_path), ephemeral=True)
+        logging.info(f"{interaction.user} exported deck '{self.bot.deck_manager.get_original_deck_name(deck_key)}'.")
+
+    @export_deck.autocomplete('deck_key')
+    async def export_deck_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await self.deck_name_autocomplete(interaction, current)
+
+    @app_commands.command(name='importdeck', description='Import a deck from a zip archive with a manifest and card images.')
+    @admin_only
+    @app_commands.describe(archive='Zip archive created by /exportdeck', deck_name='Name of the deck (default: the name in the archive)')
+    async def import_deck(self, interaction: discord.Interaction, archive: discord.Attachment, deck_name: Optional[str] = None):
+        """
+        Command to import a whole deck in one go. Images are processed in parallel and the deck is written once.
+        Cards that cannot be imported are reported.
+        """
+        if not archive.filename.lower().endswith('.zip'):
+            await interaction.response.send_message("Please attach a .zip archive.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory() as temp_directory:
+            archive_path = os.path.join(temp_directory, 'deck.zip')
+            error = await self.download_attachment(archive, archive_path, MAX_ARCHIVE_UPLOAD_BYTES)
+            if error:
+                await interaction.followup.send(error, ephemeral=True)
                 return
-            os.makedirs('Cards', exist_ok=True)
-            name, extension = os.path.splitext(attachment.filename)
-            unique_filename = f"{uuid.uuid4()}_{sanitize_input(name)}{extension}"
-            image_path = os.path.join('Cards', unique_filename)
-            await attachment.save(image_path)
-            new_card = {'name': card_name_original, 'image': image_path}
-            success, message = self.bot.deck_manager.add_card_to_deck(deck_key, new_card)
-            if success:
-                await interaction.followup.send(f"Card '{card_name_original}' added to deck '{deck_name}'.", ephemeral=True)
-                logging.info(f"{interaction.user} added card '{card_name_original}' to deck '{deck_name}'.")
-            else:
-                await interaction.followup.send(f"Failed to add card to deck '{deck_name}': {message}", ephemeral=True)
-        except asyncio.TimeoutError:
-            await interaction.followup.send("You took too long to upload the image. Please try the command again.", ephemeral=True)
+            success, message, manifest, cards, errors = await loop.run_in_executor(None, deck_archive.read_deck_archive, archive_path)
+        if success:
+            # The deck library is only changed on the event loop, in a single write
+            success, message = deck_archive.commit_deck_import(self.bot.deck_manager, manifest, cards, deck_name)
+            if not success:
+                await self.delete_unused_images(card['image'] for card in cards)
+
+        report = message if success else f"Failed to import deck: {message}"
+        if errors:
+            report += f"\n{len(errors)} card(s) could not be imported:\n" + '\n'.join(f"- {error}" for error in errors)
+        if len(report) > 2000:
+            report = report[:1997] + "..."
+        await interaction.followup.send(report, ephemeral=True)
+        logging.info(f"{interaction.user} imported a deck archive: {message} ({len(errors)} error(s)).")
 
     @add_card_to_deck.autocomplete('deck_key')
     async def add_card_to_deck_autocomplete(self, interaction: discord.Interaction, current: str):
         return await self.deck_name_autocomplete(interaction, current)
 
+    @add_cards_to_deck.autocomplete('deck_key')
+    async def add_cards_to_deck_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await self.deck_name_autocomplete(interaction, current)
+
     @app_commands.command(name='listdecks', description='List all available decks.')
     async def list_decks(self, interaction: discord.Interaction):
         """
@@ -263,10 +472,8 @@ class DeckManagementCommands(commands.Cog):
         card_name_original = card_name.strip()  # Preserve original casing and spaces
         success, message, image_path = self.bot.deck_manager.remove_card_from_deck(deck_key, card_name_original)
         if success:
-            # Optionally, delete the image file
-            if image_path and os.path.exists(image_path):
-                os.remove(image_path)
-                logging.info(f"Image file '{image_path}' deleted.")
+            if image_path:
+                await self.delete_unused_images([image_path])
             await interaction.response.send_message(message, ephemeral=True)
         else:
             await interaction.response.send_message(message, ephemeral=True)
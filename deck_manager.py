@@ -2,9 +2,80 @@
 
 import os
 import json
+import hashlib
 import logging
-from typing import List, Tuple, Dict, Optional
+from itertools import chain
+from types import MappingProxyType
+from typing import Iterable, List, Tuple, Dict, Optional, Mapping
 from utils import sanitize_input
+from card_effects import card_tags
+from pile import card_index
+
+# Folder that stores the card images
+CARDS_DIRECTORY = 'Cards'
+# Largest card image that can be uploaded or imported
+MAX_CARD_IMAGE_BYTES = 8 * 1024 * 1024
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+def hash_file(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(IMAGE_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def card_image_path(digest: str, filename: str) -> str:
+    """
+    Returns the path a card image is stored at. Images are named after their content hash,
+    so the same image uploaded or imported twice is stored once.
+    """
+    name, extension = os.path.splitext(os.path.basename(filename))
+    return os.path.join(CARDS_DIRECTORY, f"{digest[:32]}_{sanitize_input(name)}{extension.lower()}")
+
+def store_card_image(temp_path: str, filename: str) -> str:
+    """
+    Moves a downloaded image into the Cards folder under its content hash, unless the same image is stored already.
+    Returns the path of the stored image. Does blocking file I/O, so the bot calls it in the executor.
+    """
+    image_path = card_image_path(hash_file(temp_path), filename)
+    if os.path.exists(image_path):
+        logging.info(f"Image '{filename}' already stored as '{image_path}'.")
+    else:
+        os.replace(temp_path, image_path)
+    return image_path
+
+def make_card(card: Dict[str, str]) -> Dict[str, str]:
+    """
+    Creates the card dictionary stored in a deck. Cards are shared by reference between deck versions
+    and running games, so they must never be modified after creation.
+    """
+    return {'name': card['name'], 'image': card['image']}
+
+def make_deck_version(deck_type: str, original_name: str, cards, version: int = 1) -> Mapping:
+    """
+    Creates an immutable deck version. Changing a deck creates a new version instead of modifying this one,
+    so running games can keep a reference to the version they started with.
+    The effect tags of the cards are resolved here once, 'effects' holds them by card ID.
+    'card_index' maps the card objects to their card IDs and is shared by the piles of every game using this version.
+    """
+    cards = tuple(cards)
+    return MappingProxyType({
+        'type': deck_type,
+        'original_name': original_name,
+        'cards': cards,
+        'effects': tuple(card_tags(card) for card in cards),
+        'card_index': card_index(cards),
+        'version': version
+    })
+
+def new_deck_version(deck: Mapping, cards: Tuple[Dict[str, str], ...]) -> Mapping:
+    """
+    Creates the next version of a deck with a new list of cards.
+    """
+    return make_deck_version(deck['type'], deck['original_name'], cards, deck['version'] + 1)
 
 class DeckManager:
     """
@@ -17,10 +88,11 @@ class DeckManager:
         os.makedirs(self.decks_directory, exist_ok=True)
         self.decks = self.load_all_deck_keys()
 
-    def load_all_deck_keys(self) -> Dict[str, Dict]:
+    def load_all_deck_keys(self) -> Dict[str, Mapping]:
         """
         Loads all decks from the decks directory.
         Each deck is expected to have a 'type', 'original_name', and a list of 'cards'.
+        Decks are loaded as immutable deck versions, see make_deck_version.
         """
         decks = {}
         for filename in os.listdir(self.decks_directory):
@@ -31,11 +103,7 @@ class DeckManager:
                         data = json.load(file)
                         deck_type = data.get('type', 'custom')
                         original_name = data.get('original_name', deck_key)
-                        decks[deck_key] = {
-                            'type': deck_type,
-                            'original_name': original_name,
-                            'cards': data.get('cards', [])
-                        }
+                        decks[deck_key] = make_deck_version(deck_type, original_name, data.get('cards', []), data.get('version', 1))
                         logging.info(f"Loaded deck '{original_name}' of type '{deck_type}' with {len(decks[deck_key]['cards'])} cards.")
                 except (json.JSONDecodeError, IOError) as e:
                     logging.error(f"Failed to load deck '{deck_key}': {e}")
@@ -43,23 +111,34 @@ class DeckManager:
 
     def save_deck(self, deck_key: str) -> None:
         """
-        Saves a specific deck to its JSON file.
+        Saves a specific deck to its JSON file atomically.
         Includes type, original name, and list of cards.
         """
+        deck_file = os.path.join(self.decks_directory, f"{deck_key}.json")
+        temp_file = deck_file + ".tmp"
         try:
-            with open(os.path.join(self.decks_directory, f"{deck_key}.json"), 'w') as file:
+            with open(temp_file, 'w') as file:
                 json.dump({
                     'type': self.decks[deck_key]['type'],
                     'original_name': self.decks[deck_key]['original_name'],
-                    'cards': self.decks[deck_key]['cards']
+                    'cards': list(self.decks[deck_key]['cards']),
+                    'version': self.decks[deck_key]['version']
                 }, file, indent=4)
+            os.replace(temp_file, deck_file)
             logging.info(f"Deck '{self.decks[deck_key]['original_name']}' of type '{self.decks[deck_key]['type']}' saved with {len(self.decks[deck_key]['cards'])} cards.")
         except IOError as e:
             logging.error(f"Failed to save deck '{deck_key}': {e}")
 
-    def create_deck(self, deck_name: str, deck_type: str) -> Tuple[bool, str]:
+    def commit_deck(self, deck_key: str, deck: Mapping) -> None:
         """
-        Creates a new deck with the given name and type.
+        Replaces a deck by a new version and persists it.
+        """
+        self.decks[deck_key] = deck
+        self.save_deck(deck_key)
+
+    def create_deck(self, deck_name: str, deck_type: str, cards: Optional[List[Dict[str, str]]] = None) -> Tuple[bool, str]:
+        """
+        Creates a new deck with the given name and type, optionally filled with cards (saved in a single write).
         Allows multiple decks of the same predefined type.
         Returns a tuple of (success: bool, message: str).
         """
@@ -75,12 +154,7 @@ class DeckManager:
             logging.error(f"Invalid deck type '{deck_type}' provided.")
             return False, f"Invalid deck type. Choose from: {', '.join(predefined_types)}."
 
-        self.decks[deck_key] = {
-            'type': deck_type,
-            'original_name': deck_name,
-            'cards': []
-        }
-        self.save_deck(deck_key)
+        self.commit_deck(deck_key, make_deck_version(deck_type, deck_name, (make_card(card) for card in cards or [])))
         logging.info(f"Deck '{deck_name}' of type '{deck_type}' created.")
         return True, "Deck created successfully."
 
@@ -117,14 +191,25 @@ class DeckManager:
             logging.error(f"Attempted to add card to non-existent deck '{deck_name}'.")
             return False, "Deck does not exist."
 
-        self.decks[deck_key]['cards'].append({
-            'name': card['name'],
-            'image': card['image']
-        })
-        self.save_deck(deck_key)
+        self.commit_deck(deck_key, new_deck_version(self.decks[deck_key], self.decks[deck_key]['cards'] + (make_card(card),)))
         logging.info(f"Card '{card['name']}' added to deck '{self.decks[deck_key]['original_name']}'.")
         return True, "Card added successfully."
 
+    def add_cards_to_deck(self, deck_name: str, cards: List[Dict[str, str]]) -> Tuple[bool, str]:
+        """
+        Adds several cards to a specific deck and saves the deck once.
+        Returns a tuple of (success: bool, message: str).
+        """
+        deck_key = sanitize_input(deck_name)
+        if deck_key not in self.decks:
+            logging.error(f"Attempted to add cards to non-existent deck '{deck_name}'.")
+            return False, "Deck does not exist."
+
+        new_cards = tuple(make_card(card) for card in cards)
+        self.commit_deck(deck_key, new_deck_version(self.decks[deck_key], self.decks[deck_key]['cards'] + new_cards))
+        logging.info(f"{len(cards)} card(s) added to deck '{self.decks[deck_key]['original_name']}'.")
+        return True, "Cards added successfully."
+
     def remove_card_from_deck(self, deck_name: str, card_name: str) -> Tuple[bool, str, Optional[str]]:
         """
         Removes a card from a specific deck by name.
@@ -135,18 +220,18 @@ class DeckManager:
             logging.error(f"Attempted to remove card from non-existent deck '{deck_key}'.")
             return False, "Deck does not exist.", None
 
-        for card in self.decks[deck_key]['cards']:
+        deck_cards = self.decks[deck_key]['cards']
+        for index, card in enumerate(deck_cards):
             if card['name'].strip().lower() == card_name.strip().lower():
-                self.decks[deck_key]['cards'].remove(card)
                 image_path = card.get('image')
-                self.save_deck(deck_key)
+                self.commit_deck(deck_key, new_deck_version(self.decks[deck_key], deck_cards[:index] + deck_cards[index + 1:]))
                 logging.info(f"Card '{card_name}' removed from deck '{self.decks[deck_key]['original_name']}'.")
                 return True, f"Card '{card_name}' removed from deck '{self.decks[deck_key]['original_name']}'.", image_path
 
         logging.warning(f"Attempted to remove non-existent card '{card_name}' from deck '{deck_name}'.")
         return False, f"Card '{card_name}' does not exist in deck '{self.decks[deck_key]['original_name']}'.", None
 
-    def get_deck_cards(self, deck_name: str) -> Optional[List[Dict[str, str]]]:
+    def get_deck_cards(self, deck_name: str) -> Optional[Tuple[Dict[str, str], ...]]:
         """
         Retrieves all cards from a specific deck.
         """
@@ -181,4 +266,10 @@ class DeckManager:
             original_name_normalized = sanitize_input(deck['original_name'])
             if deck_name_normalized == original_name_normalized:
                 return key
-        return None
\ No newline at end of file
+        return None
+
+    def is_image_in_use(self, image_path: str, deck_versions: Iterable[Mapping] = ()) -> bool:
+        """
+        Returns whether any card in any deck, or in the given deck versions (e.g. those of running games), uses the given image.
+        """
+        return any(card.get('image') == image_path for deck in chain(self.decks.values(), deck_versions) for card in deck['cards'])
@@ -0,0 +1,100 @@
+# diagnostics_commands.py
+
+import io
+import time
+import pstats
+import asyncio
+import logging
+import cProfile
+import tracemalloc
+import discord
+from discord.ext import commands
+from discord import app_commands
+from utils import admin_only, get_resident_memory_mb
+from memory_report import format_memory_report
+
+class DiagnosticsCommands(commands.Cog):
+    """
+    Admin commands to diagnose the performance of the running bot.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.profile_lock = asyncio.Lock()  # Only one profiling session can run at a time
+
+    @app_commands.command(name='profile', description='Profile the bot for a number of seconds and attach the report.')
+    @admin_only
+    @app_commands.describe(
+        seconds='How long to profile',
+        top='Number of functions (and allocation sites) in the report',
+        allocations='Also report where memory was allocated (slower while profiling)'
+    )
+    async def profile(self, interaction: discord.Interaction, seconds: app_commands.Range[int, 1, 300],
+                      top: app_commands.Range[int, 5, 200] = 40, allocations: bool = False):
+        """
+        Runs cProfile on the event loop thread for the requested window, which covers every command and turn
+        handled in the meantime. Nothing is profiled outside of a session.
+        """
+        if self.profile_lock.locked():
+            await interaction.response.send_message("A profiling session is already running.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        async with self.profile_lock:
+            logging.info(f"{interaction.user} started profiling for {seconds}s (allocations: {allocations}).")
+            report = await self.run_profile(seconds, top, allocations)
+        file = discord.File(io.BytesIO(report.encode('utf-8')), filename=f"profile_{int(time.time())}.txt")
+        await interaction.followup.send(f"Profile of the last {seconds}s:", file=file, ephemeral=True)
+
+    @app_commands.command(name='botstats', description='Show the approximate memory of the games, decks and caches.')
+    @admin_only
+    @app_commands.describe(top='Number of games listed in the message (all of them are in the attached report)')
+    async def botstats(self, interaction: discord.Interaction, top: app_commands.Range[int, 1, 25] = 10):
+        """
+        Measures every game, deck and cache, and warns about views that are still open after their game ended.
+        The sizes are approximate: they follow what each object references, counting shared decks once.
+        """
+        await interaction.response.defer(ephemeral=True)
+        report = await self.bot.memory_reports.refresh()
+        deck_names = {deck_key: self.bot.deck_manager.get_original_deck_name(deck_key) for deck_key in report['decks']}
+        resident = get_resident_memory_mb()
+        header = [f"**Resident memory:** {resident:.1f} MB" if resident is not None else "**Resident memory:** unknown"]
+        summary = '\n'.join(header + format_memory_report(report, deck_names, top))
+        if len(report['games']) <= top and len(summary) <= 2000:
+            await interaction.followup.send(summary, ephemeral=True)
+            return
+        # Too long for a message: the summary stays short and the full report is attached
+        full_report = '\n'.join(header + format_memory_report(report, deck_names, len(report['games']) + len(report['leaked_views'])))
+        file = discord.File(io.BytesIO(full_report.encode('utf-8')), filename=f"botstats_{int(time.time())}.txt")
+        await interaction.followup.send(summary[:2000], file=file, ephemeral=True)
+
+    async def run_profile(self, seconds: int, top: int, allocations: bool) -> str:
+        """
+        Profiles the event loop for the given number of seconds and returns the report.
+        """
+        trace_allocations = allocations and not tracemalloc.is_tracing()  # Leave a session started elsewhere alone
+        if trace_allocations:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot() if allocations else None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+            after = tracemalloc.take_snapshot() if allocations else None
+            if trace_allocations:
+                tracemalloc.stop()
+
+        stream = io.StringIO()
+        stream.write(f"Profile of {seconds}s, top {top} functions\n\n")
+        stats = pstats.Stats(profiler, stream=stream).strip_dirs()
+        stream.write("=== By cumulative time ===\n")
+        stats.sort_stats('cumulative').print_stats(top)
+        stream.write("=== By own time ===\n")
+        stats.sort_stats('tottime').print_stats(top)
+        if allocations:
+            stream.write(f"=== Allocation growth by line, top {top} ===\n")
+            ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+            for difference in after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')[:top]:
+                stream.write(f"{difference}\n")
+        return stream.getvalue()
@@ -0,0 +1,279 @@
+# fake_discord.py
+
+import random
+import asyncio
+import itertools
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+import discord
+from discord import app_commands
+from turn_scheduler import TurnScheduler
+
+# Rate limited requests are retried this often before failing, like the discord.py HTTP client does
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Snowflake IDs of the fake objects, unique within the process
+snowflakes = itertools.count(discord.utils.time_snowflake(datetime(2024, 1, 1, tzinfo=timezone.utc)))
+
+class FakeTransport:
+    """
+    Stands in for the Discord HTTP API: every send, defer and edit of the fake objects goes through request().
+    Counts the calls per kind, optionally keeps them, and injects latency and rate limits (HTTP 429)
+    that are retried after retry_after seconds.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_limit_chance: float = 0.0,
+                 retry_after: float = 0.05, record_calls: bool = False, seed: int = 0):
+        self.latency = latency  # Seconds every request takes
+        self.jitter = jitter  # Up to this many seconds are added at random
+        self.rate_limit_chance = rate_limit_chance  # Chance that a request is answered with a 429
+        self.retry_after = retry_after
+        self.record_calls = record_calls
+        self.random = random.Random(seed)
+        self.call_counts: Counter = Counter()  # Kind of request to number of requests
+        self.calls: List[Tuple[str, int, Dict]] = []  # (kind, target ID, keyword arguments) if record_calls is set
+        self.rate_limited = 0  # Requests answered with a 429
+
+    async def request(self, kind: str, target_id: int, **kwargs) -> None:
+        """
+        Performs a fake API request.
+        """
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            if self.latency or self.jitter:
+                await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+            if self.random.random() >= self.rate_limit_chance:
+                break
+            self.rate_limited += 1
+            await asyncio.sleep(self.retry_after)
+        else:
+            raise discord.HTTPException(SimpleNamespace(status=429, reason='Too Many Requests'), 'You are being rate limited.')
+        self.call_counts[kind] += 1
+        if self.record_calls:
+            self.calls.append((kind, target_id, kwargs))
+
+class FakeMessage:
+    """
+    A message sent through the fake transport. Only the components are kept, so views can be clicked.
+    """
+
+    def __init__(self, transport: FakeTransport, channel_id: int, content: Optional[str] = None, view: Optional[discord.ui.View] = None):
+        self.transport = transport
+        self.id = next(snowflakes)
+        self.channel_id = channel_id
+        self.content = content
+        self.view = view
+
+    async def edit(self, **kwargs) -> 'FakeMessage':
+        await self.transport.request('edit_message', self.id, **kwargs)
+        if 'view' in kwargs:
+            self.view = kwargs['view']
+        return self
+
+class FakeMessageable:
+    """
+    Something messages can be sent to. Keeps the last message, so the harness can click its view.
+    """
+    kind = 'send'
+
+    def __init__(self, transport: FakeTransport):
+        self.transport = transport
+        self.id = next(snowflakes)
+        self.last_message: Optional[FakeMessage] = None
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        await self.transport.request(self.kind, self.id, content=content, **kwargs)
+        self.last_message = FakeMessage(self.transport, self.id, content, kwargs.get('view'))
+        return self.last_message
+
+class FakeRole:
+    def __init__(self, name: str):
+        self.id = next(snowflakes)
+        self.name = name
+
+class FakeGuild:
+    def __init__(self, name: str, roles: List[FakeRole]):
+        self.id = next(snowflakes)
+        self.name = name
+        self.roles = roles
+        self.channels: Dict[int, 'FakeChannel'] = {}
+
+    def get_channel(self, channel_id: int) -> Optional['FakeChannel']:
+        return self.channels.get(channel_id)
+
+class FakeChannel(FakeMessageable):
+    """
+    A text channel of a fake guild.
+    """
+    kind = 'channel_send'
+
+    def __init__(self, transport: FakeTransport, guild: FakeGuild, name: str, category_id: Optional[int] = None):
+        super().__init__(transport)
+        self.guild = guild
+        self.name = name
+        self.category_id = category_id
+        self.mention = f"<#{self.id}>"
+        guild.channels[self.id] = self
+
+    def __str__(self) -> str:
+        return self.name
+
+class FakeMember(FakeMessageable):
+    """
+    A guild member. Sending to a member is a DM, which fails with Forbidden if the member has closed their DMs.
+    """
+    kind = 'dm'
+
+    def __init__(self, transport: FakeTransport, name: str, administrator: bool = False, roles: Tuple[FakeRole, ...] = (), dms_closed: bool = False):
+        super().__init__(transport)
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{self.id}>"
+        self.guild_permissions = SimpleNamespace(administrator=administrator)
+        self.roles = {role.id: role for role in roles}
+        self.dms_closed = dms_closed
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self.roles.get(role_id)
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        if self.dms_closed:
+            await self.transport.request('dm_forbidden', self.id)
+            raise discord.Forbidden(SimpleNamespace(status=403, reason='Forbidden'), 'Cannot send messages to this user')
+        return await super().send(content, **kwargs)
+
+    def __str__(self) -> str:
+        return self.name
+
+class FakeResponse:
+    """
+    Stands in for `interaction.response`: an interaction can be answered once.
+    """
+
+    def __init__(self, interaction: 'FakeInteraction'):
+        self.interaction = interaction
+        self.done = False
+        self.message: Optional[FakeMessage] = None
+
+    def is_done(self) -> bool:
+        return self.done
+
+    def mark_done(self) -> None:
+        if self.done:
+            raise discord.InteractionResponded(self.interaction)
+        self.done = True
+
+    async def send_message(self, content: Optional[str] = None, **kwargs) -> None:
+        self.mark_done()
+        await self.interaction.transport.request('response', self.interaction.id, content=content, **kwargs)
+        self.message = FakeMessage(self.interaction.transport, self.interaction.channel_id, content, kwargs.get('view'))
+
+    async def defer(self, **kwargs) -> None:
+        self.mark_done()
+        await self.interaction.transport.request('defer', self.interaction.id, **kwargs)
+
+class FakeFollowup:
+    """
+    Stands in for `interaction.followup`, usable once the interaction has been answered.
+    """
+
+    def __init__(self, interaction: 'FakeInteraction'):
+        self.interaction = interaction
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        if not self.interaction.response.done:
+            raise discord.NotFound(SimpleNamespace(status=404, reason='Not Found'), 'Unknown Webhook')
+        await self.interaction.transport.request('followup', self.interaction.id, content=content, **kwargs)
+        return FakeMessage(self.interaction.transport, self.interaction.channel_id, content, kwargs.get('view'))
+
+class FakeInteraction:
+    """
+    Stands in for `discord.Interaction` of a slash command or a component in a guild channel.
+    """
+
+    def __init__(self, transport: FakeTransport, user: FakeMember, channel: FakeChannel,
+                 namespace: Optional[Dict[str, Any]] = None, data: Optional[Dict] = None):
+        self.transport = transport
+        self.id = next(snowflakes)
+        self.created_at = discord.utils.utcnow()
+        self.user = user
+        self.channel = channel
+        self.channel_id = channel.id
+        self.guild = channel.guild
+        self.guild_id = channel.guild.id
+        self.namespace = SimpleNamespace(**(namespace or {}))
+        self.data = data or {}
+        self.command: Optional[app_commands.Command] = None
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def original_response(self) -> FakeMessage:
+        return self.response.message
+
+class FakeBot:
+    """
+    Stands in for MyBot when the cogs are driven without a gateway. Commands are invoked the way the command tree does:
+    checks first, then the callback, then the save of on_app_command_completion.
+    """
+
+    def __init__(self, deck_manager, schedules_file: str, save=None):
+        self.deck_manager = deck_manager
+        self.game_states = {}
+        self.worker_pool = None
+        self.turn_scheduler = TurnScheduler(self.fire_automatic_turn, schedules_file)
+        self.cogs: Dict[str, Any] = {}
+        self.channels: Dict[int, FakeChannel] = {}
+        self.save = save  # Called with the guild ID after every command, like MyBot.save_game_states
+
+    def add_cog(self, cog) -> None:
+        self.cogs[cog.qualified_name] = cog
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channels.get(channel_id)
+
+    async def fetch_channel(self, channel_id: int) -> FakeChannel:
+        if channel_id not in self.channels:
+            raise discord.NotFound(SimpleNamespace(status=404, reason='Not Found'), 'Unknown Channel')
+        return self.channels[channel_id]
+
+    def is_ready(self) -> bool:
+        return True
+
+    async def save_game_states(self, guild_id: Optional[int] = None) -> None:
+        if self.save:
+            self.save(guild_id)
+
+    async def fire_automatic_turn(self, channel_id: int) -> None:
+        await self.cogs['TurnManager'].fire_automatic_turn(channel_id)
+
+    async def invoke(self, cog_name: str, command_name: str, interaction: FakeInteraction, **params) -> None:
+        """
+        Runs a slash command of a cog. Raises app_commands.CheckFailure if the user may not run it.
+        """
+        cog = self.cogs[cog_name]
+        command = next(command for command in cog.get_app_commands() if command.name == command_name)
+        interaction.command = command
+        for check in command.checks:
+            allowed = check(interaction)
+            if asyncio.iscoroutine(allowed):
+                allowed = await allowed
+            if not allowed:
+                raise app_commands.CheckFailure(f"{interaction.user} may not run /{command_name}.")
+        await command.callback(cog, interaction, **params)
+        await self.save_game_states(interaction.guild_id)
+
+async def click(view: discord.ui.View, label: str, interaction: FakeInteraction, values: Optional[List[str]] = None) -> None:
+    """
+    Clicks the button with the given label of a view, or picks values in the select with that placeholder.
+    """
+    for item in view.children:
+        if getattr(item, 'label', None) == label or getattr(item, 'placeholder', None) == label:
+            if values is not None:
+                interaction.data = {'values': values}
+            await item.callback(interaction)
+            return
+    raise LookupError(f"No component '{label}' in {type(view).__name__}.")
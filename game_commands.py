@@ -4,9 +4,14 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import logging
+import weakref
+from typing import Dict
 from game_state import GameState
-from utils import admin_only, admin_or_gamemaster_only
+from utils import admin_only, admin_or_gamemaster_only, gamemaster_roles
 from deck_manager import DeckManager
+from worker_pool import RemoteGameState
+from turn_schedule import DEFAULT_RULESET, get_ruleset, list_rulesets
+from card_images import card_images
 
 class GameCommands(commands.Cog):
     """
@@ -15,10 +20,13 @@ class GameCommands(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        # Game state to (version, automatic turn deadline) and the rendered /status message; ended games drop out
+        self.status_messages = weakref.WeakKeyDictionary()
 
     @app_commands.command(name='startgame', description='Start a new game with the required decks.')
     @admin_or_gamemaster_only
-    async def start_game(self, interaction: discord.Interaction):
+    @app_commands.describe(ruleset='Ruleset of the game (default: standard)')
+    async def start_game(self, interaction: discord.Interaction, ruleset: str = DEFAULT_RULESET):
         """Starts a new game in the current channel."""
         if interaction.channel_id in self.bot.game_states:
             await interaction.response.send_message(
@@ -26,9 +34,15 @@ class GameCommands(commands.Cog):
                 ephemeral=True
             )
             return
+        try:
+            deck_activation = get_ruleset(ruleset)['deck_activation']
+        except ValueError as e:
+            await interaction.response.send_message(f"Unknown or invalid ruleset '{ruleset}'.", ephemeral=True)
+            logging.error(f"Could not start a game with ruleset '{ruleset}': {e}")
+            return
 
-        # Get available decks for each type
-        deck_types = ['event_deck', 'dragon_deck', 'sea_deck', 'end_deck']
+        # Get available decks for each type used by the ruleset
+        deck_types = list(deck_activation)
         decks_by_type = {deck_type: [] for deck_type in deck_types}
         for deck_key, deck_info in self.bot.deck_manager.decks.items():
             if deck_info['type'] in deck_types:
@@ -79,10 +93,16 @@ class GameCommands(commands.Cog):
                         return
                     # Proceed to start the game
                     selected_deck_keys = list(self.selected_decks.values())
+                    if self.bot.worker_pool:
+                        await self.start_remote_game(interaction_button, selected_deck_keys, ruleset)
+                        self.stop()
+                        return
                     game_state = GameState(
                         channel_id=interaction_button.channel_id,
                         deck_keys=selected_deck_keys,
-                        deck_manager=self.bot.deck_manager
+                        deck_manager=self.bot.deck_manager,
+                        guild_id=interaction_button.guild_id,
+                        ruleset=ruleset
                     )
                     self.bot.game_states[interaction_button.channel_id] = game_state
 
@@ -104,6 +124,20 @@ class GameCommands(commands.Cog):
                 confirm_button.callback = confirm
                 self.add_item(confirm_button)
 
+            async def start_remote_game(self, interaction_button: discord.Interaction, selected_deck_keys, ruleset: str):
+                """Starts the game in the worker process that owns the channel and sends the cards of turn 1."""
+                game_state = RemoteGameState(interaction_button.channel_id, self.bot.worker_pool, interaction_button.guild_id)
+                self.bot.game_states[interaction_button.channel_id] = game_state
+                logging.info(f"{interaction_button.user} started a game in channel {interaction_button.channel_id}.")
+                await interaction_button.response.send_message("**Game Started!** Beginning with Turn 1.", ephemeral=False)
+                events = await game_state.call('start_game', deck_keys=selected_deck_keys, guild_id=interaction_button.guild_id, ruleset=ruleset)
+                turn_manager = self.bot.get_cog('TurnManager')
+                if turn_manager:
+                    await turn_manager.card_mechanics.send_events(interaction_button.followup.send, events)
+                    card_images.prefetch_next_cards(game_state)
+                else:
+                    logging.error("TurnManager cog not found.")
+
             async def on_timeout(self):
                 for child in self.children:
                     child.disabled = True
@@ -115,6 +149,14 @@ class GameCommands(commands.Cog):
         view.message = await interaction.original_response()
 
 
+    @start_game.autocomplete('ruleset')
+    async def ruleset_autocomplete(self, interaction: discord.Interaction, current: str):
+        """Autocompletes the available rulesets."""
+        return [
+            app_commands.Choice(name=ruleset, value=ruleset)
+            for ruleset in list_rulesets() if current.lower() in ruleset.lower()
+        ][:25]
+
     @app_commands.command(name='endgame', description='End the current game in this channel.')
     @admin_or_gamemaster_only
     async def end_game(self, interaction: discord.Interaction):
@@ -131,7 +173,9 @@ class GameCommands(commands.Cog):
 
             @discord.ui.button(label='Confirm', style=discord.ButtonStyle.danger)
             async def confirm(self, interaction_button: discord.Interaction, button: discord.ui.Button):
-                del self.bot.game_states[interaction.channel_id]
+                game_state = self.bot.get_cog('TurnManager').end_game(interaction.channel_id)
+                if isinstance(game_state, RemoteGameState):
+                    await game_state.call('end_game')
                 await interaction_button.response.send_message("Game ended in this channel.", ephemeral=True)
                 logging.info(f"{interaction_button.user} ended the game in channel {interaction_button.channel_id}.")
                 self.stop()
@@ -154,25 +198,53 @@ class GameCommands(commands.Cog):
         """Shows the status of the current game."""
         game_state = self.bot.game_states.get(interaction.channel_id)
         if game_state:
-            status_message = f"**Turn {game_state.current_turn}**\n"
-            active_decks = game_state.get_active_decks()
-            status_message += f"**Active Decks:** {', '.join([self.bot.deck_manager.get_original_deck_name(deck) for deck in active_decks])}\n"
-            for deck_name in active_decks:
-                draw_count = len(game_state.draw_piles[deck_name])
-                discard_count = len(game_state.discard_piles[deck_name])
-                status_message += f"\n**Deck '{self.bot.deck_manager.get_original_deck_name(deck_name)}':**\nCards in draw pile: {draw_count}\nCards in discard pile: {discard_count}\n"
-           
-            # Include cards currently in play
-            cards_in_play = game_state.keep_cards + game_state.current_turn_drawn_cards
-            if cards_in_play:
-                card_names = ', '.join([card['name'] for card, _ in cards_in_play])
-                status_message += f"\n\n**Cards in Play:** {card_names}"
+            # The message only changes with the game (see GameState.version) and the next automatic turn
+            key = (game_state.version, self.bot.turn_scheduler.get_deadline(interaction.channel_id))
+            cached = self.status_messages.get(game_state)
+            if cached is not None and cached[0] == key:
+                status_message = cached[1]
             else:
-                status_message += "\n\n**Cards in Play:** None"
-
-            if game_state.end_game_flag:
-                status_message += "\n\n**Game will end after this turn.**"
+                if isinstance(game_state, RemoteGameState):
+                    status = await game_state.call('status')
+                else:
+                    status = game_state.get_status()
+                status_message = render_status(status, key[1])
+                self.status_messages[game_state] = (key, status_message)
             await interaction.response.send_message(status_message, ephemeral=True)
         else:
             await interaction.response.send_message("No game is currently running in this channel.", ephemeral=True)
 
+    @app_commands.command(name='setgamemasterrole', description='Set the name of the role that grants game master permissions.')
+    @admin_only
+    @app_commands.describe(role_name='Name of the game master role')
+    async def set_gamemaster_role(self, interaction: discord.Interaction, role_name: str):
+        """Sets the name of the game master role for this server."""
+        if interaction.guild is None:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+        role_name = role_name.strip()
+        if not role_name:
+            await interaction.response.send_message("Please provide a role name.", ephemeral=True)
+            return
+        gamemaster_roles.set_role_name(interaction.guild.id, role_name)
+        message = f"Game master role set to '{role_name}'."
+        if gamemaster_roles.get_role_id(interaction.guild) is None:
+            message += " Note: no role with this name exists yet, so only admins can run game master commands."
+        await interaction.response.send_message(message, ephemeral=True)
+        logging.info(f"{interaction.user} set the game master role to '{role_name}' in guild {interaction.guild.id}.")
+
+def render_status(status: Dict, deadline) -> str:
+    """
+    Renders the /status message of a game from its status summary (see GameState.get_status).
+    """
+    lines = [f"**Turn {status['current_turn']}**", f"**Active Decks:** {', '.join(deck['name'] for deck in status['active_decks'])}"]
+    for deck in status['active_decks']:
+        lines += ["", f"**Deck '{deck['name']}':**", f"Cards in draw pile: {deck['draw_count']}", f"Cards in discard pile: {deck['discard_count']}"]
+
+    # Include cards currently in play
+    lines += ["", "", f"**Cards in Play:** {', '.join(status['cards_in_play']) or 'None'}"]
+    if status['end_game_flag']:
+        lines += ["", "**Game will end after this turn.**"]
+    if deadline:
+        lines += ["", f"**Next automatic turn:** <t:{int(deadline)}:R>"]
+    return '\n'.join(lines)
@@ -0,0 +1,300 @@
+# game_persistence.py
+
+import os
+import json
+import logging
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+from game_state import GameState
+from turn_schedule import DEFAULT_RULESET
+from deck_manager import DeckManager, make_card, make_deck_version
+
+def serialize_game_state(game_state: GameState) -> Dict:
+    """
+    Converts a game state into a JSON serializable dictionary.
+    The cards of each deck version are saved once; piles and cards in play are saved as card IDs into them.
+    """
+    def in_play_ids(cards_in_play: List[Tuple[Dict[str, str], str]]) -> List[List]:
+        return [[deck_name, game_state.draw_piles[deck_name].card_id(card)] for card, deck_name in cards_in_play]
+
+    return {
+        'guild_id': game_state.guild_id,
+        'deck_keys': game_state.all_deck_keys,
+        'decks': {
+            deck_key: {'version': deck_info['version'], 'cards': list(deck_info['cards'])}
+            for deck_key, deck_info in game_state.deck_versions.items()
+        },
+        'draw_piles': {deck_key: pile.to_data() for deck_key, pile in game_state.draw_piles.items()},
+        'discard_piles': {deck_key: pile.to_data() for deck_key, pile in game_state.discard_piles.items()},
+        'current_turn': game_state.current_turn,
+        'keep_cards': in_play_ids(game_state.keep_cards),
+        'end_game_flag': game_state.end_game_flag,
+        'keep_current_turn_cards': game_state.keep_current_turn_cards,
+        'current_turn_drawn_cards': in_play_ids(game_state.current_turn_drawn_cards),
+        'seed': game_state.seed,
+        'shuffle_count': game_state.shuffle_count,
+        'action_log': game_state.action_log,
+        'ruleset': game_state.ruleset,
+        'deck_activation': game_state.deck_activation,
+    }
+
+def convert_legacy_piles(state_data: Dict) -> Dict:
+    """
+    Converts game states saved before piles were stored as card IDs (piles and cards in play as lists of cards).
+    The cards found in the piles of a deck become the card list of the game's deck version.
+    """
+    decks = {}
+    draw_piles = {}
+    discard_piles = {}
+    in_play = {'keep_cards': [], 'current_turn_drawn_cards': []}
+    for deck_key in state_data.get('deck_keys', []):
+        cards = []
+        for piles, field in ((draw_piles, 'draw_piles'), (discard_piles, 'discard_piles')):
+            pile_cards = state_data.get(field, {}).get(deck_key, [])
+            piles[deck_key] = list(range(len(cards), len(cards) + len(pile_cards)))
+            cards.extend(pile_cards)
+        for field in in_play:
+            for card, deck_name in state_data.get(field, []):
+                if deck_name == deck_key:
+                    in_play[field].append([deck_name, len(cards)])
+                    cards.append(card)
+        decks[deck_key] = {'version': None, 'cards': cards}
+    return {**state_data, 'decks': decks, 'draw_piles': draw_piles, 'discard_piles': discard_piles, **in_play}
+
+def saved_deck_versions(state_data: Dict, deck_manager: DeckManager) -> Dict[str, Mapping]:
+    """
+    Returns the deck versions a saved game was using.
+    The loaded deck version is shared if the deck has not changed since.
+    """
+    deck_versions = {}
+    for deck_key in state_data.get('deck_keys', []):
+        saved_deck = state_data['decks'][deck_key]
+        deck_info = deck_manager.decks[deck_key]
+        if saved_deck['version'] != deck_info['version'] or list(deck_info['cards']) != saved_deck['cards']:
+            deck_info = make_deck_version(
+                deck_info['type'], deck_info['original_name'],
+                (make_card(card) for card in saved_deck['cards']), saved_deck['version'] or deck_info['version']
+            )
+        deck_versions[deck_key] = deck_info
+    return deck_versions
+
+def restore_game_state(channel_id: int, state_data: Dict, deck_manager: DeckManager) -> Optional[GameState]:
+    """
+    Restores a game state from its saved data.
+    Returns None if the game uses decks that no longer exist.
+    """
+    deck_keys = state_data.get('deck_keys', [])
+    missing_decks = [deck for deck in deck_keys if deck not in deck_manager.decks]
+    if missing_decks:
+        missing_original = [deck_manager.get_original_deck_name(deck) for deck in missing_decks]
+        logging.warning(
+            f"Missing decks for channel {channel_id}: {', '.join(missing_original)}. Skipping this game state."
+        )
+        return None
+    try:
+        # Create a new GameState instance with the saved data
+        game_state = GameState(
+            channel_id=channel_id,
+            deck_keys=deck_keys,
+            deck_manager=deck_manager,
+            guild_id=state_data.get('guild_id'),
+            ruleset=state_data.get('ruleset', DEFAULT_RULESET),
+            deck_activation=state_data.get('deck_activation')
+        )
+    except ValueError as e:
+        logging.error(f"Error restoring game state for channel {channel_id}: {e}")
+        return None
+    if 'decks' not in state_data:
+        state_data = convert_legacy_piles(state_data)
+    try:
+        for deck_key, deck_info in saved_deck_versions(state_data, deck_manager).items():
+            game_state.set_deck_version(deck_key, deck_info, state_data['draw_piles'][deck_key], state_data['discard_piles'][deck_key])
+    except ValueError as e:
+        logging.error(f"Error restoring the piles of channel {channel_id}: {e}")
+        return None
+
+    def in_play_cards(field: str) -> List[Tuple[Dict[str, str], str]]:
+        return [(game_state.deck_versions[deck_name]['cards'][card_id], deck_name) for deck_name, card_id in state_data.get(field, [])]
+
+    # Restore game state attributes
+    game_state.current_turn = state_data.get('current_turn', 1)
+    game_state.keep_cards = in_play_cards('keep_cards') #cards that are kept this turn due to end is nigh
+    game_state.end_game_flag = state_data.get('end_game_flag', False)
+    game_state.keep_current_turn_cards = state_data.get('keep_current_turn_cards', False) #whether keep cards flag is in on
+    game_state.current_turn_drawn_cards = in_play_cards('current_turn_drawn_cards') #list of cards currently in play
+    # Continue the game's random stream. Games saved without a seed keep the new one, but cannot be replayed
+    if 'seed' in state_data:
+        game_state.seed = state_data['seed']
+        game_state.shuffle_count = state_data.get('shuffle_count', 0)
+        game_state.action_log = state_data.get('action_log')
+    else:
+        game_state.action_log = None
+    return game_state
+
+def read_game_states_file(file_path: str) -> Dict[str, Dict]:
+    """
+    Reads the raw saved game states from a file. Returns an empty dictionary if the file does not exist.
+    """
+    if not os.path.exists(file_path):
+        return {}
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+    # Partition files wrap the game states together with partition metadata
+    return data.get('game_states', {}) if 'game_states' in data else data
+
+def load_game_states_file(file_path: str, deck_manager: DeckManager) -> Dict[int, GameState]:
+    """
+    Loads and restores all game states saved in a file.
+    """
+    game_states = {}
+    try:
+        game_states_data = read_game_states_file(file_path)
+    except (json.JSONDecodeError, IOError) as e:
+        logging.error(f"Failed to load game states from '{file_path}': {e}")
+        return game_states
+    for channel_id, state_data in game_states_data.items():
+        game_state = restore_game_state(int(channel_id), state_data, deck_manager)
+        if game_state:
+            game_states[int(channel_id)] = game_state
+            logging.info(f"Restored game state for channel {channel_id}.")
+    return game_states
+
+def write_json_atomic(file_path: str, data: Dict) -> int:
+    """
+    Writes JSON data to a temporary file and replaces the target file with it.
+    Returns the number of bytes written.
+    """
+    temp_file = file_path + ".tmp"
+    payload = json.dumps(data, indent=4)
+    with open(temp_file, 'w') as file:
+        file.write(payload)
+    os.replace(temp_file, file_path)
+    return len(payload)
+
+def save_game_states_file(file_path: str, game_states: Dict[int, GameState], metadata: Optional[Dict] = None) -> int:
+    """
+    Saves the given game states to a file atomically.
+    If metadata is given, the game states are wrapped together with it (used for partition files).
+    Returns the number of bytes written.
+    """
+    game_states_data = {str(channel_id): serialize_game_state(game_state) for channel_id, game_state in game_states.items()}
+    if metadata is not None:
+        game_states_data = {**metadata, 'game_states': game_states_data}
+    return write_json_atomic(file_path, game_states_data)
+
+def shard_id_for_guild(guild_id: Optional[int], shard_count: int) -> int:
+    """
+    Returns the shard that receives the events of a guild. Games without a guild are assigned to shard 0.
+    """
+    if not guild_id or not shard_count:
+        return 0
+    return (guild_id >> 22) % shard_count
+
+def get_shard_file(game_states_directory: str, shard_id: int) -> str:
+    """
+    Returns the path of the file that stores the game states of a shard.
+    """
+    return os.path.join(game_states_directory, f"shard_{shard_id}.json")
+
+def prepare_shard_partitions(game_states_directory: str, shard_count: int, legacy_file: str) -> None:
+    """
+    Makes sure the partition files on disk match the shard count.
+    If the shard count changed (or the games were saved by the unsharded bot in legacy_file), the saved games are repartitioned once.
+    Games saved without a guild go to shard 0, until the bot learns their guild (see ShardedGameStates.assign_guilds).
+    """
+    os.makedirs(game_states_directory, exist_ok=True)
+    shard_layout_file = os.path.join(game_states_directory, 'shards.json')
+    previous_shard_count = None
+    if os.path.exists(shard_layout_file):
+        try:
+            with open(shard_layout_file, 'r') as file:
+                previous_shard_count = json.load(file).get('shard_count')
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"Failed to read shard layout: {e}")
+    if previous_shard_count == shard_count:
+        return
+
+    # Collect the raw saved games of the previous layout
+    if previous_shard_count:
+        source_files = [get_shard_file(game_states_directory, shard_id) for shard_id in range(previous_shard_count)]
+    else:
+        source_files = [legacy_file]
+    partitions = {shard_id: {} for shard_id in range(shard_count)}
+    for source_file in source_files:
+        try:
+            for channel_id, state_data in read_game_states_file(source_file).items():
+                partitions[shard_id_for_guild(state_data.get('guild_id'), shard_count)][channel_id] = state_data
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"Failed to read game states from '{source_file}' for repartitioning: {e}")
+
+    # Write the new layout
+    for shard_id, game_states_data in partitions.items():
+        write_json_atomic(get_shard_file(game_states_directory, shard_id), {'shard_id': shard_id, 'game_states': game_states_data})
+    for shard_id in range(shard_count, previous_shard_count or 0):
+        os.remove(get_shard_file(game_states_directory, shard_id))
+    write_json_atomic(shard_layout_file, {'shard_count': shard_count})
+    logging.info(f"Repartitioned saved game states from {previous_shard_count or 'unsharded'} to {shard_count} shard(s).")
+
+class ShardedGameStates(MutableMapping):
+    """
+    Channel ID to GameState mapping, partitioned by the shard of the game's guild.
+    Behaves like the plain dictionary used by the unsharded bot, so the cogs do not need to know about shards.
+    """
+
+    def __init__(self, shard_count: Optional[int] = None):
+        self.shard_count = shard_count  # Set once the bot knows its shard count
+        self.partitions: Dict[int, Dict[int, GameState]] = {}  # Shard ID to channel ID to GameState mapping
+        self.channel_shards: Dict[int, int] = {}  # Channel ID to shard ID mapping
+
+    def shard_id_for(self, game_state: GameState) -> int:
+        """
+        Returns the shard a game belongs to.
+        """
+        return shard_id_for_guild(game_state.guild_id, self.shard_count)
+
+    def partition(self, shard_id: int) -> Dict[int, GameState]:
+        """
+        Returns the games of a single shard.
+        """
+        return self.partitions.setdefault(shard_id, {})
+
+    def __getitem__(self, channel_id: int) -> GameState:
+        return self.partitions[self.channel_shards[channel_id]][channel_id]
+
+    def __setitem__(self, channel_id: int, game_state: GameState) -> None:
+        if channel_id in self.channel_shards:
+            del self[channel_id]
+        shard_id = self.shard_id_for(game_state)
+        self.partition(shard_id)[channel_id] = game_state
+        self.channel_shards[channel_id] = shard_id
+
+    def __delitem__(self, channel_id: int) -> None:
+        shard_id = self.channel_shards.pop(channel_id)
+        del self.partitions[shard_id][channel_id]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.channel_shards)
+
+    def __len__(self) -> int:
+        return len(self.channel_shards)
+
+    def assign_guilds(self, channel_guilds: Dict[int, int], shard_ids: Iterable[int]) -> Set[int]:
+        """
+        Sets the guild of the games saved without one (found through their channel) and moves them to the guild's shard.
+        Games are only moved into the given shards, i.e. the loaded ones, so they are never saved to a partition
+        that has not been loaded yet. Returns the shards whose games changed, which have to be saved.
+        """
+        shard_ids = set(shard_ids)
+        changed = set()
+        for channel_id, guild_id in channel_guilds.items():
+            game_state = self.get(channel_id)
+            if game_state is None or game_state.guild_id is not None or not guild_id:
+                continue
+            shard_id = shard_id_for_guild(guild_id, self.shard_count)
+            if shard_id not in shard_ids:
+                continue
+            changed.add(self.channel_shards[channel_id])
+            game_state.guild_id = guild_id
+            self[channel_id] = game_state
+            changed.add(shard_id)
+        return changed
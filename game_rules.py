@@ -0,0 +1,142 @@
+# game_rules.py
+
+import logging
+from typing import List, Tuple, Dict
+from game_state import GameState
+from card_effects import BLACK_SWAN, END_IS_NIGH, REVEAL_EFFECTS, TIMES_UP, reveal_effect
+from tracing import tracer
+
+class GameRules:
+    """
+    The rules of the reveal phase and the special cards.
+    Makes no Discord calls: the results are returned as events, which the bot sends to the channel.
+    Used by the bot, the worker processes and the simulation.
+    """
+
+    def run_reveal_phase(self, game_state: GameState) -> List[Dict]:
+        """
+        Draws the cards of the reveal phase and resolves their effects.
+        Returns the events that have to be sent to the channel, in order.
+        """
+        with tracer.span('draw_cards'):
+            drawn_cards, black_swan_drawn = game_state.draw_cards_for_reveal_phase()
+        if not drawn_cards:
+            logging.info(f"No cards drawn for Phase 2 in Turn {game_state.current_turn} in channel {game_state.channel_id}.")
+            return [{'type': 'message', 'content': "No cards were drawn. All active decks are exhausted."}]
+        return self.resolve_drawn_cards(game_state, drawn_cards, black_swan_drawn)
+
+    def resolve_drawn_cards(self, game_state: GameState, drawn_cards: List[Tuple[dict, str]], black_swan_triggered: bool) -> List[Dict]:
+        """
+        Resolves the drawn cards of the reveal phase, including special card mechanics.
+        Only the cards with a registered reveal effect are dispatched, in the order of the effect priorities.
+        Returns the events that have to be sent to the channel, in order.
+        """
+        events = [{
+            'type': 'reveal',
+            'content': f"**Turn {game_state.current_turn} - Phase 2: Reveal Cards**",
+            'cards': [card for card, _ in drawn_cards]
+        }]
+
+        effects = []
+        for position, (card, deck_name) in enumerate(drawn_cards):
+            for tag in game_state.card_tags(card, deck_name):
+                if tag in REVEAL_EFFECTS:
+                    priority, handler = REVEAL_EFFECTS[tag]
+                    effects.append((priority, position, handler, card, deck_name))
+        effects.sort(key=lambda effect: effect[:2])
+
+        # State shared by the effects of this reveal
+        reveal = {'black_swan_triggered': black_swan_triggered, 'black_swan_deck': None}
+        for _, _, handler, card, deck_name in effects:
+            events.extend(handler(self, game_state, card, deck_name, reveal))
+
+        # After handling all cards, process Black Swan effect if triggered
+        if reveal['black_swan_triggered'] and reveal['black_swan_deck']:
+            with tracer.span('black_swan'):
+                events.extend(self.process_black_swan_effect(game_state, reveal['black_swan_deck']))
+        return events
+
+    @reveal_effect(END_IS_NIGH)
+    def reveal_end_is_nigh(self, game_state: GameState, card: Dict[str, str], deck_name: str, reveal: Dict) -> List[Dict]:
+        """
+        'The End is Nigh!': the other cards of the turn stay in play until the game ends.
+        """
+        game_state.set_keep_current_turn_cards(True)
+        logging.info(f"Processed special card '{card['name']}'. keep_current_turn_cards is now {game_state.keep_current_turn_cards}")
+        return [{'type': 'message', 'content': "**The End is Nigh! All other cards played this turn will remain in play until the game ends.**"}]
+
+    @reveal_effect(TIMES_UP)
+    def reveal_times_up(self, game_state: GameState, card: Dict[str, str], deck_name: str, reveal: Dict) -> List[Dict]:
+        """
+        'Time's Up!': the game ends after this turn.
+        """
+        game_state.set_end_game_flag(True)
+        logging.info(f"Processed special card '{card['name']}'.")
+        return [{'type': 'message', 'content': "**The game will end after this turn.**"}]
+
+    @reveal_effect(BLACK_SWAN, priority=1)
+    def reveal_black_swan(self, game_state: GameState, card: Dict[str, str], deck_name: str, reveal: Dict) -> List[Dict]:
+        """
+        'Black Swan': leaves play (unless 'The End is Nigh!' is active, hence the later priority)
+        and triggers the reshuffle of its deck once all effects are resolved.
+        """
+        reveal['black_swan_triggered'] = True
+        if not game_state.keep_current_turn_cards:
+            # Move Black Swan to discard pile only if 'The End is Nigh!' is not active
+            game_state.current_turn_drawn_cards.remove((card, deck_name))
+            game_state.discard_piles[deck_name].put_top(card)
+            logging.info("Black Swan drawn: Moved to discard pile.")
+        else:
+            logging.info("Black Swan drawn during 'The End is Nigh!': Kept in play.")
+        reveal['black_swan_deck'] = deck_name
+        return []
+
+    def process_black_swan_effect(self, game_state: GameState, deck_name: str) -> List[Dict]:
+        """
+        Processes the effect of 'Black Swan', reshuffling the Event Deck and drawing a new card.
+        Returns the events to announce the effect and the newly drawn cards.
+        """
+        events = []
+        while True:
+            # Inform players about the Black Swan effect
+            events.append({
+                'type': 'message',
+                'content': f"**Black Swan** effect triggered! The discard pile of '{game_state.deck_manager.get_original_deck_name(deck_name)}' has been reshuffled, and a new card is drawn."
+            })
+
+            # Reshuffle the Event Deck's discard pile back into the draw pile
+            if game_state.discard_piles[deck_name]:
+                game_state.reshuffle_discard_pile(deck_name)
+                logging.info(f"Deck '{deck_name}' reshuffled due to Black Swan effect.")
+            else:
+                logging.warning(f"Discard pile of deck '{deck_name}' is empty during Black Swan effect.")
+
+            # Draw a new card from the specified deck
+            ## Check if draw piles are not empty
+            if not game_state.draw_piles.get(deck_name):
+                logging.warning(f"Deck '{deck_name}' is empty after reshuffling.")
+                break  # Exit the loop if no cards are left
+            ## Otherwise draw the new card from the draw pile and put it on the in play pile
+            card = game_state.draw_piles[deck_name].draw()
+            game_state.current_turn_drawn_cards.append((card, deck_name))
+            events.append({
+                'type': 'card',
+                'title': f"A new card was drawn from '{game_state.deck_manager.get_original_deck_name(deck_name)}': {card['name']}",
+                'card': card
+            })
+
+            # Then check if the new card is another Black Swan
+            if BLACK_SWAN in game_state.card_tags(card, deck_name):
+                if not game_state.keep_current_turn_cards:
+                    # Move Black Swan to discard pile if 'The End is Nigh!' is not active
+                    game_state.current_turn_drawn_cards.remove((card, deck_name))
+                    game_state.discard_piles[deck_name].put_top(card)
+                    logging.info(f"Another Black Swan drawn from '{deck_name}': Moved to discard pile.")
+                else:
+                    logging.info(f"Another Black Swan drawn from '{deck_name}' during 'The End is Nigh!': Kept in play.")
+                # Continue the loop to process the effect again
+                continue
+            else:
+                # Break out of the loop after processing non-Black Swan card
+                break
+        return events
@@ -1,10 +1,16 @@
 # game_state.py
 
-import discord
 import random
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Mapping, FrozenSet, TYPE_CHECKING
 from deck_manager import DeckManager
+from pile import Pile
+from turn_schedule import DEFAULT_RULESET, TurnSchedule, get_ruleset
+from card_effects import BLACK_SWAN, DRAGON, END_IS_NIGH, STARTING_CARD
+from logging_config import PER_CARD
+
+if TYPE_CHECKING:
+    import discord
 
 class CardAction:
     def __init__(self, card):
@@ -18,32 +24,86 @@ class GameState:
     Tracks active decks, draw and discard piles, current turn, kept cards, and end game flag.
     """
 
-    def __init__(self, channel_id: int, deck_keys: List[str], deck_manager: DeckManager):
+    def __init__(self, channel_id: int, deck_keys: List[str], deck_manager: DeckManager, guild_id: Optional[int] = None,
+                 seed: Optional[int] = None, deck_versions: Optional[Mapping[str, Mapping]] = None,
+                 ruleset: str = DEFAULT_RULESET, deck_activation: Optional[Mapping[str, int]] = None):
         self.channel_id = channel_id  # In which channel the game is taking place
+        self.guild_id = guild_id  # In which guild the game is taking place (used to partition games by shard)
         self.deck_manager = deck_manager
         self.all_deck_keys = deck_keys  # All decks used in the game
-        self.draw_piles: Dict[str, List[Dict[str, str]]] = {}  # List of cards in the draw pile
-        self.discard_piles: Dict[str, List[Dict[str, str]]] = {}  # List of cards in the discard piles
+        self.deck_versions: Dict[str, Mapping] = {}  # The version of each deck the game started with
+        self.draw_piles: Dict[str, Pile] = {}  # Cards in the draw pile of each deck
+        self.discard_piles: Dict[str, Pile] = {}  # Cards in the discard pile of each deck
         self.current_turn: int = 1  # Initialize to turn 1
         self.keep_cards: List[Tuple[Dict[str, str], str]] = []  # List of cards & decks kept from previous turn
         self.keep_current_turn_cards: bool = False  # Whether 'The End is Nigh!' is active
         self.current_turn_drawn_cards: List[Tuple[Dict[str, str], str]] = []  # List of cards currently in play
         self.end_game_flag: bool = False  # Whether this is the last turn
-        self.active_views: List[discord.ui.View] = []  # List of active views awaiting user input
+        self.active_views: List['discord.ui.View'] = []  # List of active views awaiting user input
         self.pending_card_actions: Dict[str, CardAction] = {}  # Tracks pending actions on top cards
+        self.seed: int = seed if seed is not None else random.getrandbits(64)  # Seed of the game's own shuffles
+        self.shuffle_count: int = 0  # Number of shuffles so far; the n-th shuffle is seeded with the seed and n
+        self.action_log: Optional[List[List]] = []  # Actions that change the piles, to replay the game (None if unknown)
+        self.ruleset: str = ruleset  # Ruleset the game is played with
+        self.version: int = 0  # Incremented by every change of the piles, the turn or the flags; caches of the status compare it
+        # Turn from which each deck type is active; restored games pass the activation turns they were started with
+        self.deck_activation: Dict[str, int] = dict(deck_activation if deck_activation is not None else get_ruleset(ruleset)['deck_activation'])
 
         for deck_key in self.all_deck_keys:
-            deck_info = self.deck_manager.decks.get(deck_key)
+            # Replays pass the deck versions the game was played with
+            deck_info = deck_versions[deck_key] if deck_versions is not None else self.deck_manager.decks.get(deck_key)
             if deck_info is None:
                 raise ValueError(f"Deck '{deck_key}' does not exist.")
-            cards = deck_info['cards']
-            # Use a deep copy to ensure original deck is not modified
-            self.draw_piles[deck_key] = [card.copy() for card in cards]
-            self.discard_piles[deck_key] = []
-            random.shuffle(self.draw_piles[deck_key])
+            # Deck versions and their cards are immutable, so the game can share them instead of copying every card
+            self.set_deck_version(deck_key, deck_info)
+            self.shuffle_pile(self.draw_piles[deck_key])
+        self.turn_schedule = TurnSchedule(self.deck_activation, self.all_deck_keys, {deck_key: deck_info['type'] for deck_key, deck_info in self.deck_versions.items()})
         logging.info(f"GameState initialized for channel {channel_id} with decks: {', '.join(deck_keys)}.")
 
+    def set_deck_version(self, deck_key: str, deck_info: Mapping, draw_card_ids: Optional[List[int]] = None, discard_card_ids: Optional[List[int]] = None) -> None:
+        """
+        Sets the deck version used by the game and creates its piles (by default, every card in the draw pile).
+        """
+        self.deck_versions[deck_key] = deck_info
+        index = deck_info['card_index']  # Built once per deck version, shared with every other game using it
+        if draw_card_ids is None:
+            self.draw_piles[deck_key] = Pile.full(deck_info['cards'], index)
+        else:
+            self.draw_piles[deck_key] = Pile.from_data(deck_info['cards'], draw_card_ids, index)
+        self.discard_piles[deck_key] = Pile.from_data(deck_info['cards'], discard_card_ids or (), index)
+
+    def shuffle_pile(self, pile: Pile) -> None:
+        """
+        Shuffles a pile with the game's own random stream, so games never affect each other's shuffles.
+        Each shuffle is seeded from the game seed and the shuffle number, so saving those two restores the stream.
+        """
+        pile.shuffle(random.Random(f"{self.seed}-{self.shuffle_count}"))
+        self.shuffle_count += 1
+
+    def record_action(self, *action) -> None:
+        """
+        Appends an action to the action log, unless the game was saved before actions were logged.
+        Every change of the piles and the turn is recorded, so this is also where the version is incremented.
+        """
+        self.version += 1
+        if self.action_log is not None:
+            self.action_log.append(list(action))
+
+    def card_tags(self, card: Dict[str, str], deck_name: str) -> FrozenSet[str]:
+        """
+        Returns the effect tags of a card of a deck, resolved when the deck version was created.
+        """
+        return self.deck_versions[deck_name]['effects'][self.draw_piles[deck_name].card_id(card)]
+
+    def reshuffle_discard_pile(self, deck_name: str) -> None:
+        """
+        Moves the discard pile of a deck into its draw pile and shuffles the draw pile.
+        """
+        self.draw_piles[deck_name].take_all(self.discard_piles[deck_name])
+        self.shuffle_pile(self.draw_piles[deck_name])
+
     def draw_cards_for_reveal_phase(self) -> Tuple[List[Tuple[dict, str]], bool]:
+        self.record_action('reveal')
         initial_drawn_cards = []
         black_swan_triggered = False  # Flag to indicate if Black Swan effect should trigger
 
@@ -54,7 +114,7 @@ class GameState:
             self.keep_cards = []  # Clear after including them
 
         # Check if 'Black Swan' is in play from previous turn (due to End is Nigh!) and set its trigger to 'True'
-        black_swan_in_play = any(card['name'].lower() == "black swan" for card, _ in self.current_turn_drawn_cards)
+        black_swan_in_play = any(BLACK_SWAN in self.card_tags(card, deck_name) for card, deck_name in self.current_turn_drawn_cards)
         if black_swan_in_play:
             black_swan_triggered = True
             logging.info("Black Swan is in play from a previous turn.")
@@ -65,9 +125,9 @@ class GameState:
         if self.current_turn == 1:
             # Handle special cards for Turn 1
             # Draw "Calms of Summer" from the Event Deck
-            event_deck = next((deck for deck in active_decks if self.deck_manager.decks[deck]['type'] == 'event_deck'), None)
+            event_deck = next((deck for deck in active_decks if self.deck_versions[deck]['type'] == 'event_deck'), None)
             if event_deck:
-                calms_of_summer = next((card for card in self.draw_piles[event_deck] if card['name'].lower() == 'calms of summer'), None)
+                calms_of_summer = self.draw_piles[event_deck].find(lambda card: STARTING_CARD in self.card_tags(card, event_deck))
                 if calms_of_summer:
                     self.draw_piles[event_deck].remove(calms_of_summer)
                     initial_drawn_cards.append((calms_of_summer, event_deck))
@@ -78,9 +138,9 @@ class GameState:
                 logging.warning("No Event Deck active for Turn 1.")
 
             # Draw "The Misty Mountains Cold" from the Dragon Deck
-            dragon_deck = next((deck for deck in active_decks if self.deck_manager.decks[deck]['type'] == 'dragon_deck'), None)
+            dragon_deck = next((deck for deck in active_decks if self.deck_versions[deck]['type'] == 'dragon_deck'), None)
             if dragon_deck:
-                misty_mountains_cold = next((card for card in self.draw_piles[dragon_deck] if card['name'].lower() == 'the misty mountains cold'), None)
+                misty_mountains_cold = self.draw_piles[dragon_deck].find(lambda card: STARTING_CARD in self.card_tags(card, dragon_deck))
                 if misty_mountains_cold:
                     self.draw_piles[dragon_deck].remove(misty_mountains_cold)
                     initial_drawn_cards.append((misty_mountains_cold, dragon_deck))
@@ -95,64 +155,50 @@ class GameState:
 
                 # Reshuffle the deck if the draw pile is empty
                 if not self.draw_piles[deck_name]:
-                    self.draw_piles[deck_name].extend(self.discard_piles[deck_name])
-                    self.discard_piles[deck_name].clear()
-                    random.shuffle(self.draw_piles[deck_name])
+                    self.reshuffle_discard_pile(deck_name)
 
                 # Draw one card from each active deck
                 if self.draw_piles[deck_name]:
-                    card = self.draw_piles[deck_name].pop()
+                    card = self.draw_piles[deck_name].draw()
                     initial_drawn_cards.append((card, deck_name))
                     self.current_turn_drawn_cards.append((card, deck_name))
 
                     # Check for Black Swans and set trigger to true if found
-                    if deck_name == 'event_deck' and card['name'].lower() == "black swan":
+                    if BLACK_SWAN in self.card_tags(card, deck_name):
                         black_swan_triggered = True
                         logging.info("Black Swan drawn: Effect will be processed.")
 
         # Return whether Black Swan's effect should be triggered
         return initial_drawn_cards, black_swan_triggered
 
-    def get_active_decks(self) -> List[str]:
+    def get_active_decks(self) -> Tuple[str, ...]:
         """
-        Determines which deck types are active, then finds the corresponding decks based on the current turn.
+        Returns the decks active in the current turn, looked up in the turn schedule compiled at game start.
         """
-        active_types = [] #Active based on type
-        if self.current_turn >= 1:
-            active_types.extend(['event_deck', 'dragon_deck'])
-        if self.current_turn >= 5:
-            active_types.append('sea_deck')
-        if self.current_turn >= 10:
-            active_types.append('end_deck')
-
-        active_decks = [] #Find corresponding decks
-        for deck_key in self.all_deck_keys:
-            deck_type = self.deck_manager.decks[deck_key]['type']
-            if deck_type in active_types:
-                active_decks.append(deck_key)
-        return active_decks
+        return self.turn_schedule.active_decks(self.current_turn)
 
     def advance_turn(self) -> None:
         """
         Advances the game to the next turn, handling any necessary state updates.
         """
+        self.record_action('advance_turn')
         # If 'The End is Nigh!' was drawn, keep the cards except 'The End is Nigh!' itself
         if self.keep_current_turn_cards:
             remaining_in_play = []
             for card, deck_name in self.current_turn_drawn_cards:
-                if card['name'].lower() == "the end is nigh!":
-                    self.discard_piles[deck_name].append(card)
+                if END_IS_NIGH in self.card_tags(card, deck_name):
+                    self.discard_piles[deck_name].put_top(card)
                     logging.info("'The End is Nigh!' discarded at the end of the turn.")
                 else:
                     remaining_in_play.append((card, deck_name))
-                    logging.info(f"Card '{card['name']}' remains in play.")
+                    logging.info(f"Card '{card['name']}' remains in play.", extra=PER_CARD)
             self.keep_cards = remaining_in_play
             logging.info(f"Cards from turn {self.current_turn} are kept for the next turn, excluding 'The End is Nigh!'.")
         else:
             # Normal play, move all in-play cards to discard piles
             for card, deck_name in self.current_turn_drawn_cards:
-                self.discard_piles[deck_name].append(card)
-                logging.info(f"Card '{card['name']}' moved to discard pile.")
+                self.discard_piles[deck_name].put_top(card)
+                logging.info(f"Card '{card['name']}' moved to discard pile.", extra=PER_CARD)
             self.keep_cards.clear()
             logging.info(f"All in-play cards moved to discard piles at the end of turn {self.current_turn}.")
 
@@ -168,6 +214,7 @@ class GameState:
         Sets the flag to keep current turn's cards for the next turn.
         """
         self.keep_current_turn_cards = keep
+        self.version += 1
         logging.info(f"Set keep_current_turn_cards to {self.keep_current_turn_cards}.")
 
     def set_end_game_flag(self, end_game: bool = True) -> None:
@@ -175,4 +222,113 @@ class GameState:
         Sets the flag to end the game after the current turn.
         """
         self.end_game_flag = end_game
+        self.version += 1
         logging.info(f"Set end_game_flag to {self.end_game_flag}.")
+
+    def peek_top_card(self, deck_name: str) -> Optional[Tuple[Dict[str, str], str, FrozenSet[str]]]:
+        """
+        Peeks at the top card of the specified deck without removing it.
+        If the draw pile is empty, reshuffles the discard pile (and in-play cards from this deck) into the draw pile, then peeks.
+        Returns the card, its deck and its effect tags (resolved with the deck version), or None if the deck is empty.
+        """
+        if deck_name in self.draw_piles:
+            if not self.draw_piles[deck_name]:
+                self.record_action('peek', deck_name)
+                # Draw pile is empty, need to reshuffle
+                # Move discard pile into draw pile
+                self.draw_piles[deck_name].take_all(self.discard_piles[deck_name])
+                logging.info(f"Moved discard pile of '{deck_name}' into draw pile for reshuffling.")
+
+                # Now, move in-play cards from this deck into draw pile
+                in_play_cards_to_remove = []
+                for card_tuple in self.current_turn_drawn_cards:
+                    card, card_deck_name = card_tuple
+                    if card_deck_name == deck_name:
+                        self.draw_piles[deck_name].put_top(card)
+                        in_play_cards_to_remove.append(card_tuple)
+                # Remove these cards from in_play_cards
+                for card_tuple in in_play_cards_to_remove:
+                    self.current_turn_drawn_cards.remove(card_tuple)
+                logging.info(f"Moved in-play cards from '{deck_name}' back into draw pile for reshuffling.")
+
+                # Shuffle the draw pile
+                self.shuffle_pile(self.draw_piles[deck_name])
+                logging.info(f"Reshuffled the '{deck_name}' due to empty draw pile during peek.")
+
+            if self.draw_piles[deck_name]:
+                card = self.draw_piles[deck_name].peek()  # Peek at the top of the deck
+                return card, deck_name, self.card_tags(card, deck_name)
+            else:
+                # Even after reshuffling, the draw pile is empty
+                logging.warning(f"No cards available in '{deck_name}' even after reshuffling.")
+                return None
+        else:
+            logging.error(f"Deck '{deck_name}' does not exist in the game state.")
+            return None
+
+    def move_top_card_to_bottom(self, deck_name: str, expected_card: Dict[str, str]) -> bool:
+        """
+        Moves the top card of the specified deck to the bottom if it's the same as the expected (peeked) card.
+        Returns whether the card was moved.
+        """
+        if deck_name in self.draw_piles and self.draw_piles[deck_name]:
+            top_card = self.draw_piles[deck_name].peek()  # Get the top card
+            if top_card == expected_card:
+                self.draw_piles[deck_name].move_top_to_bottom()
+                self.record_action('move_top_card_to_bottom', deck_name)
+                logging.info("Action performed and recorded")
+                return True
+            logging.warning("The top card has changed; action cannot be performed.")
+        return False
+
+    def replace_top_card_with_dragon(self, deck_name: str, expected_card: Dict[str, str]) -> bool:
+        """
+        Replaces the top card with a 'There be Dragons!' card if the top card is the same as the expected (peeked) card.
+        Returns whether the top card was destroyed.
+        """
+        if deck_name in self.draw_piles and self.draw_piles[deck_name]:
+            top_card = self.draw_piles[deck_name].peek()  # Get the top card
+            if top_card == expected_card:
+                # Remove the top card
+                self.draw_piles[deck_name].draw()
+                self.record_action('replace_top_card_with_dragon', deck_name)
+
+                # Find a 'There be Dragons!' card, first in the draw pile, then in the discard pile
+                is_dragon = lambda card: DRAGON in self.card_tags(card, deck_name)
+                dragon_card = self.draw_piles[deck_name].find(is_dragon) or self.discard_piles[deck_name].find(is_dragon)
+                # If found, place it on top
+                if dragon_card:
+                    self.draw_piles[deck_name].put_top(dragon_card)
+                else:
+                    logging.warning("Could not find 'There be Dragons!' to replace the top card.")
+                return True
+            logging.warning("The top card has changed; action cannot be performed.")
+        return False
+
+    def upcoming_card_images(self) -> List[str]:
+        """
+        Returns the images of the cards the next turn will draw: the top card of each deck active next turn.
+        Decks that will have to be reshuffled are skipped, since their next card is not known yet.
+        Only used to load the images ahead of time, never shown to anyone.
+        """
+        next_decks = self.turn_schedule.active_decks(self.current_turn + 1)
+        return [self.draw_piles[deck_name].peek()['image'] for deck_name in next_decks if self.draw_piles[deck_name]]
+
+    def get_status(self) -> Dict:
+        """
+        Returns a summary of the game used by the status command.
+        """
+        active_decks = self.get_active_decks()
+        return {
+            'current_turn': self.current_turn,
+            'active_decks': [
+                {
+                    'name': self.deck_versions[deck_name]['original_name'],
+                    'draw_count': len(self.draw_piles[deck_name]),
+                    'discard_count': len(self.discard_piles[deck_name]),
+                }
+                for deck_name in active_decks
+            ],
+            'cards_in_play': [card['name'] for card, _ in self.keep_cards + self.current_turn_drawn_cards],
+            'end_game_flag': self.end_game_flag,
+        }
@@ -0,0 +1,196 @@
+# load_test.py
+
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import tempfile
+import argparse
+from collections import defaultdict
+from typing import Dict, List
+from deck_manager import DeckManager
+from game_commands import GameCommands
+from turn_manager import TurnManager
+from peek_commands import PeekCommands
+from deck_management_commands import DeckManagementCommands
+from game_persistence import save_game_states_file
+from utils import DEFAULT_GAMEMASTER_ROLE_NAME
+from fake_discord import FakeBot, FakeChannel, FakeGuild, FakeInteraction, FakeMember, FakeRole, FakeTransport, click
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Returns the value below which the given fraction of the values lie.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class LoadTest:
+    """
+    Plays many games at once through the real cogs, with the fake Discord objects of fake_discord.py instead of a gateway.
+    Every channel plays a whole game: /startgame with the deck selection, then per turn /status, /peek, /advancedpeek
+    (answered by the player or left open until the turn ends) and /nextturn, and finally /endgame.
+    Records the latency of every command and the lag of the event loop.
+    """
+
+    def __init__(self, transport: FakeTransport, channel_count: int, guild_count: int, user_count: int,
+                 turns: int, concurrency: int, save_directory: str = None, seed: int = 0):
+        self.transport = transport
+        self.turns = turns
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.random = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)  # Command to latencies in seconds
+        self.errors: Dict[str, int] = defaultdict(int)  # Command to failed invocations
+        self.loop_lags: List[float] = []
+
+        save = None
+        if save_directory:
+            # Saves the whole file after every command, like the unsharded bot
+            save_file = os.path.join(save_directory, 'game_states.json')
+            save = lambda guild_id: save_game_states_file(save_file, self.bot.game_states)
+        self.bot = FakeBot(DeckManager(), os.path.join(save_directory or tempfile.gettempdir(), 'load_test_schedules.json'), save)
+        for cog in (GameCommands(self.bot), TurnManager(self.bot), PeekCommands(self.bot), DeckManagementCommands(self.bot)):
+            self.bot.add_cog(cog)
+
+        # Every guild has a game master role; the game master of each channel runs its commands
+        self.guilds = [FakeGuild(f"Guild {number}", [FakeRole(DEFAULT_GAMEMASTER_ROLE_NAME)]) for number in range(guild_count)]
+        self.users = {guild.id: [FakeMember(transport, f"Player {guild.id}-{number}", dms_closed=number % 50 == 49)
+                                 for number in range(user_count)] for guild in self.guilds}
+        self.channels: List[FakeChannel] = []
+        self.gamemasters: Dict[int, FakeMember] = {}
+        for number in range(channel_count):
+            guild = self.guilds[number % guild_count]
+            channel = FakeChannel(transport, guild, f"game-{number}")
+            self.bot.channels[channel.id] = channel
+            self.channels.append(channel)
+            self.gamemasters[channel.id] = FakeMember(transport, f"Game Master {number}", roles=(guild.roles[0],))
+
+    async def command(self, name: str, cog_name: str, channel: FakeChannel, **params) -> FakeInteraction:
+        """
+        Runs a command as the game master of the channel and records its latency,
+        from the interaction until the command and its save are done.
+        """
+        interaction = FakeInteraction(self.transport, self.gamemasters[channel.id], channel)
+        started = time.perf_counter()
+        try:
+            await self.bot.invoke(cog_name, name, interaction, **params)
+        except Exception as e:
+            self.errors[name] += 1
+            logging.warning(f"/{name} failed in {channel}: {e!r}")
+        self.latencies[name].append(time.perf_counter() - started)
+        return interaction
+
+    async def click(self, name: str, view, label: str, channel: FakeChannel, user: FakeMember, values: List[str] = None) -> None:
+        """
+        Clicks a component and records its latency like a command.
+        """
+        started = time.perf_counter()
+        try:
+            await click(view, label, FakeInteraction(self.transport, user, channel), values)
+        except Exception as e:
+            self.errors[name] += 1
+            logging.warning(f"{name} failed in {channel}: {e!r}")
+        self.latencies[name].append(time.perf_counter() - started)
+
+    async def play(self, channel: FakeChannel) -> None:
+        """
+        Plays a whole game in a channel.
+        """
+        gamemaster = self.gamemasters[channel.id]
+        players = self.users[channel.guild.id]
+        async with self.semaphore:
+            await self.command('listdecks', 'DeckManagementCommands', channel)
+            interaction = await self.command('startgame', 'GameCommands', channel)
+            view = interaction.response.message.view if interaction.response.message else None
+            if view is None:
+                return
+            for item in list(view.children):
+                if getattr(item, 'placeholder', None):
+                    # Pick the standard deck of the type (e.g. 'event_deck'), or else the first one
+                    values = [option.value for option in item.options]
+                    deck_key = item.deck_type if item.deck_type in values else values[0]
+                    await self.click('deck selection', view, item.placeholder, channel, gamemaster, [deck_key])
+            await self.click('start game', view, 'Start Game', channel, gamemaster)
+
+            for _ in range(self.turns):
+                if channel.id not in self.bot.game_states:
+                    break  # Time's Up!
+                player = self.random.choice(players)
+                await self.command('status', 'GameCommands', channel)
+                await self.command('peek', 'PeekCommands', channel, user=player)
+                await self.command('advancedpeek', 'PeekCommands', channel, user=player)
+                if player.last_message and player.last_message.view and self.random.random() < 0.5:
+                    await self.click('advanced peek answer', player.last_message.view, self.random.choice(['Yes', 'No']), channel, player)
+                await self.command('nextturn', 'TurnManager', channel)
+
+            if channel.id in self.bot.game_states:
+                interaction = await self.command('endgame', 'GameCommands', channel)
+                await self.click('end game', interaction.response.message.view, 'Confirm', channel, gamemaster)
+
+    async def monitor_loop_lag(self, interval: float = 0.01) -> None:
+        """
+        Measures how much later than requested the event loop wakes up.
+        """
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lags.append(time.perf_counter() - started - interval)
+
+    async def run(self) -> float:
+        """
+        Plays the games of all channels and returns the elapsed time in seconds.
+        """
+        monitor = asyncio.create_task(self.monitor_loop_lag())
+        started = time.perf_counter()
+        await asyncio.gather(*(self.play(channel) for channel in self.channels))
+        elapsed = time.perf_counter() - started
+        monitor.cancel()
+        return elapsed
+
+    def report(self, elapsed: float) -> str:
+        """
+        Returns the throughput, the latency per command and the event loop lag as text.
+        """
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        lines = [
+            f"{len(self.channels)} channel(s) in {len(self.guilds)} guild(s): {total} commands in {elapsed:.2f}s ({total / elapsed:.0f} commands/s)",
+            f"{'command':<22}{'count':>8}{'errors':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}"
+        ]
+        for name, latencies in self.latencies.items():
+            lines.append(f"{name:<22}{len(latencies):>8}{self.errors[name]:>8}{percentile(latencies, 0.5) * 1000:>10.2f}"
+                         f"{percentile(latencies, 0.99) * 1000:>10.2f}{max(latencies) * 1000:>10.2f}")
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        lines.append(f"{'all':<22}{total:>8}{sum(self.errors.values()):>8}{percentile(everything, 0.5) * 1000:>10.2f}"
+                     f"{percentile(everything, 0.99) * 1000:>10.2f}{max(everything, default=0) * 1000:>10.2f}")
+        lines.append(f"Event loop lag: p50 {percentile(self.loop_lags, 0.5) * 1000:.2f} ms, p99 {percentile(self.loop_lags, 0.99) * 1000:.2f} ms, "
+                     f"max {max(self.loop_lags, default=0) * 1000:.2f} ms")
+        lines.append(f"Discord calls: {dict(self.transport.call_counts)}, rate limited: {self.transport.rate_limited}")
+        return '\n'.join(lines)
+
+async def main(args) -> None:
+    transport = FakeTransport(args.latency / 1000, args.jitter / 1000, args.rate_limit, args.retry_after / 1000, seed=args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        load_test = LoadTest(transport, args.channels, args.guilds, args.users, args.turns, args.concurrency,
+                             directory if args.save else None, args.seed)
+        elapsed = await load_test.run()
+    print(load_test.report(elapsed))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load-test the cogs with fake Discord objects.')
+    parser.add_argument('--channels', type=int, default=1000, help='Channels playing a game at the same time.')
+    parser.add_argument('--guilds', type=int, default=10, help='Guilds the channels are spread over.')
+    parser.add_argument('--users', type=int, default=100, help='Players per guild.')
+    parser.add_argument('--turns', type=int, default=10, help='Turns played per game.')
+    parser.add_argument('--concurrency', type=int, default=1000, help='Games played at the same time.')
+    parser.add_argument('--latency', type=float, default=50, help='Latency of every Discord request in milliseconds.')
+    parser.add_argument('--jitter', type=float, default=50, help='Up to this many milliseconds are added to the latency at random.')
+    parser.add_argument('--rate-limit', type=float, default=0.01, help='Chance that a Discord request is rate limited (429).')
+    parser.add_argument('--retry-after', type=float, default=500, help='Milliseconds to wait before retrying a rate limited request.')
+    parser.add_argument('--save', action='store_true', help='Save all game states after every command, like the unsharded bot.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the simulated players and the injected latency.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR, stream=sys.stderr)
+    asyncio.run(main(args))
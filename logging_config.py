@@ -1,14 +1,154 @@
 #logging_config.py
 
+import os
+import gzip
+import queue
+import atexit
+import shutil
 import logging
+import logging.handlers
+from typing import Dict, List, Optional
 
-def configure_logging():
-    """Configures logging for the application."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
-        handlers=[
-            logging.FileHandler("bot.log"),
-            logging.StreamHandler()
-        ]
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+# Pass as `extra` to mark a line that is logged once per card, so it can be sampled (see SamplingFilter)
+PER_CARD = {'sample': 'per_card'}
+
+# The listener writing the queued log records, started by configure_logging
+listener: Optional[logging.handlers.QueueListener] = None
+
+def parse_settings(value: str) -> Dict[str, str]:
+    """
+    Parses settings of the form 'name=value,name=value', as used by the LOG_* environment variables.
+    """
+    settings = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, setting = item.split('=', 1)
+            settings[name.strip()] = setting.strip()
+    return settings
+
+def parse_level(setting: str, name: str, warnings: List[str]) -> int:
+    """
+    Returns the level named by a setting (e.g. 'WARNING' or '30'). An invalid level falls back to INFO,
+    with a warning added to warnings, so a typo in the environment never stops the bot from starting.
+    """
+    level = setting.strip().upper()
+    if level.isdigit():
+        return int(level)
+    if level in logging._nameToLevel:
+        return logging._nameToLevel[level]
+    warnings.append(f"Invalid log level '{setting}' for {name}, using INFO.")
+    return logging.INFO
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Applies a level per module, and the default level to the other modules. Most of the bot logs through the root logger,
+    so a name matches the module a line was logged from (e.g. 'game_state') as well as a logger (e.g. 'discord.gateway').
+    """
+
+    def __init__(self, levels: Dict[str, int], default_level: int):
+        super().__init__()
+        self.levels = levels
+        self.default_level = default_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        level = self.levels.get(record.module)
+        if level is None:
+            name = record.name
+            while name and level is None:
+                level = self.levels.get(name)
+                name = name.rpartition('.')[0]
+        return record.levelno >= (self.default_level if level is None else level)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in every N lines of a sampled kind (marked with extra={'sample': kind}, e.g. PER_CARD).
+    A kept line tells how many lines of its kind were left out before it. Kinds without a rate are all kept.
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self.skipped: Dict[str, int] = {}  # Kind to lines left out since the last kept line
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        kind = getattr(record, 'sample', None)
+        rate = self.rates.get(kind, 1)
+        if rate <= 1:
+            return True
+        skipped = self.skipped.get(kind, 0)
+        if skipped + 1 < rate:
+            self.skipped[kind] = skipped + 1
+            return False
+        self.skipped[kind] = 0
+        record.msg = f"{record.getMessage()} ({skipped} similar line(s) not logged)"
+        record.args = None
+        return True
+
+def compress_rotated_log(source: str, destination: str) -> None:
+    """
+    Rotates a log file into a gzip compressed backup.
+    """
+    with open(source, 'rb') as log_file, gzip.open(destination, 'wb') as compressed_file:
+        shutil.copyfileobj(log_file, compressed_file)
+    os.remove(source)
+
+def configure_logging(log_file: str = 'bot.log'):
+    """
+    Configures logging for the application.
+    Log records are put on a queue and written to the console and the log file by a background thread,
+    so logging never waits for the disk. The log file rotates into compressed backups (bot.log.1.gz, ...).
+    Settings are read from the environment:
+    LOG_LEVEL (default INFO), LOG_MODULE_LEVELS (e.g. 'game_state=WARNING,discord=WARNING'),
+    LOG_SAMPLING (e.g. 'per_card=10' keeps one in ten per-card lines), LOG_MAX_BYTES (default 10 MB) and LOG_BACKUP_COUNT (default 5).
+    Without them the output is the same as before, every line at INFO and above.
+    """
+    global listener
+    if listener is not None:
+        return  # Already configured in this process
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+        backupCount=int(os.getenv('LOG_BACKUP_COUNT', 5))
     )
+    file_handler.namer = lambda name: name + '.gz'
+    file_handler.rotator = compress_rotated_log
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    # Filtered before queueing, so dropped lines cost no formatting or I/O
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    warnings = []  # Logged once the handlers are set up
+    default_level = parse_level(os.getenv('LOG_LEVEL', 'INFO'), 'LOG_LEVEL', warnings)
+    module_levels = {name: parse_level(level, f"module '{name}'", warnings) for name, level in parse_settings(os.getenv('LOG_MODULE_LEVELS', '')).items()}
+    sampling_rates = {}
+    for kind, rate in parse_settings(os.getenv('LOG_SAMPLING', '')).items():
+        if rate.isdigit():
+            sampling_rates[kind] = int(rate)
+        else:
+            warnings.append(f"Invalid sampling rate '{rate}' for '{kind}', logging every line.")
+    queue_handler.addFilter(ModuleLevelFilter(module_levels, default_level))
+    queue_handler.addFilter(SamplingFilter(sampling_rates))
+
+    root = logging.getLogger()
+    root.setLevel(min([default_level, *module_levels.values()]))  # The filter applies the level of each module
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_logging)
+    for warning in warnings:
+        logging.warning(warning)
+
+def stop_logging():
+    """
+    Writes the queued log records and stops the background thread.
+    """
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
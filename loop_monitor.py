@@ -0,0 +1,116 @@
+# loop_monitor.py
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Optional
+from metrics import LOOP_LAG, metrics
+
+# Frames of files in this directory are the bot's own code
+BOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up, and finds out what blocks it.
+    A task on the loop sleeps for interval seconds at a time and records the lag (the time it woke up too late).
+    A watchdog thread checks that the task keeps waking up; once the loop has been stuck for threshold seconds,
+    it samples the stack of the loop thread while it is still blocked and logs the frame of the bot that is running.
+    Each stall is reported once.
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.1, stack_depth: int = 8):
+        self.threshold = threshold  # Seconds of lag that are reported, 0 turns the monitor off
+        self.interval = interval
+        self.stack_depth = stack_depth  # Frames of the blocked stack that are logged
+        self.heartbeat = time.monotonic()  # Set by the loop task before every sleep
+        self.reported_heartbeat: Optional[float] = None  # Heartbeat of the last reported stall
+        self.last_lag = 0.0
+        self.loop_thread_id: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.watchdog: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        metrics.gauge('potr_event_loop_lag_last_seconds', 'Lag of the last event loop wakeup.', lambda: self.last_lag)
+
+    def start(self) -> None:
+        """
+        Starts measuring the loop this is called on.
+        """
+        if self.task is not None or self.threshold <= 0:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.stopping.clear()
+        self.task = asyncio.get_running_loop().create_task(self.measure())
+        self.watchdog = threading.Thread(target=self.watch, name='loop-watchdog', daemon=True)
+        self.watchdog.start()
+        logging.info(f"Monitoring event loop lag (reported above {self.threshold * 1000:.0f} ms).")
+
+    async def stop(self) -> None:
+        """
+        Stops the loop task and the watchdog thread.
+        """
+        if self.task is None:
+            return
+        self.stopping.set()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        self.watchdog.join()
+        self.watchdog = None
+
+    async def measure(self) -> None:
+        """
+        Records the lag of every wakeup.
+        """
+        while True:
+            self.heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, time.monotonic() - self.heartbeat - self.interval)
+            LOOP_LAG.observe(self.last_lag)
+            if self.last_lag >= self.threshold:
+                logging.warning(f"Event loop lagged {self.last_lag * 1000:.0f} ms.")
+
+    def watch(self) -> None:
+        """
+        Samples the stack of the loop thread when the loop is stuck. Runs on the watchdog thread.
+        """
+        while not self.stopping.wait(self.threshold / 2):
+            heartbeat = self.heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.threshold or heartbeat == self.reported_heartbeat:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            self.reported_heartbeat = heartbeat
+            logging.warning(
+                f"Event loop blocked for {blocked * 1000:.0f} ms in {describe_frame(bot_frame(frame) or frame)}. Stack:\n"
+                + ''.join(traceback.format_stack(frame, limit=self.stack_depth))
+            )
+
+def bot_frame(frame):
+    """
+    Returns the innermost frame of the bot's own code in a stack, or None if the stack has none.
+    """
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(BOT_DIRECTORY) and 'site-packages' not in filename:
+            return frame
+        frame = frame.f_back
+    return None
+
+def describe_frame(frame) -> str:
+    """
+    Returns the function, file and line of a frame.
+    """
+    return f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+
+# Shared monitor of the bot's event loop
+loop_monitor = LoopLagMonitor()
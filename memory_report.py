@@ -0,0 +1,170 @@
+# memory_report.py
+
+import sys
+import time
+import types
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Set
+import discord
+from card_images import card_images
+from metrics import metrics
+from utils import gamemaster_roles
+from turn_schedule import cached_rulesets
+from tracing import tracer
+
+# The metrics reuse a report for this many seconds, building one walks every game
+MEMORY_REPORT_MAX_AGE = 60.0
+
+# Not followed when measuring: shared code and runtime objects
+SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.CodeType, types.FrameType)
+
+def deep_size(obj, seen: Set[int]) -> int:
+    """
+    Returns the approximate size in bytes of an object and everything it references that is not in seen.
+    The IDs of the measured objects are added to seen, so shared objects are only counted once.
+    Discord and asyncio objects are counted without what they reference, which belongs to the client and the loop.
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, SKIPPED_TYPES):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, (dict, types.MappingProxyType)):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        elif type(current).__module__.startswith(('discord', 'asyncio', 'aiohttp')):
+            continue
+        else:
+            if hasattr(current, '__dict__'):
+                stack.append(current.__dict__)
+            for cls in type(current).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if hasattr(current, slot):
+                        stack.append(getattr(current, slot))
+    return size
+
+def ended_game_views(bot) -> List[discord.ui.View]:
+    """
+    Returns the views that are still open although their game has ended, e.g. peeks that were never answered.
+    """
+    from peek_commands import peek_views  # Imported here, peek_commands imports the cogs' dependencies
+    return [
+        view for view in list(peek_views)
+        if not view.is_finished() and bot.game_states.get(view.game_state.channel_id) is not view.game_state
+    ]
+
+async def build_memory_report(bot, batch: int = 50) -> Dict:
+    """
+    Measures the approximate memory of the running games, the deck library and the caches.
+    Games are measured without the decks they share with the library (decks replaced since they started are counted).
+    Yields to the event loop after every batch of games, so a report of many games does not block the bot.
+    """
+    shared: Set[int] = set()
+    for shared_object in (bot, bot.deck_manager, bot.game_states, bot.worker_pool, bot.turn_scheduler):
+        shared.add(id(shared_object))
+    decks = {deck_key: deep_size(deck, shared) for deck_key, deck in list(bot.deck_manager.decks.items())}
+
+    games = {}
+    views = pending_actions = 0
+    for number, (channel_id, game_state) in enumerate(list(bot.game_states.items()), 1):
+        games[channel_id] = deep_size(game_state, set(shared))
+        views += len(game_state.active_views)
+        pending_actions += len(game_state.pending_card_actions)
+        if number % batch == 0:
+            await asyncio.sleep(0)
+
+    caches = {
+        'card images': deep_size(card_images.images, set()),
+        'game master roles': deep_size(gamemaster_roles.role_names, set()) + deep_size(gamemaster_roles.role_ids, set()),
+        'rulesets': deep_size(cached_rulesets(), set()),
+        'open traces': deep_size(tracer.traces, set()),
+        'metrics': deep_size(metrics.metrics, set()),
+    }
+    return {
+        'created': time.time(),
+        'games': games,
+        'decks': decks,
+        'caches': caches,
+        'views': views,
+        'pending_actions': pending_actions,
+        'leaked_views': [(type(view).__name__, view.game_state.channel_id, deep_size(view, set(shared))) for view in ended_game_views(bot)],
+    }
+
+class MemoryReports:
+    """
+    Keeps the last memory report of the bot for the metrics. A scrape never measures anything itself:
+    it reads the last report and starts a new one in the background if it is older than MEMORY_REPORT_MAX_AGE seconds.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.report: Optional[Dict] = None
+        self.refresh_task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> Dict:
+        """
+        Builds a new report and keeps it.
+        """
+        started = time.perf_counter()
+        self.report = await build_memory_report(self.bot)
+        logging.debug(f"Built a memory report of {len(self.report['games'])} game(s) in {time.perf_counter() - started:.3f}s.")
+        return self.report
+
+    def latest(self, key: str) -> Dict:
+        """
+        Returns a part of the last report (empty until the first one is done), refreshing it in the background if it is too old.
+        """
+        stale = self.report is None or time.time() - self.report['created'] > MEMORY_REPORT_MAX_AGE
+        if stale and (self.refresh_task is None or self.refresh_task.done()):
+            self.refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+        return self.report[key] if self.report else {}
+
+    def register_metrics(self) -> None:
+        """
+        Registers the gauges of the memory report.
+        """
+        metrics.gauge('potr_memory_games_bytes', 'Approximate memory of the running games.', lambda: sum(self.latest('games').values()))
+        metrics.gauge('potr_memory_largest_game_bytes', 'Approximate memory of the largest game.', lambda: max(self.latest('games').values(), default=0))
+        metrics.gauge('potr_memory_decks_bytes', 'Approximate memory of the deck library.', lambda: sum(self.latest('decks').values()))
+        metrics.gauge('potr_memory_caches_bytes', 'Approximate memory of the caches.', lambda: sum(self.latest('caches').values()))
+        metrics.gauge('potr_leaked_views', 'Open views whose game has ended.', lambda: len(self.latest('leaked_views')))
+
+def format_size(size: int) -> str:
+    """
+    Formats a size in bytes for humans.
+    """
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+def format_memory_report(report: Dict, deck_names: Dict[str, str], top: int = 10) -> List[str]:
+    """
+    Returns the lines of a memory report: the totals, the largest games, the decks, the caches and the leaked views.
+    """
+    games = sorted(report['games'].items(), key=lambda item: item[1], reverse=True)
+    lines = [
+        f"**Games:** {len(games)} using {format_size(sum(report['games'].values()))} "
+        f"({report['views']} open view(s), {report['pending_actions']} pending peek action(s))",
+        f"**Decks:** {len(report['decks'])} using {format_size(sum(report['decks'].values()))}",
+        f"**Caches:** {format_size(sum(report['caches'].values()))}",
+        "",
+        f"**Largest games:**"
+    ]
+    lines += [f"<#{channel_id}>: {format_size(size)}" for channel_id, size in games[:top]] or ["None"]
+    lines += ["", "**Decks:**"]
+    lines += [f"{deck_names.get(deck_key, deck_key)}: {format_size(size)}" for deck_key, size in sorted(report['decks'].items(), key=lambda item: item[1], reverse=True)]
+    lines += ["", "**Caches:**"]
+    lines += [f"{name}: {format_size(size)}" for name, size in report['caches'].items()]
+    if report['leaked_views']:
+        lines += ["", f"**Warning: {len(report['leaked_views'])} open view(s) belong to games that have ended:**"]
+        lines += [f"{name} of <#{channel_id}>: {format_size(size)}" for name, channel_id, size in report['leaked_views'][:top]]
+    return lines
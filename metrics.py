@@ -0,0 +1,164 @@
+# metrics.py
+
+import asyncio
+import logging
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Bucket upper bounds of the latency histograms (seconds) and the size histograms (bytes)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+def format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Formats labels in the Prometheus text format, e.g. {command="nextturn"}.
+    """
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+class Histogram:
+    """
+    Counts observed values in cumulative buckets, per combination of labels.
+    """
+
+    def __init__(self, name: str, description: str, buckets: Iterable[float]):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[Tuple[str, str], ...], List] = {}  # Labels to [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Records a value.
+        """
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1  # Made cumulative when rendered
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        """
+        Returns the lines of the histogram in the Prometheus text format.
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for key, (bucket_counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{format_labels(key + (('le', repr(float(bound))),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(key)} {count}")
+        return lines
+
+class Gauge:
+    """
+    A value read when the metrics are collected, so keeping it up to date costs nothing.
+    """
+
+    def __init__(self, name: str, description: str, read: Callable[[], float]):
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def render(self) -> List[str]:
+        """
+        Returns the lines of the gauge in the Prometheus text format.
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        try:
+            lines.append(f"{self.name} {self.read()}")
+        except Exception as e:
+            logging.warning(f"Failed to read metric '{self.name}': {e}")
+        return lines
+
+class MetricsRegistry:
+    """
+    In-process metrics of the bot, served in the Prometheus text format on a local HTTP endpoint.
+    Recording a value only updates a few numbers in memory; the text is built when the endpoint is scraped.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}  # Metric name to Histogram or Gauge, in registration order
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def histogram(self, name: str, description: str, buckets: Iterable[float]) -> Histogram:
+        """
+        Registers a histogram, or returns the one already registered under that name.
+        """
+        if name not in self.metrics:
+            self.metrics[name] = Histogram(name, description, buckets)
+        return self.metrics[name]
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]) -> Gauge:
+        """
+        Registers a gauge, replacing the one registered under that name.
+        """
+        self.metrics[name] = Gauge(name, description, read)
+        return self.metrics[name]
+
+    def render(self) -> str:
+        """
+        Returns all metrics in the Prometheus text format.
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    async def start_server(self, port: int, host: str = '127.0.0.1') -> None:
+        """
+        Serves the metrics at http://host:port/metrics. Only listens on localhost unless another host is given.
+        """
+        self.server = await asyncio.start_server(self.handle_request, host, port)
+        logging.info(f"Metrics served at http://{host}:{port}/metrics.")
+
+    async def stop_server(self) -> None:
+        """
+        Stops serving the metrics.
+        """
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answers a single HTTP request, then closes the connection.
+        """
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''):
+                pass  # Skip the headers
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, content_type, body = '200 OK', 'text/plain; version=0.0.4', self.render().encode('utf-8')
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain', b'Not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+# Shared registry of the bot
+metrics = MetricsRegistry()
+
+COMMAND_LATENCY = metrics.histogram('potr_command_latency_seconds', 'Time from a command invocation until it completed or failed.', LATENCY_BUCKETS)
+SAVE_DURATION = metrics.histogram('potr_save_game_states_seconds', 'Duration of saving the game states.', LATENCY_BUCKETS)
+SAVE_BYTES = metrics.histogram('potr_save_game_states_bytes', 'Bytes written by saving the game states.', BYTES_BUCKETS)
+REVEAL_IMAGE_BYTES = metrics.histogram('potr_reveal_image_bytes', 'Card image bytes uploaded per reveal phase.', BYTES_BUCKETS)
+TURN_SEND_CALLS = metrics.histogram('potr_turn_send_calls', 'Discord send calls per turn advancement.', COUNT_BUCKETS)
+LOOP_LAG = metrics.histogram('potr_event_loop_lag_seconds', 'How much later than scheduled the event loop woke up.', LAG_BUCKETS)
@@ -1,13 +1,19 @@
 # peek_commands.py
 
 import discord
-import random
 from discord.ext import commands
 from discord import app_commands
 import logging
-from typing import Optional, Tuple, Dict
+import weakref
+from typing import Optional, Tuple, Dict, FrozenSet
 from game_state import GameState, CardAction
+from worker_pool import RemoteGameState
 from utils import admin_or_gamemaster_only, create_embed
+from card_effects import DRAGON, UNMOVABLE
+from card_images import card_images
+
+# Every peek view that has not been garbage collected, so the memory report can find views that outlive their game
+peek_views = weakref.WeakSet()
 
 class PeekCommands(commands.Cog):
     """
@@ -95,9 +101,9 @@ class PeekCommands(commands.Cog):
 
     async def handle_peek(self, interaction, user, game_state, deck_key):
         """Handles the peek command for a specified deck."""
-        card_tuple = self.peek_top_card(game_state, deck_key)
+        card_tuple = await self.peek_top_card(game_state, deck_key)
         if card_tuple:
-            card, _ = card_tuple
+            card, _, _ = card_tuple
             try:
                 title = f"Top card from {deck_key.replace('_', ' ').title()}"
                 embed, file = create_embed(title, card)
@@ -120,17 +126,16 @@ class PeekCommands(commands.Cog):
 
     async def handle_advanced_peek(self, interaction, user, game_state, deck_key):
         """Handles the advanced peek command for a specified deck."""
-        card_tuple = self.peek_top_card(game_state, deck_key)
+        card_tuple = await self.peek_top_card(game_state, deck_key)
         if card_tuple:
-            card, _ = card_tuple
+            card, _, tags = card_tuple
             try:
                 # Create the embed and file
                 title = f"Top card from {deck_key.replace('_', ' ').title()}"
                 embed, file = create_embed(title, card)
 
                 # Handle special cards that cannot be moved
-                unmovable_cards = ["black swan", "power overwhelming"]
-                if card['name'].lower() in unmovable_cards:
+                if UNMOVABLE in tags:
                     embed.add_field(name="Note", value=f"You cannot move '{card['name']}' to the bottom of the deck.")
                     if file:
                         await user.send(embed=embed, file=file)
@@ -165,15 +170,15 @@ class PeekCommands(commands.Cog):
 
     async def handle_advanced_dragon_peek(self, interaction, user, game_state, deck_key):
         """Handles the advanced dragon peek with special mechanics."""
-        card_tuple = self.peek_top_card(game_state, deck_key)
+        card_tuple = await self.peek_top_card(game_state, deck_key)
         if card_tuple:
-            card, _ = card_tuple
+            card, _, tags = card_tuple
             try:
                 # Create the embed and file
                 title = f"Top card from {deck_key.replace('_', ' ').title()}"
                 embed, file = create_embed(title, card)
 
-                if card['name'].lower() != "there be dragons!":
+                if DRAGON not in tags:
                     # Check for existing CardAction
                     card_action = game_state.pending_card_actions.get(deck_key)
                     if not card_action or card_action.card != card:
@@ -219,14 +224,15 @@ class PeekCommands(commands.Cog):
             self.deck_key = deck_key
             self.card_action = card_action
             self.game_state.active_views.append(self)  # Register the view with the game state
+            peek_views.add(self)
 
         @discord.ui.button(label='Yes', style=discord.ButtonStyle.green)
         async def yes(self, interaction_button: discord.Interaction, button: discord.ui.Button):
             """Handles the 'Yes' button press."""
             if not self.card_action.action_performed:
                 # Perform the action
-                self.move_top_card_to_bottom(self.game_state, self.deck_key)
                 self.card_action.action_performed = True
+                await self.move_top_card_to_bottom(self.game_state, self.deck_key)
             # Send confirmation message
             try:
                 await self.user.send("Your choice has been recorded and the card was moved to the bottom of the draw pile.")
@@ -282,18 +288,15 @@ class PeekCommands(commands.Cog):
 
 
         # Method to move top card to bottom, used by advanced peek commands (event deck only)
-        def move_top_card_to_bottom(self, game_state: GameState, deck_name: str) -> None:
+        async def move_top_card_to_bottom(self, game_state: GameState, deck_name: str) -> None:
             """
             Moves the top card of the specified deck to the bottom if it's the same as the original card.
             """
-            if deck_name in game_state.draw_piles and game_state.draw_piles[deck_name]:
-                top_card = game_state.draw_piles[deck_name][-1]  # Get the top card
-                if top_card == self.card_action.card:
-                    game_state.draw_piles[deck_name].pop()  # Remove the top card
-                    game_state.draw_piles[deck_name].insert(0, top_card)  # Insert it at the bottom
-                    logging.info("Action performed and recorded")
-                else:
-                    logging.warning("The top card has changed; action cannot be performed.")
+            if isinstance(game_state, RemoteGameState):
+                await game_state.call('move_top_card_to_bottom', deck_key=deck_name, card=self.card_action.card)
+            else:
+                game_state.move_top_card_to_bottom(deck_name, self.card_action.card)
+            card_images.prefetch_next_cards(game_state)  # The deck has a new top card
 
     # Handles action for user of advanced dragon peek
     class DragonPeekView(discord.ui.View):
@@ -311,14 +314,15 @@ class PeekCommands(commands.Cog):
             self.original_card = original_card
             self.card_action = card_action
             self.game_state.active_views.append(self)  # Register the view with the game state
+            peek_views.add(self)
 
         @discord.ui.button(label='Yes', style=discord.ButtonStyle.green)
         async def yes(self, interaction_button: discord.Interaction, button: discord.ui.Button):
             """Handles the 'Yes' button press."""
             if not self.card_action.action_performed:
                 # Perform the action
-                self.replace_top_card_with_dragon(self.game_state, self.deck_key)
                 self.card_action.action_performed = True
+                await self.replace_top_card_with_dragon(self.game_state, self.deck_key)
             # Send confirmation message
             try:
                 await self.user.send("Your choice has been recorded, prepare to spread chaos.")
@@ -374,74 +378,26 @@ class PeekCommands(commands.Cog):
                 if self.game_state.pending_card_actions.get(self.deck_key) == self.card_action:
                     del self.game_state.pending_card_actions[self.deck_key]
                     
-        def replace_top_card_with_dragon(self, game_state: GameState, deck_name: str) -> None:
+        async def replace_top_card_with_dragon(self, game_state: GameState, deck_name: str) -> None:
             """
             Replaces the top card with a 'There be Dragons!' card if possible.
             """
-            if deck_name in game_state.draw_piles and game_state.draw_piles[deck_name]:
-                top_card = game_state.draw_piles[deck_name][-1]  # Get the top card
-                if top_card == self.card_action.card:
-                    # Remove the top card
-                    game_state.draw_piles[deck_name].pop()
-
-                    # Find a 'There be Dragons!' card
-                    dragon_card = None
-                    # Search in draw pile
-                    for card in game_state.draw_piles[deck_name]:
-                        if card['name'].lower() == "there be dragons!":
-                            dragon_card = card
-                            break
-                    # If not found, search in discard pile
-                    if not dragon_card:
-                        for card in game_state.discard_piles[deck_name]:
-                            if card['name'].lower() == "there be dragons!":
-                                dragon_card = card
-                                break
-                    # If found, place it on top
-                    if dragon_card:
-                        game_state.draw_piles[deck_name].append(dragon_card)
-                    else:
-                        logging.warning("Could not find 'There be Dragons!' to replace the top card.")
-                else:
-                    logging.warning("The top card has changed; action cannot be performed.")
+            if isinstance(game_state, RemoteGameState):
+                await game_state.call('replace_top_card_with_dragon', deck_key=deck_name, card=self.card_action.card)
+            else:
+                game_state.replace_top_card_with_dragon(deck_name, self.card_action.card)
+            card_images.prefetch_next_cards(game_state)  # The deck has a new top card
 
     #Method to peak at top cards, used by all peek commands.
-    def peek_top_card(self, game_state: GameState, deck_name: str) -> Optional[Tuple[Dict[str, str], str]]:
+    async def peek_top_card(self, game_state: GameState, deck_name: str) -> Optional[Tuple[Dict[str, str], str, FrozenSet[str]]]:
         """
         Peeks at the top card of the specified deck without removing it.
         If the draw pile is empty, reshuffles the discard pile (and in-play cards from this deck) into the draw pile, then peeks.
+        Returns the card with its deck and effect tags, see GameState.peek_top_card.
         """
-        if deck_name in game_state.draw_piles:
-            if not game_state.draw_piles[deck_name]:
-                # Draw pile is empty, need to reshuffle
-                # Move discard pile into draw pile
-                game_state.draw_piles[deck_name].extend(game_state.discard_piles[deck_name])
-                game_state.discard_piles[deck_name].clear()
-                logging.info(f"Moved discard pile of '{deck_name}' into draw pile for reshuffling.")
-                
-                # Now, move in-play cards from this deck into draw pile
-                in_play_cards_to_remove = []
-                for card_tuple in game_state.current_turn_drawn_cards:
-                    card, card_deck_name = card_tuple
-                    if card_deck_name == deck_name:
-                        game_state.draw_piles[deck_name].append(card)
-                        in_play_cards_to_remove.append(card_tuple)
-                # Remove these cards from in_play_cards
-                for card_tuple in in_play_cards_to_remove:
-                    game_state.current_turn_drawn_cards.remove(card_tuple)
-                logging.info(f"Moved in-play cards from '{deck_name}' back into draw pile for reshuffling.")
-
-                # Shuffle the draw pile
-                random.shuffle(game_state.draw_piles[deck_name])
-                logging.info(f"Reshuffled the '{deck_name}' due to empty draw pile during peek.")
-            
-            if game_state.draw_piles[deck_name]:
-                card = game_state.draw_piles[deck_name][-1]  # Peek at the top of the deck
-                return card, deck_name
-            else:
-                # Even after reshuffling, the draw pile is empty
-                logging.warning(f"No cards available in '{deck_name}' even after reshuffling.")
-                return None
+        if isinstance(game_state, RemoteGameState):
+            card_tuple = await game_state.call('peek_top_card', deck_key=deck_name)
         else:
-            logging.error(f"Deck '{deck_name}' does not exist in the game state.")
-            return None
\ No newline at end of file
+            card_tuple = game_state.peek_top_card(deck_name)
+        card_images.prefetch_next_cards(game_state)  # Peeking may have reshuffled the deck
+        return card_tuple
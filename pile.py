@@ -0,0 +1,140 @@
+# pile.py
+
+import random
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+def card_index(cards: Sequence[Dict[str, str]]) -> Dict[int, int]:
+    """
+    Maps each card object of a deck version to its card ID (its position in the deck version).
+    Shared by all piles of the same deck.
+    """
+    return {id(card): card_id for card_id, card in enumerate(cards)}
+
+class Pile:
+    """
+    A pile of cards (draw or discard pile) stored as card IDs into the cards of a deck version.
+    The top of the pile is the right end of the deque, so draw, peek, put on top and put at the bottom are O(1).
+    """
+
+    __slots__ = ('cards', 'index', 'card_ids')
+
+    def __init__(self, cards: Sequence[Dict[str, str]], card_ids: Iterable[int] = (), index: Optional[Dict[int, int]] = None):
+        self.cards = cards  # Cards of the deck version, looked up by card ID
+        self.index = index if index is not None else card_index(cards)  # Card object to card ID mapping
+        self.card_ids = deque(card_ids)  # Bottom to top
+
+    @classmethod
+    def full(cls, cards: Sequence[Dict[str, str]], index: Optional[Dict[int, int]] = None) -> 'Pile':
+        """
+        Creates a pile containing every card of a deck version once (unshuffled).
+        """
+        return cls(cards, range(len(cards)), index)
+
+    def __len__(self) -> int:
+        return len(self.card_ids)
+
+    def __bool__(self) -> bool:
+        return bool(self.card_ids)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        """
+        Iterates over the cards from the bottom to the top of the pile.
+        """
+        cards = self.cards
+        return (cards[card_id] for card_id in self.card_ids)
+
+    def card_id(self, card: Dict[str, str]) -> int:
+        """
+        Returns the card ID of a card of this deck.
+        Cards that are equal but not the same object (e.g. sent back by a worker process) are looked up by content.
+        """
+        card_id = self.index.get(id(card))
+        if card_id is None or self.cards[card_id] is not card:
+            try:
+                card_id = self.cards.index(card)
+            except ValueError:
+                raise ValueError(f"Card '{card.get('name')}' is not part of this deck.") from None
+        return card_id
+
+    def peek(self) -> Optional[Dict[str, str]]:
+        """
+        Returns the top card without removing it, or None if the pile is empty.
+        """
+        return self.cards[self.card_ids[-1]] if self.card_ids else None
+
+    def draw(self) -> Dict[str, str]:
+        """
+        Removes and returns the top card. Raises IndexError if the pile is empty.
+        """
+        return self.cards[self.card_ids.pop()]
+
+    def put_top(self, card: Dict[str, str]) -> None:
+        """
+        Puts a card on top of the pile.
+        """
+        self.card_ids.append(self.card_id(card))
+
+    def put_bottom(self, card: Dict[str, str]) -> None:
+        """
+        Puts a card at the bottom of the pile.
+        """
+        self.card_ids.appendleft(self.card_id(card))
+
+    def move_top_to_bottom(self) -> None:
+        """
+        Moves the top card to the bottom of the pile.
+        """
+        self.card_ids.rotate(1)
+
+    def find(self, predicate: Callable[[Dict[str, str]], bool]) -> Optional[Dict[str, str]]:
+        """
+        Returns the first card from the bottom that matches the predicate, or None.
+        """
+        return next((card for card in self if predicate(card)), None)
+
+    def remove(self, card: Dict[str, str]) -> None:
+        """
+        Removes a card from anywhere in the pile. Raises ValueError if it is not in the pile.
+        """
+        self.card_ids.remove(self.card_id(card))
+
+    def take_all(self, other: 'Pile') -> None:
+        """
+        Moves all cards of another pile of the same deck on top of this pile and empties the other pile.
+        """
+        self.card_ids.extend(other.card_ids)
+        other.card_ids.clear()
+
+    def clear(self) -> None:
+        """
+        Removes all cards from the pile.
+        """
+        self.card_ids.clear()
+
+    def shuffle(self, rng: random.Random = random) -> None:
+        """
+        Shuffles the pile. The IDs are shuffled as a list, since indexing the middle of a deque is O(n).
+        """
+        card_ids = list(self.card_ids)
+        rng.shuffle(card_ids)
+        self.card_ids = deque(card_ids)
+
+    def to_data(self) -> List[int]:
+        """
+        Returns the card IDs from bottom to top, which is how piles are saved.
+        """
+        return list(self.card_ids)
+
+    @classmethod
+    def from_data(cls, cards: Sequence[Dict[str, str]], data: Iterable[int], index: Optional[Dict[int, int]] = None) -> 'Pile':
+        """
+        Restores a pile saved with to_data. Raises ValueError if a saved card ID is not part of the deck version.
+        """
+        card_ids = list(data)
+        if any(not isinstance(card_id, int) or not 0 <= card_id < len(cards) for card_id in card_ids):
+            raise ValueError(f"Saved pile refers to cards that are not part of this deck ({len(cards)} cards).")
+        return cls(cards, card_ids, index)
+
+    def __repr__(self) -> str:
+        return f"Pile({len(self.card_ids)} cards)"
@@ -0,0 +1,76 @@
+# replay.py
+
+import sys
+import json
+import logging
+import argparse
+from typing import Dict, Optional
+from game_state import GameState
+from game_rules import GameRules
+from deck_manager import DeckManager
+from turn_schedule import DEFAULT_RULESET
+from game_persistence import read_game_states_file, saved_deck_versions, serialize_game_state
+
+def replay_game(channel_id: int, state_data: Dict, deck_manager: DeckManager, action_count: Optional[int] = None) -> GameState:
+    """
+    Replays a saved game from its seed and action log, without Discord.
+    Replays the first action_count actions if given, otherwise all of them.
+    Raises ValueError if the game cannot be replayed.
+    """
+    if state_data.get('action_log') is None:
+        raise ValueError("The game was saved before its actions were logged.")
+    missing_decks = [deck for deck in state_data.get('deck_keys', []) if deck not in deck_manager.decks]
+    if missing_decks:
+        raise ValueError(f"Missing decks: {', '.join(missing_decks)}")
+
+    game_state = GameState(
+        channel_id=channel_id,
+        deck_keys=state_data['deck_keys'],
+        deck_manager=deck_manager,
+        guild_id=state_data.get('guild_id'),
+        seed=state_data['seed'],
+        deck_versions=saved_deck_versions(state_data, deck_manager),
+        ruleset=state_data.get('ruleset', DEFAULT_RULESET),
+        deck_activation=state_data.get('deck_activation')
+    )
+    game_rules = GameRules()
+    for action, *arguments in state_data['action_log'][:action_count]:
+        if action == 'reveal':
+            game_rules.run_reveal_phase(game_state)
+        elif action == 'advance_turn':
+            game_state.advance_turn()
+        elif action == 'peek':
+            game_state.peek_top_card(*arguments)
+        elif action == 'move_top_card_to_bottom':
+            deck_name, = arguments
+            game_state.move_top_card_to_bottom(deck_name, game_state.draw_piles[deck_name].peek())
+        elif action == 'replace_top_card_with_dragon':
+            deck_name, = arguments
+            game_state.replace_top_card_with_dragon(deck_name, game_state.draw_piles[deck_name].peek())
+        else:
+            raise ValueError(f"Unknown action '{action}' in the action log.")
+    return game_state
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a saved game from its seed and action log.')
+    parser.add_argument('file', help='Saved game states file, e.g. game_states.json.')
+    parser.add_argument('channel_id', type=int, help='Channel of the game to replay.')
+    parser.add_argument('--actions', type=int, default=None, help='Only replay this many actions and print the state reached.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    state_data = read_game_states_file(args.file).get(str(args.channel_id))
+    if state_data is None:
+        sys.exit(f"No game saved for channel {args.channel_id} in '{args.file}'.")
+    try:
+        game_state = replay_game(args.channel_id, state_data, DeckManager(), args.actions)
+    except ValueError as e:
+        sys.exit(f"Cannot replay the game: {e}")
+    replayed_data = serialize_game_state(game_state)
+    if args.actions is not None:
+        print(json.dumps(game_state.get_status(), indent=4))
+    elif replayed_data == json.loads(json.dumps(state_data)):
+        print(f"Replayed {len(state_data['action_log'])} actions: the replayed game matches the saved game.")
+    else:
+        differences = [field for field in replayed_data if replayed_data[field] != state_data.get(field)]
+        sys.exit(f"The replayed game differs from the saved game in: {', '.join(differences)}")
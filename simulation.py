@@ -0,0 +1,171 @@
+# simulation.py
+
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from game_state import GameState
+from game_rules import GameRules
+from deck_manager import DeckManager
+from turn_schedule import DEFAULT_RULESET, get_ruleset
+
+class SimulationStats:
+    """
+    Aggregate statistics of simulated games. Stats of different batches can be merged.
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.unfinished_games = 0  # Games stopped at the turn limit before 'Time's Up!' ended them
+        self.game_lengths = Counter()  # Number of turns to number of games
+        self.black_swan_chains = Counter()  # Cards drawn by one Black Swan effect to number of effects
+        self.card_appearances = Counter()  # 'deck key/card name' to number of times the card was drawn
+
+    def merge(self, other: 'SimulationStats') -> None:
+        """
+        Adds the stats of another batch of games.
+        """
+        self.games += other.games
+        self.unfinished_games += other.unfinished_games
+        self.game_lengths.update(other.game_lengths)
+        self.black_swan_chains.update(other.black_swan_chains)
+        self.card_appearances.update(other.card_appearances)
+
+    def to_dict(self) -> Dict:
+        """
+        Returns the stats as a JSON serializable dictionary.
+        """
+        return {
+            'games': self.games,
+            'unfinished_games': self.unfinished_games,
+            'game_lengths': dict(sorted(self.game_lengths.items())),
+            'black_swan_chains': dict(sorted(self.black_swan_chains.items())),
+            'card_appearances_per_game': {
+                card: count / self.games for card, count in self.card_appearances.most_common()
+            } if self.games else {},
+        }
+
+    def report(self) -> str:
+        """
+        Returns a human readable summary of the stats.
+        """
+        if not self.games:
+            return "No games simulated."
+        lengths = sorted(self.game_lengths.elements())
+        mean_length = sum(lengths) / len(lengths)
+        lines = [
+            f"Games: {self.games} ({self.unfinished_games} stopped at the turn limit)",
+            f"Game length: mean {mean_length:.2f}, median {lengths[len(lengths) // 2]}, "
+            f"min {lengths[0]}, max {lengths[-1]}",
+            "Game length distribution:",
+        ]
+        lines += [f"  {turns:>4} turns: {count / self.games:7.2%}" for turns, count in sorted(self.game_lengths.items())]
+        effects = sum(self.black_swan_chains.values())
+        lines.append(f"Black Swan effects: {effects / self.games:.3f} per game")
+        lines += [f"  chain of {length}: {count / effects:7.2%}" for length, count in sorted(self.black_swan_chains.items())]
+        lines.append("Card appearances per game:")
+        lines += [f"  {count / self.games:8.3f}  {card}" for card, count in self.card_appearances.most_common()]
+        return '\n'.join(lines)
+
+def simulate_game(deck_manager: DeckManager, game_rules: GameRules, deck_keys: List[str], ruleset: str, seed: int, max_turns: int, stats: SimulationStats) -> None:
+    """
+    Plays one game without Discord, the same way /startgame and /nextturn do, and adds it to the stats.
+    The game is seeded, so the same seed always plays the same game.
+    """
+    game_state = GameState(channel_id=seed, deck_keys=deck_keys, deck_manager=deck_manager, seed=seed, ruleset=ruleset)
+    card_decks = {id(card): deck_key for deck_key, deck_info in game_state.deck_versions.items() for card in deck_info['cards']}
+    while True:
+        # Kept cards are shown again in the reveal, but they are not drawn again
+        kept_cards = {id(card) for card, _ in game_state.keep_cards}
+        chain_length = 0
+        for event in game_rules.run_reveal_phase(game_state):
+            if event['type'] == 'reveal':
+                for card in event['cards']:
+                    if id(card) not in kept_cards:
+                        stats.card_appearances[f"{card_decks[id(card)]}/{card['name']}"] += 1
+            elif event['type'] == 'card':
+                # Every card drawn after the reveal was drawn by a Black Swan effect
+                card = event['card']
+                stats.card_appearances[f"{card_decks[id(card)]}/{card['name']}"] += 1
+                chain_length += 1
+        if chain_length:
+            stats.black_swan_chains[chain_length] += 1
+
+        if game_state.end_game_flag:
+            break
+        if game_state.current_turn >= max_turns:
+            stats.unfinished_games += 1
+            break
+        game_state.advance_turn()
+    stats.games += 1
+    stats.game_lengths[game_state.current_turn] += 1
+
+# Deck manager and rules of a simulation worker process, created once per process
+_worker_deck_manager: Optional[DeckManager] = None
+_worker_game_rules: Optional[GameRules] = None
+
+def init_simulation_worker() -> None:
+    """
+    Loads the decks in a simulation worker process. Logging below errors is turned off: per-card log lines
+    would dominate the run time, and rule warnings repeat in every game.
+    """
+    global _worker_deck_manager, _worker_game_rules
+    logging.disable(logging.WARNING)
+    _worker_deck_manager = DeckManager()
+    _worker_game_rules = GameRules()
+
+def simulate_batch(deck_keys: List[str], ruleset: str, first_seed: int, game_count: int, max_turns: int) -> SimulationStats:
+    """
+    Plays the games with seeds first_seed to first_seed + game_count - 1 in a simulation worker process.
+    """
+    stats = SimulationStats()
+    for seed in range(first_seed, first_seed + game_count):
+        simulate_game(_worker_deck_manager, _worker_game_rules, deck_keys, ruleset, seed, max_turns, stats)
+    return stats
+
+def run_simulation(deck_keys: List[str], game_count: int, seed: int = 0, max_turns: int = 100,
+                   processes: Optional[int] = None, batch_size: int = 1000, ruleset: str = DEFAULT_RULESET) -> SimulationStats:
+    """
+    Plays game_count seeded games spread over a process pool and returns the aggregate stats.
+    Game i is played with seed `seed + i`, so a run is reproducible whatever the number of processes.
+    """
+    deck_manager = DeckManager()
+    missing_decks = [deck_key for deck_key in deck_keys if deck_key not in deck_manager.decks]
+    if missing_decks:
+        raise ValueError(f"Unknown deck(s): {', '.join(missing_decks)}")
+    get_ruleset(ruleset)  # Raises ValueError if the ruleset does not exist
+
+    stats = SimulationStats()
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_simulation_worker) as executor:
+        futures = [
+            executor.submit(simulate_batch, deck_keys, ruleset, seed + first_game, min(batch_size, game_count - first_game), max_turns)
+            for first_game in range(0, game_count, batch_size)
+        ]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate many games without Discord and report aggregate statistics.')
+    parser.add_argument('--decks', nargs='+', default=['event_deck', 'dragon_deck', 'sea_deck', 'end_deck'], help='Keys of the decks used in the games.')
+    parser.add_argument('--ruleset', default=DEFAULT_RULESET, help='Ruleset of the games (a file in rulesets/).')
+    parser.add_argument('--games', type=int, default=10000, help='Number of games to simulate.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first game; game i uses seed + i.')
+    parser.add_argument('--max-turns', type=int, default=100, help='Stop games that have not ended after this many turns.')
+    parser.add_argument('--processes', type=int, default=None, help='Number of simulation processes (default: one per CPU).')
+    parser.add_argument('--json', dest='json_path', help='Also write the stats to this JSON file.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    started = time.perf_counter()
+    stats = run_simulation(args.decks, args.games, args.seed, args.max_turns, args.processes, ruleset=args.ruleset)
+    elapsed = time.perf_counter() - started
+    print(stats.report())
+    print(f"Simulated {stats.games} games in {elapsed:.2f}s ({stats.games / elapsed:.0f} games/s).")
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump(stats.to_dict(), file, indent=4)
@@ -0,0 +1,14 @@
+# tests/conftest.py
+
+import os
+import sys
+import pytest
+
+# The bot's modules live in the repository root and read the decks relative to it
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+@pytest.fixture(autouse=True)
+def repository_root(monkeypatch):
+    """Runs every test from the repository root, where the decks are."""
+    monkeypatch.chdir(ROOT_DIRECTORY)
@@ -0,0 +1,29 @@
+# tests/test_card_images.py
+
+import os
+import asyncio
+from types import SimpleNamespace
+from deck_manager import DeckManager
+from deck_management_commands import DeckManagementCommands
+from fake_discord import FakeBot
+
+def test_images_of_running_games_are_kept_until_the_game_ends(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('Cards')
+    image_path = os.path.join('Cards', 'storm.png')
+    with open(image_path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+    bot = FakeBot(DeckManager(), str(tmp_path / 'schedules.json'))
+    cog = DeckManagementCommands(bot)
+    bot.deck_manager.create_deck('Storms', 'event_deck', [{'name': 'Winter Storms', 'image': image_path}])
+    # A running game holds the deck version it started with
+    bot.game_states[1] = SimpleNamespace(deck_versions={'storms': bot.deck_manager.decks['storms']})
+
+    success, _, removed_image = bot.deck_manager.remove_card_from_deck('storms', 'Winter Storms')
+    assert success and removed_image == image_path
+    asyncio.run(cog.delete_unused_images([removed_image]))
+    assert os.path.exists(image_path)
+
+    del bot.game_states[1]
+    asyncio.run(cog.delete_unused_images([removed_image]))
+    assert not os.path.exists(image_path)
@@ -0,0 +1,117 @@
+# tests/test_deck_archive.py
+
+import os
+import json
+import asyncio
+import hashlib
+import zipfile
+from types import SimpleNamespace
+import deck_archive
+from deck_manager import DeckManager
+from deck_management_commands import DeckManagementCommands, MAX_ARCHIVE_UPLOAD_BYTES
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+JPEG = b'\xff\xd8\xff\xe0' + b'\x01' * 64
+
+def write_file(path: str, data: bytes) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+    return path
+
+def write_archive(path: str, manifest, images=None) -> str:
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr(deck_archive.MANIFEST_NAME, json.dumps(manifest))
+        for name, data in (images or {}).items():
+            archive.writestr(name, data)
+    return path
+
+def test_export_and_import_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    deck_manager = DeckManager()
+    storm = write_file(os.path.join('uploads', 'storm.png'), PNG)
+    flood = write_file(os.path.join('uploads', 'flood.jpg'), JPEG)
+    deck_manager.create_deck('Seasons', 'event_deck', [
+        {'name': 'Winter Storms', 'image': storm},
+        {'name': 'Autumn Storms', 'image': storm},
+        {'name': 'Flood!', 'image': flood},
+    ])
+    success, message = deck_archive.export_deck(deck_manager, 'seasons', 'seasons.zip')
+    assert success, message
+    with zipfile.ZipFile('seasons.zip') as archive:
+        assert sorted(archive.namelist()) == ['images/flood.jpg', 'images/storm.png', 'manifest.json']  # Shared images stored once
+
+    success, message, errors = deck_archive.import_deck(deck_manager, 'seasons.zip', 'Seasons Copy')
+    assert success and not errors, message
+    cards = deck_manager.decks['seasons_copy']['cards']
+    assert [card['name'] for card in cards] == ['Winter Storms', 'Autumn Storms', 'Flood!']
+    # Images are stored in the Cards folder under their content hash
+    assert cards[0]['image'] == cards[1]['image'] == os.path.join('Cards', f"{hashlib.sha256(PNG).hexdigest()[:32]}_storm.png")
+    assert cards[2]['image'] == os.path.join('Cards', f"{hashlib.sha256(JPEG).hexdigest()[:32]}_flood.jpg")
+    with open(cards[0]['image'], 'rb') as file:
+        assert file.read() == PNG
+    assert deck_manager.decks['seasons_copy']['type'] == 'event_deck'
+
+def test_files_that_are_not_images_are_reported_per_card(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_archive('deck.zip', {
+        'format': 1, 'type': 'sea_deck', 'original_name': 'Sea',
+        'cards': [{'name': 'Ferry!', 'image': 'images/ferry.png'}, {'name': 'Plague!', 'image': 'images/plague.png'}]
+    }, {'images/ferry.png': PNG, 'images/plague.png': b'<script>not an image</script>'})
+    success, message, errors = deck_archive.import_deck(DeckManager(), 'deck.zip')
+    assert success, message
+    assert len(errors) == 1 and errors[0].startswith("'Plague!'") and "not a PNG, JPEG or GIF" in errors[0]
+    assert [name for name in os.listdir('Cards')] == [f"{hashlib.sha256(PNG).hexdigest()[:32]}_ferry.png"]
+
+def test_manifests_with_an_invalid_format_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for archive_format in ("2", None, 1.5, True):
+        write_archive('deck.zip', {'format': archive_format, 'type': 'sea_deck', 'original_name': 'Sea', 'cards': []})
+        success, message, _, _, _ = deck_archive.read_deck_archive('deck.zip')
+        assert not success and message == "The manifest has an invalid format version."
+    write_archive('deck.zip', {'format': 2, 'type': 'sea_deck', 'cards': []})
+    assert deck_archive.read_deck_archive('deck.zip')[1] == "The archive was created by a newer version of the bot."
+
+class FakeHttpSession:
+    """Serves a download of the given number of 1 MB chunks."""
+
+    def __init__(self, chunk_count: int):
+        self.chunk_count = chunk_count
+        self.downloads = 0
+
+    def get(self, url: str):
+        self.downloads += 1
+        session = self
+
+        class Response:
+            status = 200
+
+            class content:
+                @staticmethod
+                async def iter_chunked(size: int):
+                    for _ in range(session.chunk_count):
+                        yield b'\x00' * (1024 * 1024)
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc_info):
+                return False
+        return Response()
+
+def test_archive_uploads_are_capped_at_25_mb(tmp_path):
+    cog = DeckManagementCommands(SimpleNamespace())
+    target_path = str(tmp_path / 'deck.zip')
+    # Too large according to Discord: not downloaded at all
+    cog.http_session = FakeHttpSession(26)
+    attachment = SimpleNamespace(size=MAX_ARCHIVE_UPLOAD_BYTES + 1, url='https://cdn.example/deck.zip', filename='deck.zip')
+    assert asyncio.run(cog.download_attachment(attachment, target_path, MAX_ARCHIVE_UPLOAD_BYTES)) == "The file is larger than 25 MB."
+    assert cog.http_session.downloads == 0
+    # A download that grows past the cap is stopped while streaming
+    attachment.size = 1024
+    assert asyncio.run(cog.download_attachment(attachment, target_path, MAX_ARCHIVE_UPLOAD_BYTES)) == "The file is larger than 25 MB."
+    assert os.path.getsize(target_path) <= MAX_ARCHIVE_UPLOAD_BYTES
+    # Within the cap
+    cog.http_session = FakeHttpSession(25)
+    assert asyncio.run(cog.download_attachment(attachment, target_path, MAX_ARCHIVE_UPLOAD_BYTES)) is None
+    assert os.path.getsize(target_path) == MAX_ARCHIVE_UPLOAD_BYTES
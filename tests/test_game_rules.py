@@ -0,0 +1,36 @@
+# tests/test_game_rules.py
+
+import card_effects
+from deck_manager import DeckManager, make_deck_version
+from game_rules import GameRules
+from game_state import GameState
+
+def card(name: str):
+    return {'name': name, 'image': f"Cards/{name}.png"}
+
+def test_end_of_game_effects_resolve_before_black_swan(monkeypatch):
+    deck_versions = {
+        'events': make_deck_version('event_deck', 'Events', [card("Black Swan"), card("Deep Snow"), card("Flood!")]),
+        'end': make_deck_version('end_deck', 'End', [card("The End is Nigh!"), card("Time's up!")]),
+    }
+    game_state = GameState(1, list(deck_versions), DeckManager(), seed=7, deck_versions=deck_versions)
+    # The tags were resolved by card ID when the deck versions were created; clearing the lookup by name now changes nothing
+    monkeypatch.setattr(card_effects, 'CARD_TAGS', {})
+
+    black_swan, end_is_nigh, times_up = deck_versions['events']['cards'][0], *deck_versions['end']['cards']
+    drawn_cards = [(black_swan, 'events'), (end_is_nigh, 'end'), (times_up, 'end')]  # Black Swan drawn first
+    game_state.draw_piles['events'].remove(black_swan)
+    game_state.draw_piles['end'].clear()
+    game_state.current_turn_drawn_cards.extend(drawn_cards)
+
+    events = GameRules().resolve_drawn_cards(game_state, drawn_cards, black_swan_triggered=False)
+
+    assert [event['type'] for event in events] == ['reveal', 'message', 'message', 'message', 'card']
+    assert events[1]['content'].startswith("**The End is Nigh!")
+    assert events[2]['content'] == "**The game will end after this turn.**"
+    assert events[3]['content'].startswith("**Black Swan** effect triggered!")
+    assert events[4]['card']['name'] in ("Deep Snow", "Flood!")
+    assert game_state.end_game_flag and game_state.keep_current_turn_cards
+    # 'The End is Nigh!' was active when Black Swan resolved, so Black Swan stays in play
+    assert (black_swan, 'events') in game_state.current_turn_drawn_cards
+    assert not game_state.discard_piles['events']
@@ -0,0 +1,57 @@
+# tests/test_logging_config.py
+
+import logging
+import logging.handlers
+import logging_config
+from logging_config import ModuleLevelFilter, SamplingFilter, configure_logging, parse_level
+
+def make_record(level: int = logging.INFO, name: str = 'root', module: str = 'game_state', sample: str = None) -> logging.LogRecord:
+    record = logging.LogRecord(name, level, f"{module}.py", 1, "Drew %s", ('a card',), None)
+    record.module = module
+    if sample:
+        record.sample = sample
+    return record
+
+def test_sampling_keeps_one_in_every_rate_per_card_lines():
+    sampling = SamplingFilter({'per_card': 3})
+    kept = [record for record in (make_record(sample='per_card') for _ in range(7)) if sampling.filter(record)]
+    assert len(kept) == 2
+    assert kept[0].getMessage() == "Drew a card (2 similar line(s) not logged)"
+
+def test_sampling_keeps_every_line_without_a_rate():
+    sampling = SamplingFilter({'per_card': 3})
+    assert all(sampling.filter(make_record()) for _ in range(5))
+    assert all(SamplingFilter({}).filter(make_record(sample='per_card')) for _ in range(5))
+
+def test_the_most_specific_module_level_wins():
+    levels = ModuleLevelFilter({'discord': logging.WARNING, 'discord.gateway': logging.DEBUG, 'game_state': logging.ERROR}, logging.INFO)
+    assert levels.filter(make_record(logging.DEBUG, 'discord.gateway.shard', 'gateway'))
+    assert not levels.filter(make_record(logging.INFO, 'discord.http', 'http'))
+    assert levels.filter(make_record(logging.WARNING, 'discord.http', 'http'))
+    # The module a line was logged from applies before the logger name
+    assert not levels.filter(make_record(logging.WARNING, 'root', 'game_state'))
+    assert levels.filter(make_record(logging.INFO, 'root', 'turn_manager'))
+    assert not levels.filter(make_record(logging.DEBUG, 'root', 'turn_manager'))
+
+def test_invalid_levels_fall_back_to_info(tmp_path, monkeypatch):
+    assert parse_level('warning', 'LOG_LEVEL', []) == logging.WARNING
+    assert parse_level('15', 'LOG_LEVEL', []) == 15
+    warnings = []
+    assert parse_level('verbose', 'LOG_LEVEL', warnings) == logging.INFO and len(warnings) == 1
+
+    monkeypatch.setenv('LOG_LEVEL', 'verbose')
+    monkeypatch.setenv('LOG_MODULE_LEVELS', 'discord=loud')
+    monkeypatch.setenv('LOG_SAMPLING', 'per_card=often')
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    try:
+        configure_logging(str(tmp_path / 'bot.log'))
+        assert root.level == logging.INFO
+    finally:
+        logging_config.stop_logging()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+    logged = (tmp_path / 'bot.log').read_text()
+    assert "Invalid log level 'verbose' for LOG_LEVEL" in logged
+    assert "Invalid log level 'loud' for module 'discord'" in logged
+    assert "Invalid sampling rate 'often'" in logged
@@ -0,0 +1,91 @@
+# tests/test_pile.py
+
+import random
+import pytest
+from deck_manager import DeckManager, make_deck_version
+from game_state import GameState
+from pile import Pile, card_index
+
+def make_cards(count: int):
+    return tuple({'name': f"Card {number}", 'image': f"Cards/card_{number}.png"} for number in range(count))
+
+def names(pile: Pile):
+    """Card names from the bottom to the top of a pile."""
+    return [card['name'] for card in pile]
+
+def test_draw_and_peek_take_from_the_top():
+    cards = make_cards(3)
+    pile = Pile.full(cards)
+    assert pile.peek() is cards[2]
+    assert pile.draw() is cards[2]
+    assert pile.draw() is cards[1]
+    assert len(pile) == 1 and pile
+    pile.draw()
+    assert pile.peek() is None and not pile
+    with pytest.raises(IndexError):
+        pile.draw()
+
+def test_put_top_and_put_bottom():
+    cards = make_cards(3)
+    pile = Pile(cards, [1])
+    pile.put_top(cards[2])
+    pile.put_bottom(cards[0])
+    assert names(pile) == ["Card 0", "Card 1", "Card 2"]
+    assert pile.peek() is cards[2]
+
+def test_move_top_to_bottom_rotates_the_top_card_to_the_bottom():
+    cards = make_cards(4)
+    pile = Pile.full(cards)
+    pile.move_top_to_bottom()
+    assert names(pile) == ["Card 3", "Card 0", "Card 1", "Card 2"]
+    assert pile.peek() is cards[2]
+
+def test_find_and_remove():
+    cards = make_cards(4)
+    pile = Pile.full(cards)
+    found = pile.find(lambda card: card['name'].endswith(('1', '3')))
+    assert found is cards[1]  # The first match from the bottom
+    pile.remove(found)
+    assert names(pile) == ["Card 0", "Card 2", "Card 3"]
+    assert pile.find(lambda card: card['name'] == "Card 9") is None
+    with pytest.raises(ValueError):
+        pile.remove(cards[1])
+
+def test_take_all_puts_the_other_pile_on_top():
+    cards = make_cards(4)
+    draw_pile = Pile(cards, [0, 1])
+    discard_pile = Pile(cards, [2, 3], draw_pile.index)
+    draw_pile.take_all(discard_pile)
+    assert names(draw_pile) == ["Card 0", "Card 1", "Card 2", "Card 3"]
+    assert not discard_pile
+
+def test_saved_piles_round_trip():
+    cards = make_cards(6)
+    pile = Pile.full(cards)
+    pile.shuffle(random.Random(1))
+    pile.draw()
+    pile.move_top_to_bottom()
+    restored = Pile.from_data(cards, pile.to_data(), card_index(cards))
+    assert restored.to_data() == pile.to_data()
+    assert list(restored) == list(pile)
+    assert Pile.from_data(cards, []).to_data() == []
+    with pytest.raises(ValueError):
+        Pile.from_data(cards, [0, 6])
+
+def test_equal_cards_fall_back_to_lookup_by_content():
+    cards = make_cards(3)
+    pile = Pile(cards, [0])
+    copy = dict(cards[2])  # E.g. a card sent back by a worker process
+    assert pile.card_id(copy) == 2
+    pile.put_top(copy)
+    assert pile.peek() is cards[2]
+    with pytest.raises(ValueError, match="not part of this deck"):
+        pile.card_id({'name': "Card 9", 'image': "Cards/card_9.png"})
+
+def test_games_share_the_card_index_of_their_deck_version():
+    deck_versions = {'events': make_deck_version('event_deck', 'Events', make_cards(5))}
+    games = [GameState(channel_id, ['events'], DeckManager(), seed=channel_id, deck_versions=deck_versions) for channel_id in (1, 2)]
+    index = deck_versions['events']['card_index']
+    assert index == card_index(deck_versions['events']['cards'])
+    for game_state in games:
+        assert game_state.draw_piles['events'].index is index and game_state.discard_piles['events'].index is index
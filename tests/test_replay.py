@@ -0,0 +1,64 @@
+# tests/test_replay.py
+
+import json
+from card_effects import DRAGON
+from deck_manager import DeckManager
+from game_rules import GameRules
+from game_state import GameState
+from game_persistence import restore_game_state, serialize_game_state
+from replay import replay_game
+
+DECK_KEYS = ['event_deck', 'dragon_deck', 'sea_deck', 'end_deck']
+CHANNEL_ID = 1000000000000000000
+
+def play_turns(game_state: GameState, turns: int) -> None:
+    """
+    Plays turns like the players would: each turn peeks at every deck, moves the top sea and event cards
+    to the bottom and replaces the top dragon card that is not a dragon. Peeking at an empty deck reshuffles it.
+    """
+    game_rules = GameRules()
+    for _ in range(turns):
+        if game_state.end_game_flag:
+            return
+        game_state.advance_turn()
+        game_rules.run_reveal_phase(game_state)
+        for deck_key in ('sea_deck', 'event_deck', 'dragon_deck'):
+            peeked = game_state.peek_top_card(deck_key)
+            if peeked is None:
+                continue
+            card, _, tags = peeked
+            if deck_key == 'dragon_deck':
+                if DRAGON not in tags:
+                    game_state.replace_top_card_with_dragon(deck_key, card)
+            else:
+                game_state.move_top_card_to_bottom(deck_key, card)
+
+def start_game(deck_manager: DeckManager) -> GameState:
+    game_state = GameState(CHANNEL_ID, DECK_KEYS, deck_manager, seed=20240601)
+    GameRules().run_reveal_phase(game_state)
+    return game_state
+
+def saved(game_state: GameState):
+    """The game as it is read back from a saved file."""
+    return json.loads(json.dumps(serialize_game_state(game_state)))
+
+def test_replaying_the_action_log_reproduces_the_saved_game():
+    deck_manager = DeckManager()
+    game_state = start_game(deck_manager)
+    play_turns(game_state, 12)
+    state_data = saved(game_state)
+    # Every kind of action that changes the piles was played
+    assert {action for action, *_ in state_data['action_log']} == {
+        'reveal', 'advance_turn', 'peek', 'move_top_card_to_bottom', 'replace_top_card_with_dragon'
+    }
+    assert saved(replay_game(CHANNEL_ID, state_data, deck_manager)) == state_data
+
+def test_a_restored_game_continues_like_the_original():
+    deck_manager = DeckManager()
+    original = start_game(deck_manager)
+    play_turns(original, 6)
+    restored = restore_game_state(CHANNEL_ID, saved(original), deck_manager)
+    play_turns(original, 6)
+    play_turns(restored, 6)
+    assert saved(restored) == saved(original)
+    assert saved(replay_game(CHANNEL_ID, saved(restored), deck_manager)) == saved(original)
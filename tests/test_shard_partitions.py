@@ -0,0 +1,62 @@
+# tests/test_shard_partitions.py
+
+import os
+from deck_manager import DeckManager
+from game_state import GameState
+from game_persistence import (
+    ShardedGameStates, get_shard_file, load_game_states_file, prepare_shard_partitions,
+    read_game_states_file, save_game_states_file, shard_id_for_guild
+)
+
+DECK_KEYS = ['event_deck', 'dragon_deck', 'sea_deck', 'end_deck']
+# Guild IDs spread over the shards by their timestamp bits, plus a game saved before games had a guild
+GUILD_IDS = [guild_index << 22 for guild_index in range(1, 9)] + [None]
+
+def save_unsharded_games(legacy_file: str):
+    """Saves a game per guild like the unsharded bot does. Returns the channel IDs by guild ID."""
+    deck_manager = DeckManager()
+    channel_guilds = {1000000000000000000 + index: guild_id for index, guild_id in enumerate(GUILD_IDS)}
+    save_game_states_file(legacy_file, {
+        channel_id: GameState(channel_id, DECK_KEYS, deck_manager, guild_id=guild_id) for channel_id, guild_id in channel_guilds.items()
+    })
+    return channel_guilds
+
+def saved_shards(directory: str, shard_count: int):
+    """Returns the shard of every saved channel."""
+    return {int(channel_id): shard_id for shard_id in range(shard_count)
+            for channel_id in read_game_states_file(get_shard_file(directory, shard_id))}
+
+def test_unsharded_games_are_repartitioned_by_guild(tmp_path):
+    directory = str(tmp_path / 'game_states')
+    channel_guilds = save_unsharded_games(str(tmp_path / 'game_states.json'))
+    prepare_shard_partitions(directory, 3, str(tmp_path / 'game_states.json'))
+    assert saved_shards(directory, 3) == {channel_id: shard_id_for_guild(guild_id, 3) for channel_id, guild_id in channel_guilds.items()}
+
+def test_shard_count_change_repartitions_every_game(tmp_path):
+    directory = str(tmp_path / 'game_states')
+    channel_guilds = save_unsharded_games(str(tmp_path / 'game_states.json'))
+    prepare_shard_partitions(directory, 4, str(tmp_path / 'game_states.json'))
+    prepare_shard_partitions(directory, 3, str(tmp_path / 'game_states.json'))
+    assert not os.path.exists(get_shard_file(directory, 3))
+    assert saved_shards(directory, 3) == {channel_id: shard_id_for_guild(guild_id, 3) for channel_id, guild_id in channel_guilds.items()}
+    prepare_shard_partitions(directory, 5, str(tmp_path / 'game_states.json'))
+    assert saved_shards(directory, 5) == {channel_id: shard_id_for_guild(guild_id, 5) for channel_id, guild_id in channel_guilds.items()}
+
+def test_games_without_a_guild_move_to_their_guilds_shard(tmp_path):
+    directory = str(tmp_path / 'game_states')
+    channel_guilds = save_unsharded_games(str(tmp_path / 'game_states.json'))
+    prepare_shard_partitions(directory, 3, str(tmp_path / 'game_states.json'))
+    game_states = ShardedGameStates(3)
+    for shard_id in range(3):
+        game_states.update(load_game_states_file(get_shard_file(directory, shard_id), DeckManager()))
+    channel_id = next(channel_id for channel_id, guild_id in channel_guilds.items() if guild_id is None)
+    guild_id = next(guild_id for guild_id in GUILD_IDS if guild_id and shard_id_for_guild(guild_id, 3) == 2)
+    assert game_states.channel_shards[channel_id] == 0
+
+    # Not moved into a shard that has not been loaded, where it would never be saved
+    assert game_states.assign_guilds({channel_id: guild_id}, {0, 1}) == set()
+    assert game_states.assign_guilds({channel_id: guild_id}, {0, 1, 2}) == {0, 2}
+    assert game_states.channel_shards[channel_id] == 2
+    assert game_states[channel_id].guild_id == guild_id
+    # Games that know their guild are left alone
+    assert game_states.assign_guilds({channel_id: guild_id}, {0, 1, 2}) == set()
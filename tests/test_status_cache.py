@@ -0,0 +1,57 @@
+# tests/test_status_cache.py
+
+import asyncio
+from deck_manager import DeckManager
+from fake_discord import FakeBot, FakeChannel, FakeGuild, FakeInteraction, FakeMember, FakeTransport
+from game_commands import GameCommands, render_status
+from game_rules import GameRules
+from game_state import GameState
+
+DECK_KEYS = ['event_deck', 'dragon_deck', 'sea_deck', 'end_deck']
+
+def test_every_change_of_the_game_refreshes_the_cached_status(tmp_path):
+    async def run():
+        transport = FakeTransport()
+        bot = FakeBot(DeckManager(), str(tmp_path / 'schedules.json'))
+        cog = GameCommands(bot)
+        bot.add_cog(cog)
+        channel = FakeChannel(transport, FakeGuild("Guild", []), "game")
+        admin = FakeMember(transport, "Admin", administrator=True)
+        game_state = GameState(channel.id, DECK_KEYS, bot.deck_manager, seed=3)
+        GameRules().run_reveal_phase(game_state)
+        bot.game_states[channel.id] = game_state
+
+        async def status() -> str:
+            interaction = FakeInteraction(transport, admin, channel)
+            await bot.invoke('GameCommands', 'status', interaction)
+            return interaction.response.message.content
+
+        def empty_event_draw_pile():
+            # Set up a reshuffle by the next peek; changes the piles without going through the game's actions
+            discard_pile = game_state.discard_piles['event_deck']
+            while game_state.draw_piles['event_deck']:
+                discard_pile.put_top(game_state.draw_piles['event_deck'].draw())
+
+        def peek_top_card(deck_key: str):
+            return game_state.peek_top_card(deck_key)[0]
+
+        mutations = [
+            ('move to bottom', lambda: game_state.move_top_card_to_bottom('event_deck', peek_top_card('event_deck')), False),
+            ('dragon replace', lambda: game_state.replace_top_card_with_dragon('dragon_deck', peek_top_card('dragon_deck')), False),
+            ('keep cards', lambda: game_state.set_keep_current_turn_cards(True), False),
+            ('end game flag', lambda: game_state.set_end_game_flag(True), True),
+            ('autoturn deadline', lambda: bot.turn_scheduler.schedule(channel.id, 3600, save=False), True),
+            ('peek reshuffle', lambda: peek_top_card('event_deck'), True),
+        ]
+        for name, mutate, visible in mutations:
+            if name == 'peek reshuffle':
+                empty_event_draw_pile()
+            before = await status()
+            cached_key = cog.status_messages[game_state][0]
+            assert await status() == before  # Served from the cache
+            mutate()
+            after = await status()
+            assert cog.status_messages[game_state][0] != cached_key, f"{name} did not invalidate the cached status"
+            assert after == render_status(game_state.get_status(), bot.turn_scheduler.get_deadline(channel.id)), name
+            assert (after != before) == visible, name
+    asyncio.run(run())
@@ -0,0 +1,47 @@
+# tests/test_turn_schedule.py
+
+import pytest
+import turn_schedule
+from turn_schedule import TurnSchedule, get_ruleset
+
+DECK_TYPES = {
+    'event_deck': 'event_deck', 'sea_deck': 'sea_deck', 'dragon_deck': 'dragon_deck',
+    'end_deck': 'end_deck', 'event_deck_test': 'event_deck', 'my_deck': 'custom'
+}
+
+def baseline_active_decks(turn: int):
+    """The active decks as they were hard-coded before rulesets."""
+    active_types = []
+    if turn >= 1:
+        active_types.extend(['event_deck', 'dragon_deck'])
+    if turn >= 5:
+        active_types.append('sea_deck')
+    if turn >= 10:
+        active_types.append('end_deck')
+    return tuple(deck_key for deck_key in DECK_TYPES if DECK_TYPES[deck_key] in active_types)
+
+def test_the_standard_ruleset_reproduces_the_baseline_activation_turns():
+    deck_activation = get_ruleset('standard')['deck_activation']
+    assert deck_activation == {'event_deck': 1, 'dragon_deck': 1, 'sea_deck': 5, 'end_deck': 10}
+    schedule = TurnSchedule(deck_activation, list(DECK_TYPES), DECK_TYPES)
+    for turn in range(1, 40):
+        assert schedule.active_decks(turn) == baseline_active_decks(turn), f"turn {turn}"
+
+@pytest.mark.parametrize('content', [
+    '{"deck_activation": ',  # Not JSON
+    '["event_deck"]',
+    '{"name": "No activation turns"}',
+    '{"deck_activation": ["event_deck"]}',
+    '{"deck_activation": {"event_deck": 0}}',
+    '{"deck_activation": {"event_deck": "1"}}',
+])
+def test_invalid_rulesets_raise_value_error(tmp_path, monkeypatch, content):
+    monkeypatch.setattr(turn_schedule, 'RULESETS_DIRECTORY', str(tmp_path))
+    (tmp_path / 'broken.json').write_text(content)
+    with pytest.raises(ValueError, match="Ruleset 'broken'"):
+        get_ruleset('broken')
+
+def test_missing_rulesets_raise_value_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(turn_schedule, 'RULESETS_DIRECTORY', str(tmp_path))
+    with pytest.raises(ValueError, match="Ruleset 'missing' could not be loaded"):
+        get_ruleset('missing')
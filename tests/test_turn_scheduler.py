@@ -0,0 +1,76 @@
+# tests/test_turn_scheduler.py
+
+import json
+import time
+import asyncio
+from deck_manager import DeckManager
+from fake_discord import FakeBot
+from turn_manager import TurnManager
+from turn_scheduler import TurnScheduler
+
+def recording_scheduler(schedules_file: str):
+    """A scheduler that records the channels whose turn it advanced, in order."""
+    fired = []
+    async def fire(channel_id: int) -> None:
+        fired.append(channel_id)
+    return TurnScheduler(fire, schedules_file), fired
+
+def test_turns_fire_in_deadline_order(tmp_path):
+    async def run():
+        scheduler, fired = recording_scheduler(str(tmp_path / 'schedules.json'))
+        scheduler.start()
+        for channel_id, interval in ((1, 0.3), (2, 0.1), (3, 0.2)):
+            scheduler.schedule(channel_id, interval)
+        await asyncio.sleep(0.35)
+        await scheduler.stop()
+        return fired
+    fired = asyncio.run(run())
+    assert list(dict.fromkeys(fired)) == [2, 3, 1]  # Order of the first turn of each channel
+
+def test_cancelled_and_postponed_entries_are_skipped(tmp_path):
+    async def run():
+        scheduler, fired = recording_scheduler(str(tmp_path / 'schedules.json'))
+        scheduler.start()
+        scheduler.schedule(1, 0.1)
+        scheduler.schedule(2, 0.2)
+        assert scheduler.cancel(1) and not scheduler.cancel(1)
+        assert len(scheduler.heap) == 2  # The entry of the cancelled channel is left in the heap
+        await asyncio.sleep(0.1)
+        scheduler.postpone(2)  # Now due 0.2s from here instead of 0.1s
+        await asyncio.sleep(0.15)
+        fired_before = list(fired)
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return fired_before, fired
+    fired_before, fired = asyncio.run(run())
+    assert fired_before == []
+    assert fired == [2]
+
+def test_overdue_turns_fire_once_after_a_restart(tmp_path):
+    schedules_file = tmp_path / 'turn_schedules.json'
+    # Saved an hour ago with a one minute interval: 60 turns were missed while the bot was offline
+    schedules_file.write_text(json.dumps({'1': {'deadline': time.time() - 3600, 'interval': 60}}))
+    async def run():
+        scheduler, fired = recording_scheduler(str(schedules_file))
+        assert scheduler.get_deadline(1) < time.time()
+        scheduler.start()
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return scheduler, fired
+    scheduler, fired = asyncio.run(run())
+    assert fired == [1]
+    assert scheduler.get_deadline(1) > time.time() + 50
+    saved = json.loads(schedules_file.read_text())
+    assert saved['1']['deadline'] == scheduler.get_deadline(1) and saved['1']['interval'] == 60
+
+def test_schedules_of_unavailable_channels_are_cancelled(tmp_path):
+    async def run():
+        bot = FakeBot(DeckManager(), str(tmp_path / 'schedules.json'))
+        bot.add_cog(TurnManager(bot))
+        bot.game_states[1] = object()  # A game in a channel that was deleted since
+        bot.turn_scheduler.schedule(1, 60)
+        await bot.fire_automatic_turn(1)
+        return bot
+    bot = asyncio.run(run())
+    assert bot.turn_scheduler.get_deadline(1) is None
+    assert json.loads((tmp_path / 'schedules.json').read_text()) == {}
@@ -0,0 +1,43 @@
+# tests/test_worker_failures.py
+
+import os
+import signal
+import asyncio
+import pytest
+import worker_pool
+from worker_pool import WorkerError, WorkerPool
+
+async def started_pool(directory: str) -> WorkerPool:
+    pool = WorkerPool(1, game_states_directory=directory)
+    await pool.start()
+    return pool
+
+def test_a_killed_worker_fails_its_requests(tmp_path):
+    async def run():
+        pool = await started_pool(str(tmp_path))
+        pool.processes[0].kill()
+        pool.processes[0].join()
+        # Fails whether the reader noticed the dead worker before or after the request was sent
+        with pytest.raises(WorkerError):
+            await asyncio.wait_for(pool.call_worker(0, 'list_games'), 10)
+        await asyncio.sleep(0.1)
+        assert pool.dead_workers == {0} and not pool.pending
+        with pytest.raises(WorkerError, match="not running"):
+            await pool.call_worker(0, 'list_games')
+        await pool.stop()
+    asyncio.run(run())
+
+def test_an_unresponsive_worker_times_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(worker_pool, 'WORKER_CALL_TIMEOUT', 0.5)
+    async def run():
+        pool = await started_pool(str(tmp_path))
+        os.kill(pool.processes[0].pid, signal.SIGSTOP)
+        try:
+            with pytest.raises(WorkerError, match="did not answer"):
+                await pool.call_worker(0, 'list_games')
+            assert not pool.pending
+        finally:
+            os.kill(pool.processes[0].pid, signal.SIGCONT)
+        assert await pool.call_worker(0, 'list_games') == []
+        await pool.stop()
+    asyncio.run(run())
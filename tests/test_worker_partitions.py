@@ -0,0 +1,62 @@
+# tests/test_worker_partitions.py
+
+import os
+import asyncio
+from deck_manager import DeckManager
+from game_state import GameState
+from game_persistence import read_game_states_file, save_game_states_file
+from worker_pool import GameWorker, WorkerPool, get_worker_file, prepare_worker_partitions, worker_for_channel
+
+DECK_KEYS = ['event_deck', 'dragon_deck', 'sea_deck', 'end_deck']
+CHANNEL_IDS = [1000000000000000000 + channel_index for channel_index in range(12)]
+
+def start_games(directory: str) -> None:
+    """Starts a game in every channel with a single worker, which saves them to worker_0.json."""
+    worker = GameWorker(0, 1, directory)
+    for channel_id in CHANNEL_IDS:
+        worker.handle('start_game', channel_id, {'deck_keys': DECK_KEYS})
+
+def saved_channels(directory: str, worker_count: int):
+    """Returns the channels saved in each worker file."""
+    return [sorted(int(channel_id) for channel_id in read_game_states_file(get_worker_file(directory, worker_id)))
+            for worker_id in range(worker_count)]
+
+def test_growing_the_worker_count_keeps_every_game(tmp_path):
+    directory = str(tmp_path)
+    start_games(directory)
+    prepare_worker_partitions(directory, 2)
+    workers = [GameWorker(worker_id, 2, directory) for worker_id in range(2)]
+    assert sorted(channel_id for worker in workers for channel_id in worker.game_states) == CHANNEL_IDS
+    for worker in workers:
+        assert all(worker_for_channel(channel_id, 2) == worker.worker_id for channel_id in worker.game_states)
+    assert sum(map(len, saved_channels(directory, 2))) == len(CHANNEL_IDS)
+
+def test_shrinking_the_worker_count_keeps_every_game(tmp_path):
+    directory = str(tmp_path)
+    start_games(directory)
+    prepare_worker_partitions(directory, 3)
+    prepare_worker_partitions(directory, 2)
+    assert not os.path.exists(get_worker_file(directory, 2))
+    assert sorted(sum(saved_channels(directory, 2), [])) == CHANNEL_IDS
+
+def test_unchanged_worker_count_leaves_the_files_alone(tmp_path):
+    directory = str(tmp_path)
+    start_games(directory)
+    prepare_worker_partitions(directory, 2)
+    modified = [os.path.getmtime(get_worker_file(directory, worker_id)) for worker_id in range(2)]
+    prepare_worker_partitions(directory, 2)
+    assert [os.path.getmtime(get_worker_file(directory, worker_id)) for worker_id in range(2)] == modified
+
+def test_pool_takes_over_the_games_of_the_bot_without_workers(tmp_path):
+    legacy_file = str(tmp_path / 'game_states.json')
+    deck_manager = DeckManager()
+    save_game_states_file(legacy_file, {channel_id: GameState(channel_id, DECK_KEYS, deck_manager) for channel_id in CHANNEL_IDS})
+
+    async def list_games():
+        worker_pool = WorkerPool(3, in_process=True, game_states_directory=str(tmp_path / 'workers'), legacy_file=legacy_file)
+        await worker_pool.start()
+        channel_ids = await worker_pool.list_games()
+        await worker_pool.stop()
+        return channel_ids
+
+    assert sorted(asyncio.run(list_games())) == CHANNEL_IDS
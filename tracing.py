@@ -0,0 +1,210 @@
+# tracing.py
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+TRACE_FORMATS = ('jsonl', 'otlp')
+
+class Span:
+    """
+    A timed step of a trace, e.g. the reveal phase of a turn.
+    """
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes')
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: Optional[str], attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    def end(self) -> None:
+        """
+        Ends the span and adds it to the finished spans of its trace.
+        """
+        self.end_ns = time.time_ns()
+        self.trace.spans.append(self)
+
+class Trace:
+    """
+    The spans of one traced command. The trace ID is the interaction ID, so a slow turn can be matched with its command.
+    """
+    __slots__ = ('trace_id', 'root', 'spans')
+
+    def __init__(self, interaction_id: int, name: str, attributes: Dict):
+        self.trace_id = f"{interaction_id:032x}"
+        self.spans: List[Span] = []  # Finished spans, without the root
+        self.root = Span(self, name, None, attributes)
+
+# Span the code is currently running in, per asyncio task
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('current_span', default=None)
+
+class Tracer:
+    """
+    Records the spans of traced commands and exports the traces to a file, either as JSON lines (one span per line)
+    or as OTLP JSON (one ExportTraceServiceRequest per line, as written by the OpenTelemetry file exporter).
+    Only traces that took at least min_duration_ms are exported. The file is written by a background thread.
+    Until configure is called tracing is off, and a span only looks up a context variable.
+    """
+
+    def __init__(self):
+        self.trace_file: Optional[str] = None
+        self.trace_format = 'jsonl'
+        self.min_duration_ns = 0
+        self.traces: Dict[int, Trace] = {}  # Interaction ID to the traces that have been started but not ended
+        self.export_queue: 'queue.SimpleQueue[Optional[Trace]]' = queue.SimpleQueue()
+        self.writer: Optional[threading.Thread] = None
+
+    def configure(self, trace_file: str, trace_format: str = 'jsonl', min_duration_ms: float = 0) -> None:
+        """
+        Turns tracing on, writing the traces to trace_file.
+        """
+        self.trace_file = trace_file
+        self.trace_format = trace_format
+        self.min_duration_ns = int(min_duration_ms * 1_000_000)
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_traces, name='trace-writer', daemon=True)
+            self.writer.start()
+        logging.info(f"Tracing commands to '{trace_file}' ({trace_format}).")
+
+    def start_trace(self, interaction_id: int, name: str, **attributes) -> None:
+        """
+        Starts the trace of a command. Spans opened afterwards in the same task become its children.
+        """
+        if self.trace_file is None:
+            return
+        trace = Trace(interaction_id, name, attributes)
+        self.traces[interaction_id] = trace
+        current_span.set(trace.root)
+
+    def end_trace(self, interaction_id: int) -> None:
+        """
+        Ends the trace of a command and queues it for export. Does nothing if the command was not traced.
+        """
+        trace = self.traces.pop(interaction_id, None)
+        if trace is None:
+            return
+        trace.root.end_ns = time.time_ns()
+        if current_span.get() is trace.root:
+            current_span.set(None)
+        if trace.root.end_ns - trace.root.start_ns >= self.min_duration_ns:
+            self.export_queue.put(trace)
+
+    @contextmanager
+    def trace(self, interaction_id: int, name: str, **attributes):
+        """
+        Traces the code in the with block as one command.
+        """
+        self.start_trace(interaction_id, name, **attributes)
+        try:
+            yield
+        finally:
+            self.end_trace(interaction_id)
+
+    @contextmanager
+    def span(self, name: str, interaction_id: Optional[int] = None, **attributes):
+        """
+        Records the code in the with block as a span of the current trace, or of the trace of the given interaction
+        (for work done in another task, like the save after a command). Does nothing if there is no such trace.
+        """
+        if interaction_id is not None:
+            trace = self.traces.get(interaction_id)
+            parent = trace.root if trace else None
+        else:
+            parent = current_span.get()
+        if parent is None:
+            yield
+            return
+        span = Span(parent.trace, name, parent.span_id, attributes)
+        token = current_span.set(span)
+        try:
+            yield
+        finally:
+            current_span.reset(token)
+            span.end()
+
+    def write_traces(self) -> None:
+        """
+        Appends the queued traces to the trace file. Runs on the writer thread.
+        """
+        while True:
+            trace = self.export_queue.get()
+            if trace is None:
+                break
+            try:
+                with open(self.trace_file, 'a') as file:
+                    if self.trace_format == 'otlp':
+                        file.write(json.dumps(otlp_request(trace)) + '\n')
+                    else:
+                        for span in [trace.root, *trace.spans]:
+                            file.write(json.dumps(span_record(span)) + '\n')
+            except (IOError, TypeError, ValueError) as e:
+                logging.error(f"Failed to export trace {trace.trace_id}: {e}")
+
+    def stop(self) -> None:
+        """
+        Writes the queued traces and stops the writer thread.
+        """
+        if self.writer is not None:
+            self.export_queue.put(None)
+            self.writer.join()
+            self.writer = None
+
+def span_record(span: Span) -> Dict:
+    """
+    Returns a span as a JSON line record.
+    """
+    return {
+        'trace_id': span.trace.trace_id,
+        'span_id': span.span_id,
+        'parent_id': span.parent_id,
+        'name': span.name,
+        'start_ns': span.start_ns,
+        'duration_ms': round((span.end_ns - span.start_ns) / 1_000_000, 3),
+        'attributes': span.attributes
+    }
+
+def otlp_value(value) -> Dict:
+    """
+    Returns an attribute value in the OTLP JSON encoding.
+    """
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def otlp_request(trace: Trace) -> Dict:
+    """
+    Returns a trace as an OTLP JSON ExportTraceServiceRequest.
+    """
+    spans = []
+    for span in [trace.root, *trace.spans]:
+        spans.append({
+            'traceId': trace.trace_id,
+            'spanId': span.span_id,
+            'parentSpanId': span.parent_id or '',
+            'name': span.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': [{'key': key, 'value': otlp_value(value)} for key, value in span.attributes.items()]
+        })
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'potr-bot'}}]},
+        'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': spans}]
+    }]}
+
+# Shared tracer of the bot
+tracer = Tracer()
@@ -3,10 +3,29 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+import asyncio
 import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
 from game_state import GameState
 from card_mechanics import CardMechanics
+from worker_pool import RemoteGameState
 from utils import admin_or_gamemaster_only, SHOW_PHASE_MESSAGES
+from card_images import card_images
+from metrics import TURN_SEND_CALLS
+from tracing import tracer
+
+# Number of games advanced at the same time by /nextturnall
+MAX_PARALLEL_TURNS = 8
+
+def channel_sender(channel: discord.abc.Messageable):
+    """
+    Returns a send function for a channel that accepts the keyword arguments of `interaction.followup.send`.
+    Used for turns that are not the reply to an interaction in that channel.
+    """
+    async def send(ephemeral: bool = False, **kwargs):
+        await channel.send(**kwargs)
+    return send
 
 class TurnManager(commands.Cog):
     """
@@ -16,11 +35,14 @@ class TurnManager(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.card_mechanics = CardMechanics(bot)
+        self.channel_locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)  # Serializes the turns of each channel
         
     @app_commands.command(name='nextturn', description='Advance the game to the next turn and execute phases.')
     @admin_or_gamemaster_only
     async def next_turn(self, interaction: discord.Interaction):
         """Advances the game to the next turn."""
+        # Ended after the save, see MyBot.on_app_command_completion
+        tracer.start_trace(interaction.id, 'nextturn', channel_id=interaction.channel_id)
         game_state = self.bot.game_states.get(interaction.channel_id)
         if not game_state:
             await interaction.response.send_message("No game is currently running in this channel.", ephemeral=False)
@@ -30,50 +52,204 @@ class TurnManager(commands.Cog):
         await interaction.response.defer(ephemeral=False)
 
         try:
-            # Check if the game should end before processing the turn
-            if game_state.end_game_flag:
-                # Inform the user that the game has ended
-                del self.bot.game_states[interaction.channel_id]
-                await interaction.followup.send("**Game Over!** The game has ended.", ephemeral=False)
-                logging.info(f"Game ended in channel {interaction.channel_id} after 'Time's Up!' was drawn.")
-                return  # Do not process any further turns
-
-            # Handle active views before advancing the turn
-            active_views = game_state.active_views[:]
-            for view in active_views:
-                await view.on_turn_end()
-            game_state.active_views.clear()
+            await self.advance_game(interaction.channel_id, interaction.followup.send)
+        except Exception as e:
+            logging.error(f"An unexpected error occurred during next_turn: {e}", exc_info=True)
+            await interaction.followup.send("An error occurred while processing the next turn.", ephemeral=True)
+
+    async def advance_game(self, channel_id: int, send) -> bool:
+        """
+        Advances the game of a channel to the next turn and sends the revealed cards, or ends the game
+        if 'Time's Up!' was drawn. Used by /nextturn, /nextturnall and automatic turns.
+        `send` is a coroutine function accepting the keyword arguments of `interaction.followup.send`.
+        Turns of the same channel never run at the same time. Returns whether the game continues.
+        """
+        send_calls = 0
+
+        async def counted_send(**kwargs):
+            nonlocal send_calls
+            send_calls += 1
+            await send(**kwargs)
 
-            # Advance to the next turn before processing
+        lock = self.channel_locks[channel_id]
+        with tracer.span('wait_for_channel_lock'):
+            await lock.acquire()
+        try:
+            game_state = self.bot.game_states.get(channel_id)
+            if game_state is None:
+                return False  # Ended while waiting for the lock
+            return await self.advance_game_state(channel_id, counted_send, game_state)
+        finally:
+            lock.release()
+            TURN_SEND_CALLS.observe(send_calls)
+
+    async def advance_game_state(self, channel_id: int, send, game_state) -> bool:
+        """Advances a game, see advance_game. The channel lock must be held."""
+        if isinstance(game_state, RemoteGameState):
+            # The game is owned by a worker process
+            return await self.next_remote_turn(channel_id, send, game_state)
+
+        # Check if the game should end before processing the turn
+        if game_state.end_game_flag:
+            # Inform the user that the game has ended
+            self.end_game(channel_id)
+            await send(content="**Game Over!** The game has ended.", ephemeral=False)
+            logging.info(f"Game ended in channel {channel_id} after 'Time's Up!' was drawn.")
+            return False  # Do not process any further turns
+
+        # Handle active views before advancing the turn
+        with tracer.span('end_active_views', views=len(game_state.active_views)):
+            await self.end_active_views(game_state)
+
+        # Advance to the next turn before processing
+        with tracer.span('advance_turn'):
             game_state.advance_turn()
+        self.bot.turn_scheduler.postpone(channel_id)
 
-            # Process the turn
-            await self.process_turn(interaction, game_state)
+        # Process the turn
+        await self.play_turn(channel_id, send, game_state)
 
-            # Do not end the game here; allow the game to continue even if end_game_flag was set during processing
+        # Do not end the game here; allow the game to continue even if end_game_flag was set during processing
+        return True
 
-        except Exception as e:
-            logging.error(f"An unexpected error occurred during next_turn: {e}", exc_info=True)
-            await interaction.followup.send("An error occurred while processing the next turn.", ephemeral=True)
+    def end_game(self, channel_id: int):
+        """Removes the game of a channel, its automatic turns and its open views. Returns the removed game state."""
+        game_state = self.bot.game_states.pop(channel_id, None)
+        self.bot.turn_scheduler.cancel(channel_id)
+        self.channel_locks.pop(channel_id, None)
+        if game_state is not None:
+            # Unanswered peeks would otherwise keep the ended game alive
+            for view in game_state.active_views[:]:
+                view.stop()
+            game_state.active_views.clear()
+        return game_state
 
+    async def end_active_views(self, game_state: GameState):
+        """Notifies the active views of a game that the turn has ended."""
+        active_views = game_state.active_views[:]
+        for view in active_views:
+            await view.on_turn_end()
+        game_state.active_views.clear()
+
+    async def next_remote_turn(self, channel_id: int, send, game_state: RemoteGameState) -> bool:
+        """Advances a game that is owned by a worker process and sends the revealed cards."""
+        # The views live in this process, so handle them before the worker advances the turn
+        with tracer.span('end_active_views', views=len(game_state.active_views)):
+            await self.end_active_views(game_state)
+        with tracer.span('worker_next_turn'):
+            result = await game_state.call('next_turn')
+        if result['ended']:
+            # Inform the user that the game has ended
+            self.end_game(channel_id)
+            await send(content="**Game Over!** The game has ended.", ephemeral=False)
+            logging.info(f"Game ended in channel {channel_id} after 'Time's Up!' was drawn.")
+            return False
+        self.bot.turn_scheduler.postpone(channel_id)
+        await self.card_mechanics.send_events(send, result['events'])
+        card_images.prefetch_next_cards(game_state)
+        return True
+
+    async def fire_automatic_turn(self, channel_id: int):
+        """Advances the turn of a channel whose turn deadline has passed, the same way /nextturn does."""
+        if channel_id not in self.bot.game_states:
+            if self.bot.is_ready():
+                # The game has ended, stop its automatic turns
+                self.bot.turn_scheduler.cancel(channel_id)
+            return
+        try:
+            channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+            send = channel_sender(channel)
+            await send(content="**Turn deadline reached.** Advancing to the next turn.")
+        except (discord.NotFound, discord.Forbidden) as e:
+            # The channel was deleted or the bot lost access to it, retrying every interval would never succeed
+            logging.warning(f"Stopped the automatic turns of channel {channel_id}, the channel is not available: {e}")
+            self.bot.turn_scheduler.cancel(channel_id)
+            return
+        guild = getattr(channel, 'guild', None)
+        await self.advance_game(channel_id, send)
+        await self.bot.save_game_states(guild.id if guild else None)
+
+    @app_commands.command(name='nextturnall', description='Advance all games of this server, or of a category, to the next turn.')
+    @admin_or_gamemaster_only
+    @app_commands.describe(category='Only advance the games in the channels of this category')
+    async def next_turn_all(self, interaction: discord.Interaction, category: Optional[discord.CategoryChannel] = None):
+        """Advances every selected game at once and replies with one summary."""
+        if interaction.guild is None:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+        channels = []
+        for channel_id in list(self.bot.game_states):
+            channel = interaction.guild.get_channel(channel_id)
+            if channel is None or (category is not None and channel.category_id != category.id):
+                continue
+            channels.append(channel)
+        if not channels:
+            await interaction.response.send_message("No games are running in the selected channels.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_TURNS)
+
+        async def advance(channel) -> str:
+            async with semaphore:
+                try:
+                    if await self.advance_game(channel.id, channel_sender(channel)):
+                        return f"✅ {channel.mention}: advanced"
+                    return f"🏁 {channel.mention}: game over"
+                except Exception as e:
+                    logging.error(f"Failed to advance the game in channel {channel.id}: {e}", exc_info=True)
+                    return f"❌ {channel.mention}: failed ({type(e).__name__})"
+
+        results: List[str] = await asyncio.gather(*(advance(channel) for channel in channels))
+        failed = sum(result.startswith("❌") for result in results)
+        summary = f"**Advanced {len(channels) - failed} of {len(channels)} game(s).**\n" + "\n".join(results)
+        if len(summary) > 2000:
+            summary = summary[:1990].rsplit("\n", 1)[0] + "\n…"
+        await interaction.followup.send(summary, ephemeral=True)
+        logging.info(f"{interaction.user} advanced {len(channels)} game(s) in guild {interaction.guild.id}, {failed} failed.")
+
+    @app_commands.command(name='autoturn', description='Advance the turns of this game automatically at a fixed interval.')
+    @admin_or_gamemaster_only
+    @app_commands.describe(minutes='Minutes between turns (0 turns automatic turns off)')
+    async def auto_turn(self, interaction: discord.Interaction, minutes: app_commands.Range[int, 0, 60 * 24 * 30]):
+        """Sets or removes the turn deadline of the game in this channel."""
+        if interaction.channel_id not in self.bot.game_states:
+            await interaction.response.send_message("No game is currently running in this channel.", ephemeral=True)
+            return
+        if minutes == 0:
+            if self.bot.turn_scheduler.cancel(interaction.channel_id):
+                await interaction.response.send_message("Automatic turns turned off.", ephemeral=False)
+            else:
+                await interaction.response.send_message("Automatic turns are not on in this channel.", ephemeral=True)
+            return
+        deadline = self.bot.turn_scheduler.schedule(interaction.channel_id, minutes * 60)
+        await interaction.response.send_message(
+            f"Turns will advance automatically every {minutes} minute(s). Next turn <t:{int(deadline)}:R>.",
+            ephemeral=False
+        )
+        logging.info(f"{interaction.user} set automatic turns every {minutes} minute(s) in channel {interaction.channel_id}.")
 
     async def process_turn(self, interaction: discord.Interaction, game_state: GameState):
         """Processes the current turn."""
+        with tracer.trace(interaction.id, 'first_turn', channel_id=interaction.channel_id):
+            await self.play_turn(interaction.channel_id, interaction.followup.send, game_state)
+
+    async def play_turn(self, channel_id: int, send, game_state: GameState):
+        """Plays the phases of the current turn and sends them with `send` (see advance_game)."""
         # Phase 1: Protector Ranking (Placeholder)
         if SHOW_PHASE_MESSAGES:
-            await interaction.followup.send(
-                f"**Turn {game_state.current_turn} - Phase 1: Protector Ranking**\n*(Not implemented yet)*",
+            await send(
+                content=f"**Turn {game_state.current_turn} - Phase 1: Protector Ranking**\n*(Not implemented yet)*",
                 ephemeral=False
             )
-        logging.info(f"Executed Phase 1 for Turn {game_state.current_turn} in channel {interaction.channel_id}.")
+        logging.info(f"Executed Phase 1 for Turn {game_state.current_turn} in channel {channel_id}.")
 
         # Phase 2: Reveal Cards
-        drawn_cards, black_swan_drawn = game_state.draw_cards_for_reveal_phase()
-        if drawn_cards:
-            await self.card_mechanics.handle_drawn_cards(interaction, game_state, drawn_cards, black_swan_drawn)
-        else:
-            await interaction.followup.send("No cards were drawn. All active decks are exhausted.", ephemeral=False)
-            logging.info(f"No cards drawn for Phase 2 in Turn {game_state.current_turn} in channel {interaction.channel_id}.")
+        with tracer.span('reveal_phase', turn=game_state.current_turn):
+            events = self.card_mechanics.run_reveal_phase(game_state)
+        await self.card_mechanics.send_events(send, events)
+        # Load the images of the next turn's cards while the players play this turn
+        card_images.prefetch_next_cards(game_state)
 
         # Future Phases: Placeholders
         if SHOW_PHASE_MESSAGES:
@@ -84,8 +260,8 @@ class TurnManager(commands.Cog):
                 "Phase 6: Consolidation *(Not implemented yet)*"
             ]
             for phase in phases:
-                await interaction.followup.send(phase, ephemeral=False)
-                logging.info(f"Executed {phase} for Turn {game_state.current_turn} in channel {interaction.channel_id}.")
+                await send(content=phase, ephemeral=False)
+                logging.info(f"Executed {phase} for Turn {game_state.current_turn} in channel {channel_id}.")
         else:
-            logging.info(f"Skipped phase messages for Turn {game_state.current_turn} in channel {interaction.channel_id}.")
+            logging.info(f"Skipped phase messages for Turn {game_state.current_turn} in channel {channel_id}.")
 
@@ -0,0 +1,74 @@
+# turn_schedule.py
+
+import os
+import json
+import logging
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+# Folder that stores the rulesets, one JSON file per ruleset
+RULESETS_DIRECTORY = 'rulesets'
+DEFAULT_RULESET = 'standard'
+
+# Ruleset file path to (modification time, ruleset), so game starts do not parse the file every time
+_ruleset_cache: Dict[str, Tuple[float, Dict]] = {}
+
+def list_rulesets() -> List[str]:
+    """
+    Returns the keys of the available rulesets.
+    """
+    if not os.path.isdir(RULESETS_DIRECTORY):
+        return []
+    return sorted(filename[:-5] for filename in os.listdir(RULESETS_DIRECTORY) if filename.endswith('.json'))
+
+def get_ruleset(ruleset_key: str) -> Dict:
+    """
+    Returns a ruleset. Each ruleset declares the turn from which each deck type is active in 'deck_activation'.
+    Raises ValueError if the ruleset does not exist or is invalid.
+    """
+    path = os.path.join(RULESETS_DIRECTORY, f"{ruleset_key}.json")
+    try:
+        modified = os.path.getmtime(path)
+        cached = _ruleset_cache.get(path)
+        if cached and cached[0] == modified:
+            return cached[1]
+        with open(path, 'r') as file:
+            ruleset = json.load(file)
+    except (json.JSONDecodeError, IOError) as e:
+        raise ValueError(f"Ruleset '{ruleset_key}' could not be loaded: {e}") from None
+    deck_activation = ruleset.get('deck_activation') if isinstance(ruleset, dict) else None
+    if not isinstance(deck_activation, dict) or not all(isinstance(turn, int) and turn >= 1 for turn in deck_activation.values()):
+        raise ValueError(f"Ruleset '{ruleset_key}' must map each deck type to the turn it becomes active (1 or later).")
+    _ruleset_cache[path] = (modified, ruleset)
+    logging.info(f"Loaded ruleset '{ruleset_key}'.")
+    return ruleset
+
+def cached_rulesets() -> Dict[str, Dict]:
+    """
+    Returns the rulesets that are currently cached, by file path (used by the memory report).
+    """
+    return {path: ruleset for path, (_, ruleset) in _ruleset_cache.items()}
+
+class TurnSchedule:
+    """
+    The active decks of every turn, compiled once per game from the deck activation turns of a ruleset.
+    After the last activation turn the active decks no longer change, so the table stops there.
+    """
+
+    __slots__ = ('active_decks_by_turn',)
+
+    def __init__(self, deck_activation: Mapping[str, int], deck_keys: Sequence[str], deck_types: Mapping[str, str]):
+        # Decks of a type without an activation turn are never active
+        last_turn = max(deck_activation.values(), default=1)
+        self.active_decks_by_turn: List[Tuple[str, ...]] = [
+            tuple(
+                deck_key for deck_key in deck_keys
+                if deck_types[deck_key] in deck_activation and deck_activation[deck_types[deck_key]] <= turn
+            )
+            for turn in range(last_turn + 1)
+        ]
+
+    def active_decks(self, turn: int) -> Tuple[str, ...]:
+        """
+        Returns the keys of the decks active in a turn, in the order the game lists its decks.
+        """
+        return self.active_decks_by_turn[min(max(turn, 0), len(self.active_decks_by_turn) - 1)]
@@ -0,0 +1,174 @@
+# turn_scheduler.py
+
+import os
+import json
+import time
+import heapq
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from game_persistence import write_json_atomic
+
+# Schedules changed by due turns are saved at most this often (seconds), the file holds every scheduled channel
+SAVE_DELAY = 1.0
+
+class TurnScheduler:
+    """
+    Advances the turns of channels automatically at a fixed interval.
+    All deadlines are kept in one heap served by a single timer task, so scheduling many channels costs
+    one heap entry each instead of one sleeping task each. Changing or cancelling a schedule leaves the old
+    heap entry behind; it is skipped when it comes up because its deadline no longer matches the schedule.
+    Schedules are saved in turn_schedules.json with wall-clock deadlines, so they survive restarts.
+    Turns that fell due while the bot was offline are played once when it is back.
+    Rescheduling after due turns is saved at most every SAVE_DELAY seconds.
+    """
+
+    def __init__(self, fire: Callable[[int], Awaitable[None]], schedules_file: str = 'turn_schedules.json'):
+        self.fire = fire  # Coroutine function advancing the turn of a channel
+        self.schedules_file = schedules_file
+        self.schedules: Dict[int, Tuple[float, float]] = {}  # Channel ID to (deadline, interval in seconds)
+        self.heap: List[Tuple[float, int]] = []  # (deadline, channel ID), may contain outdated entries
+        self.wakeup = asyncio.Event()  # Set when an earlier deadline was scheduled
+        self.timer_task: Optional[asyncio.Task] = None
+        self.fire_tasks = set()  # Turn advancements in progress
+        self.unsaved = False  # Whether due turns rescheduled channels since the last save
+        self.last_save = 0.0
+        self.load_schedules()
+
+    def load_schedules(self) -> None:
+        """
+        Loads the saved schedules.
+        """
+        if not os.path.exists(self.schedules_file):
+            return
+        try:
+            with open(self.schedules_file, 'r') as file:
+                data = json.load(file)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"Failed to load turn schedules: {e}")
+            return
+        for channel_id, schedule in data.items():
+            self.schedules[int(channel_id)] = (schedule['deadline'], schedule['interval'])
+        self.heap = [(deadline, channel_id) for channel_id, (deadline, _) in self.schedules.items()]
+        heapq.heapify(self.heap)
+        logging.info(f"Loaded {len(self.schedules)} turn schedule(s).")
+
+    def save_schedules(self) -> None:
+        """
+        Saves the schedules atomically.
+        """
+        self.unsaved = False
+        self.last_save = time.monotonic()
+        try:
+            write_json_atomic(self.schedules_file, {
+                str(channel_id): {'deadline': deadline, 'interval': interval}
+                for channel_id, (deadline, interval) in self.schedules.items()
+            })
+        except IOError as e:
+            logging.error(f"Failed to save turn schedules: {e}")
+
+    def start(self) -> None:
+        """
+        Starts the timer task.
+        """
+        if self.timer_task is None:
+            self.timer_task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        Stops the timer task and saves the schedules.
+        """
+        if self.timer_task:
+            self.timer_task.cancel()
+            try:
+                await self.timer_task
+            except asyncio.CancelledError:
+                pass
+            self.timer_task = None
+        self.save_schedules()
+
+    def schedule(self, channel_id: int, interval: float, save: bool = True) -> float:
+        """
+        Advances the turn of a channel every interval seconds, starting one interval from now.
+        Returns the deadline of the next turn.
+        """
+        deadline = time.time() + interval
+        self.schedules[channel_id] = (deadline, interval)
+        heapq.heappush(self.heap, (deadline, channel_id))
+        if self.heap[0] == (deadline, channel_id):
+            self.wakeup.set()
+        if save:
+            self.save_schedules()
+        return deadline
+
+    def cancel(self, channel_id: int, save: bool = True) -> bool:
+        """
+        Stops advancing the turns of a channel automatically. Returns whether the channel was scheduled.
+        """
+        if self.schedules.pop(channel_id, None) is None:
+            return False
+        if save:
+            self.save_schedules()
+        return True
+
+    def postpone(self, channel_id: int) -> None:
+        """
+        Restarts the interval of a scheduled channel, after its turn was advanced by hand.
+        """
+        if channel_id in self.schedules:
+            # Also called for every automatic turn, so leave the save to the timer task
+            self.schedule(channel_id, self.schedules[channel_id][1], save=False)
+            self.unsaved = True
+            self.wakeup.set()
+
+    def get_deadline(self, channel_id: int) -> Optional[float]:
+        """
+        Returns the deadline of the next automatic turn of a channel, or None if it is not scheduled.
+        """
+        schedule = self.schedules.get(channel_id)
+        return schedule[0] if schedule else None
+
+    async def run(self) -> None:
+        """
+        Waits for the earliest deadline, advances the turns that are due and schedules their next turn.
+        """
+        while True:
+            self.wakeup.clear()
+            now = time.time()
+            due = False
+            while self.heap and self.heap[0][0] <= now:
+                deadline, channel_id = heapq.heappop(self.heap)
+                schedule = self.schedules.get(channel_id)
+                if schedule is None or schedule[0] != deadline:
+                    continue  # Cancelled or rescheduled since
+                due = True
+                self.schedule(channel_id, schedule[1], save=False)
+                task = asyncio.get_running_loop().create_task(self.fire_turn(channel_id))
+                self.fire_tasks.add(task)
+                task.add_done_callback(self.fire_tasks.discard)
+            if due:
+                self.unsaved = True
+                self.wakeup.clear()  # The schedules above are later than now, nothing to wake up for
+            save_in = None
+            if self.unsaved:
+                save_in = self.last_save + SAVE_DELAY - time.monotonic()
+                if save_in <= 0:
+                    self.save_schedules()
+                    save_in = None
+
+            timeout = self.heap[0][0] - time.time() if self.heap else None
+            if save_in is not None:
+                timeout = save_in if timeout is None else min(timeout, save_in)
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def fire_turn(self, channel_id: int) -> None:
+        """
+        Advances the turn of a channel, logging instead of raising errors so the timer keeps running.
+        """
+        try:
+            await self.fire(channel_id)
+        except Exception as e:
+            logging.error(f"Automatic turn failed in channel {channel_id}: {e}", exc_info=True)
@@ -2,14 +2,40 @@
 
 import re
 import os
+import sys
+import json
+import logging
 import discord
 from discord import app_commands
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Dict
+from card_images import card_images
+
+# Gateway profiles: 'default' caches members and messages, 'low_memory' trims intents and caches for large guilds
+GATEWAY_PROFILES = ['default', 'low_memory']
+
+def build_intents(profile: str = 'default') -> discord.Intents:
+    """
+    Builds the gateway intents for a profile.
+    The low memory profile also drops the members intent (no command needs the member list).
+    Message content is not needed: card images are uploaded as slash command attachments.
+    """
+    intents = discord.Intents.default()
+    intents.members = profile != 'low_memory'  # Enable access to guild members
+    return intents
+
+def build_client_options(profile: str = 'default') -> Dict:
+    """
+    Builds the client options (intents and caches) for a gateway profile.
+    """
+    options = {'intents': build_intents(profile)}
+    if profile == 'low_memory':
+        options['chunk_guilds_at_startup'] = False  # Do not request the member list of every guild
+        options['member_cache_flags'] = discord.MemberCacheFlags.none()  # Do not cache members
+        options['max_messages'] = None  # Disable the message cache
+    return options
 
 # Define intents
-intents = discord.Intents.default()
-intents.message_content = True  # Enable access to message content
-intents.members = True  # Enable access to guild members
+intents = build_intents()
 
 # Configuration flag to control phase message outputs
 SHOW_PHASE_MESSAGES = False  # Set to True to enable phase messages
@@ -29,38 +55,152 @@ def is_admin_check(interaction: discord.Interaction) -> bool:
 # Register the admin_only decorator
 admin_only = app_commands.check(is_admin_check)
 
+# Default name of the role that grants game master permissions
+DEFAULT_GAMEMASTER_ROLE_NAME = "Game Master"
+
+class GameMasterRoleCache:
+    """
+    Caches the ID of the game master role per guild, so permission checks do not have to scan all guild roles.
+    The role name can be configured per guild and is persisted in a JSON file.
+    Cached entries are invalidated by the bot on role create, update and delete events.
+    """
+
+    def __init__(self, settings_file: str = 'guild_settings.json'):
+        self.settings_file = settings_file
+        self.role_names: Dict[int, str] = {}  # Guild ID to configured role name
+        self.role_ids: Dict[int, Optional[int]] = {}  # Guild ID to cached role ID (None if the role does not exist)
+        self.load_settings()
+
+    def load_settings(self) -> None:
+        """
+        Loads the configured role names from the settings file.
+        """
+        if not os.path.exists(self.settings_file):
+            return
+        try:
+            with open(self.settings_file, 'r') as file:
+                settings = json.load(file)
+            for guild_id, guild_settings in settings.items():
+                role_name = guild_settings.get('gamemaster_role')
+                if role_name:
+                    self.role_names[int(guild_id)] = role_name
+            logging.info(f"Loaded game master role settings for {len(self.role_names)} guild(s).")
+        except (json.JSONDecodeError, IOError, ValueError) as e:
+            logging.error(f"Failed to load guild settings: {e}")
+
+    def save_settings(self) -> None:
+        """
+        Saves the configured role names to the settings file atomically.
+        """
+        settings = {str(guild_id): {'gamemaster_role': role_name} for guild_id, role_name in self.role_names.items()}
+        temp_file = self.settings_file + ".tmp"
+        try:
+            with open(temp_file, 'w') as file:
+                json.dump(settings, file, indent=4)
+            os.replace(temp_file, self.settings_file)
+        except IOError as e:
+            logging.error(f"Failed to save guild settings: {e}")
+
+    def get_role_name(self, guild_id: int) -> str:
+        """
+        Returns the name of the game master role for a guild.
+        """
+        return self.role_names.get(guild_id, DEFAULT_GAMEMASTER_ROLE_NAME)
+
+    def set_role_name(self, guild_id: int, role_name: str) -> None:
+        """
+        Sets the name of the game master role for a guild and drops its cached role ID.
+        """
+        if role_name == DEFAULT_GAMEMASTER_ROLE_NAME:
+            self.role_names.pop(guild_id, None)
+        else:
+            self.role_names[guild_id] = role_name
+        self.invalidate(guild_id)
+        self.save_settings()
+        logging.info(f"Game master role for guild {guild_id} set to '{role_name}'.")
+
+    def get_role_id(self, guild: discord.Guild) -> Optional[int]:
+        """
+        Returns the ID of the game master role in the guild, resolving it by name on a cache miss.
+        """
+        if guild.id in self.role_ids:
+            return self.role_ids[guild.id]
+        role = discord.utils.get(guild.roles, name=self.get_role_name(guild.id))
+        role_id = role.id if role else None
+        self.role_ids[guild.id] = role_id
+        return role_id
+
+    def invalidate(self, guild_id: int) -> None:
+        """
+        Drops the cached role ID of a guild. It is resolved again on the next check.
+        """
+        self.role_ids.pop(guild_id, None)
+
+# Shared cache used by the permission checks
+gamemaster_roles = GameMasterRoleCache()
+
 def admin_or_gamemaster_check(interaction: discord.Interaction) -> bool:
     """
-    Checks if the user is an administrator or has the 'Game Master' role.
+    Checks if the user is an administrator or has the game master role of the guild.
     """
     # Check if user is an administrator
     if interaction.user.guild_permissions.administrator:
         return True
-    # Check if user has 'Game Master' role
-    gamemaster_role_name = "Game Master"
     guild = interaction.guild
     if guild is None:
         return False
-    # Get the 'Game Master' role
-    gamemaster_role = discord.utils.get(guild.roles, name=gamemaster_role_name)
-    if gamemaster_role is None:
+    # Get the cached ID of the game master role
+    gamemaster_role_id = gamemaster_roles.get_role_id(guild)
+    if gamemaster_role_id is None:
         # If the role does not exist, only admins can proceed
         return False
-    # Check if the user has the 'Game Master' role
-    if gamemaster_role in interaction.user.roles:
-        return True
-    return False
+    # Check if the user has the game master role (lookup by ID, no scan over the user's roles)
+    return interaction.user.get_role(gamemaster_role_id) is not None
 
 # Register the admin_or_gamemaster_only decorator
 admin_or_gamemaster_only = app_commands.check(admin_or_gamemaster_check)
 
+def get_resident_memory_mb() -> Optional[float]:
+    """
+    Returns the resident memory of the bot process in MB, or None if it cannot be determined on this platform.
+    """
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm', 'r') as file:
+                resident_pages = int(file.read().split()[1])
+            return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize / (1024 * 1024)
+            return None
+        # Other platforms: fall back to the peak resident memory (reported in bytes on macOS)
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+    except (OSError, ValueError, ImportError, AttributeError):
+        return None
+
 def create_embed(title: str, card: dict) -> Tuple[discord.Embed, Optional[discord.File]]:
     """
     Creates an embed for the card and attaches the image if available.
     """
-    if os.path.exists(card['image']):
+    file = card_images.file(card['image'], 'card.png')
+    if file:
         embed = discord.Embed(title=title)
-        file = discord.File(card['image'], filename='card.png')
         embed.set_image(url='attachment://card.png')
         return embed, file
     else:
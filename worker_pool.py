@@ -0,0 +1,490 @@
+# worker_pool.py
+
+import os
+import sys
+import json
+import time
+import zlib
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+import multiprocessing.connection
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from game_state import GameState
+from deck_manager import DeckManager
+from game_rules import GameRules
+from turn_schedule import DEFAULT_RULESET
+from game_persistence import read_game_states_file, restore_game_state, save_game_states_file, write_json_atomic
+
+# Seconds the front process waits for a worker to answer before failing the command
+WORKER_CALL_TIMEOUT = 30.0
+
+def worker_for_channel(channel_id: int, worker_count: int) -> int:
+    """
+    Returns the worker that owns the games of a channel.
+    The channel ID is hashed so consecutive snowflakes spread evenly over the workers.
+    """
+    return zlib.crc32(channel_id.to_bytes(8, 'little')) % worker_count
+
+def get_worker_file(game_states_directory: str, worker_id: int) -> str:
+    """
+    Returns the path of the file that stores the game states of a worker.
+    """
+    return os.path.join(game_states_directory, f"worker_{worker_id}.json")
+
+def prepare_worker_partitions(game_states_directory: str, worker_count: int, legacy_file: Optional[str] = None) -> None:
+    """
+    Makes sure the worker files on disk match the worker count. Runs in the front process before any worker starts.
+    If the files were saved with a different worker count, or some are missing, the games of all worker files are
+    repartitioned once. If there are no worker files yet, the games saved by the bot without workers (legacy_file) are taken over.
+    """
+    os.makedirs(game_states_directory, exist_ok=True)
+    saved_files = {}  # Worker ID to worker file
+    for filename in os.listdir(game_states_directory):
+        worker_id = filename[len('worker_'):-len('.json')]
+        if filename.startswith('worker_') and filename.endswith('.json') and worker_id.isdigit():
+            saved_files[int(worker_id)] = os.path.join(game_states_directory, filename)
+
+    if saved_files:
+        source_files = list(saved_files.values())
+    elif legacy_file and os.path.exists(legacy_file):
+        source_files = [legacy_file]
+    else:
+        source_files = []
+    partitions = {worker_id: {} for worker_id in range(worker_count)}
+    saved_worker_counts = set()
+    for source_file in source_files:
+        try:
+            with open(source_file, 'r') as file:
+                data = json.load(file)
+        except (json.JSONDecodeError, IOError) as e:
+            # Rewriting the files now would lose the games of this one, leave them as they are
+            logging.error(f"Failed to read game states from '{source_file}' for repartitioning, keeping the worker files: {e}")
+            return
+        saved_worker_counts.add(data.get('worker_count') if source_file != legacy_file else None)
+        # Worker files wrap the game states together with the worker metadata
+        for channel_id, state_data in (data['game_states'] if 'game_states' in data else data).items():
+            partitions[worker_for_channel(int(channel_id), worker_count)][channel_id] = state_data
+    if saved_worker_counts <= {worker_count} and set(saved_files) == set(range(worker_count)):
+        return  # Already partitioned for this worker count
+
+    # Write the new partitions before removing the files of workers that no longer exist
+    for worker_id, game_states_data in partitions.items():
+        write_json_atomic(get_worker_file(game_states_directory, worker_id),
+                          {'worker_id': worker_id, 'worker_count': worker_count, 'game_states': game_states_data})
+    for worker_id, saved_file in saved_files.items():
+        if worker_id >= worker_count:
+            os.remove(saved_file)
+    if source_files:
+        previous = f"{len(saved_files)} worker file(s)" if saved_files else f"'{legacy_file}'"
+        logging.info(f"Repartitioned {sum(len(games) for games in partitions.values())} saved game(s) from {previous} to {worker_count} worker(s).")
+
+class GameWorker:
+    """
+    Owns the games of one partition of the channels and runs their game logic.
+    Every channel is always routed to the same worker, so a worker never shares games with another one.
+    Each worker persists its own games in game_states/worker_<id>.json.
+    """
+
+    # Operations that change a game and are followed by a save of the worker's partition
+    MUTATING_OPERATIONS = {
+        'start_game', 'next_turn', 'end_game', 'peek_top_card',
+        'move_top_card_to_bottom', 'replace_top_card_with_dragon'
+    }
+
+    def __init__(self, worker_id: int, worker_count: int, game_states_directory: str = 'game_states'):
+        self.worker_id = worker_id
+        self.worker_count = worker_count
+        self.game_states_directory = game_states_directory
+        self.deck_manager = DeckManager()
+        self.game_rules = GameRules()
+        self.game_states: Dict[int, GameState] = {}  # Channel ID to GameState mapping, for owned channels only
+        os.makedirs(self.game_states_directory, exist_ok=True)
+        self.load_game_states()
+
+    def get_worker_file(self, worker_id: int) -> str:
+        """
+        Returns the path of the file that stores the game states of a worker.
+        """
+        return get_worker_file(self.game_states_directory, worker_id)
+
+    def load_game_states(self) -> None:
+        """
+        Loads the games owned by this worker from its own file.
+        The files are repartitioned by the front process before any worker starts, see prepare_worker_partitions.
+        """
+        own_file = self.get_worker_file(self.worker_id)
+        try:
+            for channel_id, state_data in read_game_states_file(own_file).items():
+                game_state = restore_game_state(int(channel_id), state_data, self.deck_manager)
+                if game_state:
+                    self.game_states[int(channel_id)] = game_state
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"Worker {self.worker_id}: failed to load game states: {e}")
+        logging.info(f"Worker {self.worker_id}: loaded {len(self.game_states)} game(s).")
+
+    def save_game_states(self) -> None:
+        """
+        Saves the games owned by this worker atomically.
+        """
+        try:
+            save_game_states_file(
+                self.get_worker_file(self.worker_id),
+                self.game_states,
+                {'worker_id': self.worker_id, 'worker_count': self.worker_count}
+            )
+        except IOError as e:
+            logging.error(f"Worker {self.worker_id}: failed to save game states: {e}")
+
+    def handle(self, operation: str, channel_id: Optional[int], kwargs: Dict[str, Any]) -> Any:
+        """
+        Runs an operation on the game of a channel and returns its (picklable) result.
+        """
+        if channel_id is not None and worker_for_channel(channel_id, self.worker_count) != self.worker_id:
+            raise ValueError(f"Channel {channel_id} is not owned by worker {self.worker_id}.")
+        result = getattr(self, f"op_{operation}")(channel_id, **kwargs)
+        if operation in self.MUTATING_OPERATIONS:
+            self.save_game_states()
+        return result
+
+    def op_list_games(self, channel_id: None) -> List[int]:
+        """Returns the channels with a running game."""
+        return list(self.game_states)
+
+    def op_start_game(self, channel_id: int, deck_keys: List[str], guild_id: Optional[int] = None, ruleset: str = DEFAULT_RULESET) -> List[Dict]:
+        """Starts a game and plays the reveal phase of turn 1. Returns the events to send."""
+        # Decks are edited by the front process, so pick up the latest version before starting
+        self.deck_manager.decks = self.deck_manager.load_all_deck_keys()
+        game_state = GameState(channel_id=channel_id, deck_keys=deck_keys, deck_manager=self.deck_manager, guild_id=guild_id, ruleset=ruleset)
+        self.game_states[channel_id] = game_state
+        return self.game_rules.run_reveal_phase(game_state)
+
+    def op_next_turn(self, channel_id: int) -> Dict:
+        """Ends the game if 'Time's Up!' was drawn, otherwise advances the turn and plays its reveal phase."""
+        game_state = self.game_states[channel_id]
+        if game_state.end_game_flag:
+            del self.game_states[channel_id]
+            return {'ended': True, 'events': []}
+        game_state.advance_turn()
+        return {'ended': False, 'events': self.game_rules.run_reveal_phase(game_state)}
+
+    def op_end_game(self, channel_id: int) -> bool:
+        """Ends the game of a channel. Returns whether a game was running."""
+        return self.game_states.pop(channel_id, None) is not None
+
+    def op_status(self, channel_id: int) -> Dict:
+        """Returns the status summary of a game."""
+        return self.game_states[channel_id].get_status()
+
+    def op_upcoming_card_images(self, channel_id: int) -> List[str]:
+        """Returns the images of the cards the next turn will draw, to prefetch them."""
+        return self.game_states[channel_id].upcoming_card_images()
+
+    def op_peek_top_card(self, channel_id: int, deck_key: str):
+        """Returns the top card of a deck (reshuffling if needed), with its deck and effect tags."""
+        return self.game_states[channel_id].peek_top_card(deck_key)
+
+    def op_move_top_card_to_bottom(self, channel_id: int, deck_key: str, card: Dict[str, str]) -> bool:
+        """Moves the peeked top card to the bottom of the draw pile."""
+        return self.game_states[channel_id].move_top_card_to_bottom(deck_key, card)
+
+    def op_replace_top_card_with_dragon(self, channel_id: int, deck_key: str, card: Dict[str, str]) -> bool:
+        """Replaces the peeked top card with 'There be Dragons!'."""
+        return self.game_states[channel_id].replace_top_card_with_dragon(deck_key, card)
+
+def worker_main(worker_id: int, worker_count: int, game_states_directory: str, requests, responses) -> None:
+    """
+    Entry point of a worker process. Handles requests until it receives None.
+    Responses are sent on the worker's own pipe, so a worker that dies cannot block the others.
+    """
+    from logging_config import configure_logging
+    configure_logging(f"bot_worker_{worker_id}.log")  # Only one process may rotate a log file
+    worker = GameWorker(worker_id, worker_count, game_states_directory)
+    responses.send((None, True, worker_id))  # Signal that the worker is ready
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, operation, channel_id, kwargs = request
+        try:
+            responses.send((request_id, True, worker.handle(operation, channel_id, kwargs)))
+        except Exception as e:
+            logging.error(f"Worker {worker_id}: operation '{operation}' failed for channel {channel_id}: {e}", exc_info=True)
+            responses.send((request_id, False, f"{type(e).__name__}: {e}"))
+    worker.save_game_states()
+    logging.info(f"Worker {worker_id} stopped.")
+
+class WorkerError(Exception):
+    """Raised in the front process when an operation failed in a worker."""
+
+class WorkerPool:
+    """
+    Routes the game operations of each channel to the worker that owns it.
+    Workers run in separate processes, or in-process on one thread each (for local testing).
+    """
+
+    def __init__(self, worker_count: int, in_process: bool = False, game_states_directory: str = 'game_states', legacy_file: Optional[str] = None):
+        self.worker_count = worker_count
+        self.in_process = in_process
+        self.game_states_directory = game_states_directory
+        self.legacy_file = legacy_file  # Games saved by the bot without workers, taken over on the first start
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # In-process mode
+        self.workers: List[GameWorker] = []
+        self.executors: List[ThreadPoolExecutor] = []
+        # Process mode
+        self.processes: List[multiprocessing.Process] = []
+        self.request_queues = []
+        self.response_connections = []  # Read end of the response pipe of each worker
+        self.response_thread: Optional[threading.Thread] = None
+        self.pending: Dict[int, Tuple[int, asyncio.Future]] = {}  # Request ID to the worker it was sent to and its future
+        self.next_request_id = 0
+        self.dead_workers = set()  # Workers that exited unexpectedly
+        self.stopping = False
+
+    async def start(self) -> None:
+        """
+        Starts the workers and waits until all of them have loaded their games.
+        The saved games are repartitioned for the worker count first, so no worker reads a file another one writes.
+        """
+        self.loop = asyncio.get_running_loop()
+        prepare_worker_partitions(self.game_states_directory, self.worker_count, self.legacy_file)
+        if self.in_process:
+            self.executors = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"game-worker-{i}") for i in range(self.worker_count)]
+            self.workers = await asyncio.gather(*(
+                self.loop.run_in_executor(self.executors[i], GameWorker, i, self.worker_count, self.game_states_directory)
+                for i in range(self.worker_count)
+            ))
+        else:
+            context = multiprocessing.get_context('spawn')
+            for worker_id in range(self.worker_count):
+                request_queue = context.Queue()
+                response_connection, worker_connection = context.Pipe(duplex=False)
+                process = context.Process(
+                    target=worker_main,
+                    args=(worker_id, self.worker_count, self.game_states_directory, request_queue, worker_connection),
+                    name=f"game-worker-{worker_id}",
+                    daemon=True
+                )
+                process.start()
+                worker_connection.close()  # Only the worker writes to it, so reading reaches EOF when the worker exits
+                self.request_queues.append(request_queue)
+                self.response_connections.append(response_connection)
+                self.processes.append(process)
+            # Wait for the ready signal of every worker
+            for worker_id, response_connection in enumerate(self.response_connections):
+                try:
+                    await self.loop.run_in_executor(None, response_connection.recv)
+                except EOFError:
+                    raise WorkerError(f"Game worker {worker_id} exited with code {self.processes[worker_id].exitcode} while starting.") from None
+            self.response_thread = threading.Thread(target=self.read_responses, name="worker-responses", daemon=True)
+            self.response_thread.start()
+        logging.info(f"Started {self.worker_count} game worker(s){' in-process' if self.in_process else ''}.")
+
+    def read_responses(self) -> None:
+        """
+        Runs on a background thread and hands the responses of the worker processes to the event loop.
+        The response pipe of a worker reaches EOF when the worker exits; if it was not stopped (it crashed or was killed),
+        the requests waiting for it are failed instead of waiting forever. Returns once every worker has exited.
+        """
+        connections = {connection: worker_id for worker_id, connection in enumerate(self.response_connections)}
+        while connections:
+            for connection in multiprocessing.connection.wait(list(connections)):
+                try:
+                    response = connection.recv()
+                except EOFError:
+                    worker_id = connections.pop(connection)
+                    if not self.stopping:
+                        self.processes[worker_id].join(1)
+                        self.loop.call_soon_threadsafe(self.fail_worker, worker_id, self.processes[worker_id].exitcode)
+                    continue
+                self.loop.call_soon_threadsafe(self.resolve, *response)
+
+    def resolve(self, request_id: int, success: bool, result: Any) -> None:
+        """Completes the future of a request."""
+        _, future = self.pending.pop(request_id, (None, None))
+        if future is None or future.done():
+            return
+        if success:
+            future.set_result(result)
+        else:
+            future.set_exception(WorkerError(result))
+
+    def fail_worker(self, worker_id: int, exit_code: Optional[int]) -> None:
+        """
+        Fails the requests waiting for a worker process that exited unexpectedly.
+        """
+        self.dead_workers.add(worker_id)
+        logging.error(f"Game worker {worker_id} exited unexpectedly with code {exit_code}, "
+                      f"the games of its channels are unavailable until the bot restarts.")
+        for request_id, (request_worker_id, future) in list(self.pending.items()):
+            if request_worker_id == worker_id:
+                del self.pending[request_id]
+                if not future.done():
+                    future.set_exception(WorkerError(f"Game worker {worker_id} is not running."))
+
+    async def call_worker(self, worker_id: int, operation: str, channel_id: Optional[int] = None, **kwargs) -> Any:
+        """
+        Runs an operation on a specific worker.
+        Raises WorkerError if the worker is not running or does not answer within WORKER_CALL_TIMEOUT seconds.
+        """
+        if self.in_process:
+            worker = self.workers[worker_id]
+            try:
+                return await self.loop.run_in_executor(self.executors[worker_id], worker.handle, operation, channel_id, kwargs)
+            except Exception as e:
+                raise WorkerError(f"{type(e).__name__}: {e}") from e
+        if worker_id in self.dead_workers:
+            raise WorkerError(f"Game worker {worker_id} is not running.")
+        self.next_request_id += 1
+        request_id = self.next_request_id
+        future = self.loop.create_future()
+        self.pending[request_id] = (worker_id, future)
+        self.request_queues[worker_id].put((request_id, operation, channel_id, kwargs))
+        try:
+            return await asyncio.wait_for(future, WORKER_CALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise WorkerError(f"Game worker {worker_id} did not answer '{operation}' within {WORKER_CALL_TIMEOUT:.0f}s.") from None
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def call(self, channel_id: int, operation: str, **kwargs) -> Any:
+        """
+        Runs an operation on the game of a channel, in the worker that owns the channel.
+        """
+        return await self.call_worker(worker_for_channel(channel_id, self.worker_count), operation, channel_id, **kwargs)
+
+    async def list_games(self) -> List[int]:
+        """
+        Returns the channels with a running game, across all workers.
+        """
+        results = await asyncio.gather(*(self.call_worker(worker_id, 'list_games') for worker_id in range(self.worker_count)))
+        return [channel_id for channel_ids in results for channel_id in channel_ids]
+
+    async def stop(self) -> None:
+        """
+        Stops the workers. Each worker saves its games before exiting.
+        """
+        if self.in_process:
+            for worker, executor in zip(self.workers, self.executors):
+                await self.loop.run_in_executor(executor, worker.save_game_states)
+                executor.shutdown()
+        else:
+            self.stopping = True  # The workers exiting now is expected
+            for request_queue in self.request_queues:
+                request_queue.put(None)
+            for process in self.processes:
+                await self.loop.run_in_executor(None, process.join, 10)
+        logging.info("Game workers stopped.")
+
+class RemoteGameState:
+    """
+    Stands in for a GameState in the front process when games are owned by worker processes.
+    Holds the Discord objects of a game (views and pending peek actions), while the game itself lives in its worker.
+    """
+
+    def __init__(self, channel_id: int, worker_pool: WorkerPool, guild_id: Optional[int] = None):
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.worker_pool = worker_pool
+        self.active_views = []  # List of active views awaiting user input
+        self.pending_card_actions = {}  # Tracks pending actions on top cards
+        self.version = 0  # Incremented after every operation that can change the game, like GameState.version
+
+    async def call(self, operation: str, **kwargs) -> Any:
+        """
+        Runs an operation on this game in its worker.
+        """
+        try:
+            return await self.worker_pool.call(self.channel_id, operation, **kwargs)
+        finally:
+            if operation in GameWorker.MUTATING_OPERATIONS:
+                self.version += 1
+
+class FakeGateway:
+    """
+    In-process stand-in for the Discord gateway, used to exercise the worker model locally.
+    Dispatches game commands for simulated channels the same way the cogs do in worker mode.
+    """
+
+    def __init__(self, worker_pool: WorkerPool, deck_keys: List[str]):
+        self.worker_pool = worker_pool
+        self.deck_keys = deck_keys
+        self.sent_events: Dict[int, List[Dict]] = {}  # Channel ID to events that would have been sent
+        self.ended_channels = set()  # Channels whose game ended after 'Time's Up!'
+        self.commands_dispatched = 0
+
+    async def dispatch(self, command: str, channel_id: int) -> Any:
+        """
+        Dispatches a command for a channel and records the events that would be sent to it.
+        """
+        self.commands_dispatched += 1
+        if command == 'startgame':
+            events = await self.worker_pool.call(channel_id, 'start_game', deck_keys=self.deck_keys)
+        elif command == 'nextturn':
+            result = await self.worker_pool.call(channel_id, 'next_turn')
+            if result['ended']:
+                self.ended_channels.add(channel_id)
+                events = [{'type': 'message', 'content': "**Game Over!** The game has ended."}]
+            else:
+                events = result['events']
+        elif command == 'status':
+            return await self.worker_pool.call(channel_id, 'status')
+        elif command == 'endgame':
+            return await self.worker_pool.call(channel_id, 'end_game')
+        else:
+            raise ValueError(f"Unknown command '{command}'.")
+        self.sent_events.setdefault(channel_id, []).extend(events)
+        return events
+
+async def run_fake_gateway(worker_count: int, channel_count: int, turns: int, in_process: bool) -> None:
+    """
+    Plays games in many simulated channels concurrently through the worker pool and reports the throughput.
+    The games are saved in a temporary directory, so running this never touches the bot's saved games.
+    """
+    deck_keys = ['event_deck', 'dragon_deck', 'sea_deck', 'end_deck']
+    with tempfile.TemporaryDirectory(prefix='potr_workers_') as game_states_directory:
+        await play_fake_gateway(WorkerPool(worker_count, in_process=in_process, game_states_directory=game_states_directory), deck_keys, channel_count, turns)
+
+async def play_fake_gateway(worker_pool: WorkerPool, deck_keys: List[str], channel_count: int, turns: int) -> None:
+    """
+    Plays the simulated games through a worker pool, see run_fake_gateway.
+    """
+    worker_count = worker_pool.worker_count
+    await worker_pool.start()
+    gateway = FakeGateway(worker_pool, deck_keys)
+    channel_ids = [1000000000000000000 + channel_index for channel_index in range(channel_count)]
+
+    async def play(channel_id: int) -> None:
+        await gateway.dispatch('startgame', channel_id)
+        for _ in range(turns):
+            await gateway.dispatch('nextturn', channel_id)
+            if channel_id in gateway.ended_channels:
+                return
+            await gateway.dispatch('status', channel_id)
+        await gateway.dispatch('endgame', channel_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(play(channel_id) for channel_id in channel_ids))
+    elapsed = time.perf_counter() - started
+    await worker_pool.stop()
+
+    commands_run = gateway.commands_dispatched
+    owners = [worker_for_channel(channel_id, worker_count) for channel_id in channel_ids]
+    print(f"{commands_run} commands for {channel_count} channels in {elapsed:.2f}s ({commands_run / elapsed:.0f} commands/s).")
+    print("Channels per worker: " + ', '.join(str(owners.count(worker_id)) for worker_id in range(worker_count)))
+    print(f"Events recorded: {sum(len(events) for events in gateway.sent_events.values())}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exercise the game worker pool with an in-process fake gateway.')
+    parser.add_argument('--workers', type=int, default=4, help='Number of game workers.')
+    parser.add_argument('--channels', type=int, default=100, help='Number of simulated channels.')
+    parser.add_argument('--turns', type=int, default=15, help='Turns to play per channel.')
+    parser.add_argument('--in-process', action='store_true', help='Run the workers on threads of this process instead of separate processes.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    asyncio.run(run_fake_gateway(args.workers, args.channels, args.turns, args.in_process))